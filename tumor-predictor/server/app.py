@@ -1,34 +1,58 @@
 import os
 import io
+import asyncio
 import random
+import time
+from itertools import groupby
 from typing import List, Optional, Tuple
 from datetime import datetime
 
 import pandas as pd
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Database imports
-from database import get_db, create_tables
-from models.database_models import Patient, PatientFollowup, Prediction, RiskFactor, TreatmentOutcome, UserSession, User, PatientAssignment, UserRoleEnum
+from database import get_async_db, create_tables, create_indexes, SessionLocal
+from models.database_models import Patient, PatientFollowup, Prediction, RiskFactor, TreatmentOutcome, UserSession, User, PatientAssignment, UserRoleEnum, HPVStatusEnum
+from models.analytics_summary import ensure_summary, read_summary
+from models.report_cache import report_cache
+import streaming_upload
+import image_store
+import image_tensors
+import sql_stats
+from prediction_writer import prediction_writer, PERSIST_PREDICTIONS
+from audit_log import audit_logger, AUDITED_ROUTES, AUDIT_ENABLED, authenticated_user, claimed_ids, client_ip
+from cohort_export import export_stream, FORMATS
+from frame_cache import analysis_frame, frame_cache
+from patient_index import patient_index
+from series_store import series_store
+from batch_analysis import analyze_batch
 
 # Placeholder imports for ML; wire real model later
 import numpy as np
 try:
     import tensorflow as tf
-    from models.model_utils import train_and_save, load_model, predict_trajectory
+    from models.model_utils import train_and_save, load_model, predict_trajectory, predict_trajectories
     from models.rl_agent import TumorRLAgent, PatientState as RLPatientState, TreatmentAction
 except Exception:
     tf = None  # fallback if TF is unavailable
     train_and_save = None
     load_model = None
     predict_trajectory = None
+    predict_trajectories = None
     TumorRLAgent = None
     RLPatientState = None
     TreatmentAction = None
 
+IMAGE_BATCH_CONCURRENCY = int(os.getenv("IMAGE_BATCH_CONCURRENCY", "4"))
+BATCH_ANALYZE_MAX = int(os.getenv("BATCH_ANALYZE_MAX", "1000"))
+
 app = FastAPI(title="Oral Tumor Evolution Backend")
 app.add_middleware(
     CORSMiddleware,
@@ -36,12 +60,80 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-SQL-Stats", "Server-Timing"],
 )
+app.add_middleware(streaming_upload.UploadSizeLimit, paths=["/ingest"])
+
+
+@app.middleware("http")
+async def sql_stats_middleware(request: Request, call_next):
+    """Attribute the SQL issued while serving a request and report it in headers"""
+    token = sql_stats.begin_request()
+    if token is None:
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    finally:
+        stats = sql_stats.end_request(token)
+    route = request.scope.get("route")
+    endpoint = getattr(route, "path", request.url.path)
+    if endpoint != "/debug/sql-stats":
+        sql_stats.registry.add(request.method, endpoint, request.url.path, response.status_code, stats)
+    response.headers["X-SQL-Stats"] = stats.header_value()
+    response.headers["Server-Timing"] = f'db;dur={stats.total_ms:.2f};desc="{stats.count} queries"'
+    return response
+
+
+@app.middleware("http")
+async def audit_middleware(request: Request, call_next):
+    """Queue a user_sessions record for successful requests on audited routes"""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    action = AUDITED_ROUTES.get((request.method, getattr(route, "path", None)))
+    if action is not None and response.status_code < 400:
+        params = request.path_params
+        audit_logger.record(
+            action,
+            user_key=authenticated_user(request.scope) or params.get("user_id"),
+            patient_id=params.get("patient_id"),
+            ip_address=client_ip(request.headers, request.client),
+            user_agent=request.headers.get("user-agent"),
+            action_data={
+                "method": request.method,
+                "path": request.url.path,
+                "status_code": response.status_code,
+                "duration_ms": round((time.perf_counter() - started) * 1000.0, 2),
+                **claimed_ids(request.headers),
+            },
+        )
+    return response
+
 
 # Initialize database tables on startup
 @app.on_event("startup")
 async def startup_event():
     create_tables()
+    create_indexes()
+    db = SessionLocal()
+    try:
+        ensure_summary(db)
+    finally:
+        db.close()
+    if PERSIST_PREDICTIONS:
+        prediction_writer.start()
+    if AUDIT_ENABLED:
+        audit_logger.start()
+    await run_in_threadpool(patient_index.refresh)
+    if series_store.available and not (series_store.source() or {}).get("database"):
+        await run_in_threadpool(series_store.ensure_current, "data")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await run_in_threadpool(prediction_writer.stop)
+    await run_in_threadpool(audit_logger.stop)
+    await run_in_threadpool(image_tensors.preprocessor.shutdown)
 
 
 class PatientState(BaseModel):
@@ -60,139 +152,255 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/debug/sql-stats")
+def get_sql_stats(limit: int = Query(50, ge=0, le=sql_stats.RECENT_REQUESTS), reset: bool = False):
+    """Per-endpoint SQL totals and the most recent per-request breakdowns (needs SQL_STATS_ENDPOINT=1)"""
+    if not sql_stats.SQL_STATS_ENDPOINT:
+        raise HTTPException(status_code=404, detail="Not Found")
+    snapshot = sql_stats.registry.snapshot(limit)
+    if reset:
+        sql_stats.registry.reset()
+    return snapshot
+
+
+@app.get("/debug/prediction-writer")
+def get_prediction_writer_stats():
+    """Queue depth and counters of the write-behind prediction persister"""
+    return prediction_writer.stats()
+
+
+@app.get("/debug/audit-log")
+def get_audit_log_stats():
+    """Queue depth and counters of the batched audit logger"""
+    return audit_logger.stats()
+
+
+@app.get("/debug/image-preprocess")
+def get_image_preprocess_stats():
+    """Counters of the image preprocessing pool"""
+    return image_tensors.preprocessor.stats()
+
+
+@app.get("/debug/frame-cache")
+def get_frame_cache_stats():
+    """Hit/miss counters and memory use of the /analyze frame cache"""
+    return frame_cache.stats()
+
+
+@app.get("/debug/series-store")
+def get_series_store_stats():
+    """Segments, rows and mapped bytes of the follow-up series store"""
+    return series_store.stats()
+
+
+@app.get("/debug/patient-index")
+def get_patient_index_stats():
+    """Size of the per-patient file index"""
+    return patient_index.stats()
+
+
 @app.post("/ingest")
-async def ingest(file: UploadFile = File(...)):
+async def ingest(file: UploadFile = File(...), load_to_db: bool = False, upload_id: Optional[str] = None):
+    """Stream an uploaded CSV into data/ and optionally bulk-load it into the database
+
+    Progress can be polled at /ingest/progress/{upload_id} while the request runs.
+    """
     if not file.filename.endswith((".csv", ".CSV")):
         raise HTTPException(status_code=400, detail="Only CSV supported")
-    content = await file.read()
-    df = pd.read_csv(io.BytesIO(content))
-    # Basic schema normalization: rename to expected keys when present
-    colmap = {
-        "Follow_Up_Month": "month_index",
-        "Tumor_Size_cm": "tumor_size_cm",
-        "Stage_TNM": "stage",
-        "Treatment_Type": "treatment_type",
-        "Response_to_Treatment": "response",
-    }
-    for k, v in colmap.items():
-        if k in df.columns:
-            df.rename(columns={k: v}, inplace=True)
-    # Cache to simple csv for demo
-    os.makedirs("data", exist_ok=True)
-    save_path = os.path.join("data", file.filename)
-    df.to_csv(save_path, index=False)
-    return {"rows": int(df.shape[0]), "path": save_path}
+    save_path = os.path.join("data", os.path.basename(file.filename))
+    upload_id = streaming_upload.progress.start(upload_id, file.filename)
+    try:
+        raw_path = await streaming_upload.receive_upload(file, "data", upload_id)
+        result = await run_in_threadpool(streaming_upload.process_upload, raw_path, save_path, upload_id, load_to_db)
+    except streaming_upload.UploadTooLarge as e:
+        streaming_upload.progress.update(upload_id, stage="failed", error=str(e))
+        raise HTTPException(status_code=413, detail=f"INGEST_ERROR: {e}")
+    except ValueError as e:
+        streaming_upload.progress.update(upload_id, stage="failed", error=str(e))
+        raise HTTPException(status_code=400, detail=f"INGEST_ERROR: {e}")
+    result["patients_indexed"] = await run_in_threadpool(patient_index.index_file, save_path)
+    streaming_upload.progress.update(upload_id, stage="done")
+    return {**result, "upload_id": upload_id}
+
+
+@app.get("/ingest/progress/{upload_id}")
+def ingest_progress(upload_id: str):
+    """Bytes received, rows processed and stage of a (recent) upload"""
+    entry = streaming_upload.progress.get(upload_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return entry
 
 
 @app.post("/image-ingest")
 async def image_ingest(image: UploadFile = File(...)):
     """Accept an image upload from the doctor and persist it for later processing.
 
-    For the demo, we store the image under data/uploads/images and return basic metadata.
+    Images are stored content-addressed under data/uploads/images, so re-uploads cost no extra disk.
     """
     # Basic validation
-    allowed_ext = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
-    lower_name = image.filename.lower()
-    if not any(lower_name.endswith(ext) for ext in allowed_ext):
+    if not image_store.is_allowed_image(image.filename):
         raise HTTPException(status_code=400, detail="Only image files are supported (png, jpg, jpeg, bmp, gif)")
 
-    # Ensure directory exists
-    base_dir = os.path.join("data", "uploads", "images")
-    os.makedirs(base_dir, exist_ok=True)
-
-    # Save the file
-    content = await image.read()
-    save_path = os.path.join(base_dir, image.filename)
-    with open(save_path, "wb") as f:
-        f.write(content)
-
-    # Lightweight metadata (no heavy processing for demo)
-    size_bytes = len(content)
+    stored = await image_store.store_upload(image)
+    image_tensors.preprocessor.schedule(stored.sha256, stored.path)
     return {
         "message": "Image uploaded successfully",
         "filename": image.filename,
-        "path": save_path,
-        "size_bytes": size_bytes,
+        "path": stored.path,
+        "size_bytes": stored.size_bytes,
+        "sha256": stored.sha256,
+        "deduplicated": stored.deduplicated,
     }
 
 
 @app.post("/image-ingest-batch")
 async def image_ingest_batch(images: List[UploadFile] = File(...)):
-    """Accept multiple image uploads and persist them for later processing."""
+    """Accept multiple image uploads and persist them concurrently for later processing.
+
+    Files are stored with at most IMAGE_BATCH_CONCURRENCY in flight; a bad file is
+    reported under "failed" without aborting the rest of the batch.
+    """
     if not images:
         raise HTTPException(status_code=400, detail="No images provided")
 
-    allowed_ext = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
-    base_dir = os.path.join("data", "uploads", "images")
-    os.makedirs(base_dir, exist_ok=True)
-
-    saved = []
-    for img in images:
-        lower_name = img.filename.lower()
-        if not any(lower_name.endswith(ext) for ext in allowed_ext):
-            raise HTTPException(status_code=400, detail=f"Unsupported file type: {img.filename}")
-        content = await img.read()
-        save_path = os.path.join(base_dir, img.filename)
-        with open(save_path, "wb") as f:
-            f.write(content)
-        saved.append({
+    started = time.perf_counter()
+    limit = asyncio.Semaphore(IMAGE_BATCH_CONCURRENCY)
+
+    async def store_one(img: UploadFile) -> dict:
+        t0 = time.perf_counter()
+        if not image_store.is_allowed_image(img.filename):
+            return {"filename": img.filename, "error": "Unsupported file type", "elapsed_ms": 0.0}
+        try:
+            async with limit:
+                stored = await image_store.store_upload(img)
+            image_tensors.preprocessor.schedule(stored.sha256, stored.path)
+        except OSError as e:
+            return {"filename": img.filename, "error": f"Failed to store: {e}",
+                    "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 2)}
+        return {
             "filename": img.filename,
-            "path": save_path,
-            "size_bytes": len(content),
-        })
+            "path": stored.path,
+            "size_bytes": stored.size_bytes,
+            "sha256": stored.sha256,
+            "deduplicated": stored.deduplicated,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 2),
+        }
+
+    results = await asyncio.gather(*(store_one(img) for img in images))
+    saved = [r for r in results if "error" not in r]
+    failed = [r for r in results if "error" in r]
+    if not saved:
+        raise HTTPException(status_code=400, detail="; ".join(f"{r['filename']}: {r['error']}" for r in failed))
 
     return {
-        "message": "Images uploaded successfully",
+        "message": "Images uploaded successfully" if not failed else f"Uploaded {len(saved)} of {len(results)} images",
         "count": len(saved),
         "files": saved,
+        "failed": failed,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 2),
+    }
+
+
+@app.get("/data/patients/{patient_id}")
+def get_indexed_patient(patient_id: str):
+    """Follow-up rows for one patient across the CSVs in data/, located via the patient index"""
+    locations = patient_index.locate(patient_id)
+    if not locations:
+        raise HTTPException(status_code=404, detail="Patient not found in data/")
+    rows = patient_index.read_patient(patient_id)
+    columns = [c for c in rows.columns if c in rows.attrs["schema"].provides]
+    rows = rows[columns].astype(object).where(rows[columns].notna(), None)
+    return {
+        "patient_id": patient_id,
+        "locations": [
+            {
+                "file": loc["file"],
+                "rows": sum(run[1] for run in loc["runs"]),
+                "month_min": loc["month_min"],
+                "month_max": loc["month_max"],
+            }
+            for loc in locations
+        ],
+        "followups": rows.to_dict(orient="records"),
+    }
+
+
+@app.get("/series/{patient_id}")
+def get_patient_series(patient_id: str):
+    """Follow-up series (month, size, treatment, response) for one patient from the series store"""
+    if not series_store.available:
+        raise HTTPException(status_code=503, detail="Series store unavailable (pyarrow not installed)")
+    table = series_store.series(patient_id)
+    if table is None:
+        raise HTTPException(status_code=404, detail="Patient not found in series store")
+    return {
+        "patient_id": patient_id,
+        "months": table.column("month").to_numpy().tolist(),
+        "tumor_size_cm": [round(v, 2) for v in table.column("tumor_size").to_numpy().tolist()],
+        "treatment": table.column("treatment").to_pylist(),
+        "response": table.column("response").to_pylist(),
     }
 
 
 class AnalyzeRequest(BaseModel):
-    csv_path: str
+    csv_path: Optional[str] = None
+    patient_id: Optional[str] = None  # analyze this patient's indexed rows under data/ instead of a file
     image_files: Optional[List[str]] = None
     treatment: Optional[str] = None
 
 
+def _analysis_model():
+    """Forecast model for /analyze, trained on data/ first if none is saved yet"""
+    model = load_model("artifacts") if load_model else None
+    if model is None and train_and_save is not None:
+        try:
+            # Train using all CSVs currently under data/
+            train_and_save("data", "artifacts", lookback=3, epochs=10, batch_size=16)
+            model = load_model("artifacts") if load_model else None
+        except Exception:
+            model = None
+    return model
+
+
 @app.post("/analyze")
 def analyze(req: AnalyzeRequest):
     """Analyze an uploaded CSV (and optional images) and return dashboard-ready data."""
-    if not os.path.exists(req.csv_path):
-        raise HTTPException(status_code=400, detail="CSV path not found")
-
-    try:
-        df = pd.read_csv(req.csv_path)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to read CSV: {e}")
-
-    # Normalize expected column names
-    colmap = {
-        "Follow_Up_Month": "month_index",
-        "Tumor_Size_cm": "tumor_size_cm",
-        "Stage_TNM": "stage",
-        "Treatment_Type": "treatment_type",
-        "Response_to_Treatment": "response",
-    }
-    for k, v in colmap.items():
-        if k in df.columns and v not in df.columns:
-            df.rename(columns={k: v}, inplace=True)
+    if req.csv_path is None:
+        if req.patient_id is None:
+            raise HTTPException(status_code=400, detail="Either csv_path or patient_id is required")
+        try:
+            rows = patient_index.read_patient(req.patient_id)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to read CSV: {e}")
+        if rows is None and series_store.available:
+            rows = series_store.frame(req.patient_id)
+        if rows is None:
+            raise HTTPException(status_code=404, detail="Patient not found in data/")
+        cached = analysis_frame(rows)
+    else:
+        if not os.path.exists(req.csv_path):
+            raise HTTPException(status_code=400, detail="CSV path not found")
+        try:
+            cached = frame_cache.load(req.csv_path)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to read CSV: {e}")
+    df, has_months = cached.frame, cached.has_months
 
-    if "tumor_size_cm" not in df.columns:
+    if "tumor_size_cm" not in df.attrs["schema"].provides:
         raise HTTPException(status_code=400, detail="CSV must include tumor_size_cm (or Tumor_Size_cm)")
 
-    # Order by month if available
-    if "month_index" in df.columns:
-        df = df.sort_values(by=["month_index"]).reset_index(drop=True)
+    # Ordered by month if available
+    if has_months:
         months = [f"Month {int(m)}" for m in df["month_index"].fillna(0).astype(int).tolist()]
     else:
         months = [f"Month {i}" for i in range(len(df))]
 
-    sizes_series = df["tumor_size_cm"].astype(float)
-    sizes_series = sizes_series.fillna(method="ffill").fillna(method="bfill")
+    sizes_series = cached.sizes
     sizes = sizes_series.tolist()
     # Optional stage from CSV
     stage_value = None
-    if "stage" in df.columns:
+    if "stage" in df.attrs["schema"].provides:
         try:
             # Use the most common or first non-null stage
             stage_value = df["stage"].dropna().astype(str).iloc[0] if df["stage"].dropna().size > 0 else None
@@ -211,14 +419,7 @@ def analyze(req: AnalyzeRequest):
         })
 
     # Extend evolution with ML predictions if model available (or train on the fly)
-    model = load_model("artifacts") if load_model else None
-    if model is None and train_and_save is not None:
-        try:
-            # Train using all CSVs currently under data/
-            train_and_save("data", "artifacts", lookback=3, epochs=10, batch_size=16)
-            model = load_model("artifacts") if load_model else None
-        except Exception:
-            model = None
+    model = _analysis_model()
     if model is not None and predict_trajectory is not None and len(sizes) > 0:
         horizon = 12
         start_size = float(sizes[-1])
@@ -228,7 +429,7 @@ def analyze(req: AnalyzeRequest):
         # Determine numeric month for continuation
         next_index_base = 0
         try:
-            if "month_index" in df.columns:
+            if has_months:
                 next_index_base = int(df["month_index"].dropna().astype(int).max())
             else:
                 next_index_base = len(sizes) - 1
@@ -253,7 +454,7 @@ def analyze(req: AnalyzeRequest):
     # Response distribution (if present)
     response_mix = None
     response_impact = 0
-    if "response" in df.columns:
+    if "response" in df.attrs["schema"].provides:
         counts = df["response"].dropna().astype(str).str.lower().value_counts().to_dict()
         total_r = sum(counts.values()) or 1
         good_like = (counts.get("excellent", 0) + counts.get("good", 0)) / total_r
@@ -293,7 +494,7 @@ def analyze(req: AnalyzeRequest):
     overall_score = int(np.mean([int(rf["impact"]) for rf in risk_factors]) if risk_factors else 0)
     overall_risk = to_level(overall_score)
 
-    return {
+    result = {
         "evolution": evolution,
         "riskFactors": risk_factors,
         "treatmentImpact": 92 if treatment == "combined" else (78 if treatment == "chemo" else 74),
@@ -303,6 +504,95 @@ def analyze(req: AnalyzeRequest):
         "overallRisk": overall_risk,
     }
 
+    # Uploaded images are content-addressed; their preprocessed tensors load memory-mapped
+    if req.image_files:
+        tensors = [image_tensors.load_tensor(os.path.basename(path)) for path in req.image_files]
+        result["images"] = {
+            "provided": len(req.image_files),
+            "preprocessed": sum(t is not None for t in tensors),
+        }
+
+    # Persist when the CSV describes a single patient
+    ids = df["patient_id"].dropna().unique()
+    if len(ids) == 1:
+        prediction_writer.submit(
+            str(ids[0]), treatment, evolution, risk_factors, result["treatmentImpact"], result["confidence"],
+            model_version="v1.0" if model is not None else "baseline",
+        )
+    return result
+
+
+class BatchAnalyzeRequest(BaseModel):
+    csv_paths: Optional[List[str]] = None
+    patient_ids: Optional[List[str]] = None
+    treatment: Optional[str] = None
+
+
+@app.post("/analyze-batch")
+def analyze_many(req: BatchAnalyzeRequest):
+    """/analyze for many CSVs and/or indexed patients in one call
+
+    CSV results are split per patient_id, so only a single-patient CSV
+    matches its /analyze result. Sources that can't be read are reported
+    under ``failed`` instead of failing the whole batch.
+    """
+    started = time.perf_counter()
+    csv_paths, patient_ids = req.csv_paths or [], req.patient_ids or []
+    if not csv_paths and not patient_ids:
+        raise HTTPException(status_code=400, detail="csv_paths or patient_ids is required")
+    if len(csv_paths) + len(patient_ids) > BATCH_ANALYZE_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_ANALYZE_MAX} sources per batch")
+
+    sources, failed = [], []
+    for path in csv_paths:
+        try:
+            frame = frame_cache.load(path).frame
+        except FileNotFoundError:
+            failed.append({"source": path, "error": "CSV path not found"})
+            continue
+        except Exception as e:
+            failed.append({"source": path, "error": f"Failed to read CSV: {e}"})
+            continue
+        if "tumor_size_cm" not in frame.attrs["schema"].provides:
+            failed.append({"source": path, "error": "CSV must include tumor_size_cm (or Tumor_Size_cm)"})
+        elif frame.empty:
+            failed.append({"source": path, "error": "CSV has no rows"})
+        else:
+            sources.append((path, frame))
+    if patient_ids:
+        # One parse per data/ file for all indexed patients; the series store covers the rest.
+        # Patients are grouped by the files holding them so each keeps the columns /analyze sees.
+        found = set()
+        for indexed in patient_index.read_patient_groups(patient_ids):
+            if not indexed.empty:
+                sources.append(("patient_index", indexed))
+                found.update(indexed["patient_id"].dropna().astype(str))
+        for patient_id in dict.fromkeys(patient_ids):
+            if patient_id in found:
+                continue
+            rows = series_store.frame(patient_id) if series_store.available else None
+            if rows is None:
+                failed.append({"source": patient_id, "error": "Patient not found in data/"})
+            else:
+                sources.append(("series_store", rows))
+
+    treatment = req.treatment or "chemo"
+    model = _analysis_model() if sources else None
+    results = analyze_batch(sources, treatment, model, predict_trajectories)
+    for result in results:
+        if result["patient_id"] is not None:
+            prediction_writer.submit(
+                result["patient_id"], treatment, result["evolution"], result["riskFactors"],
+                result["treatmentImpact"], result["confidence"],
+                model_version="v1.0" if model is not None else "baseline",
+            )
+    return {
+        "results": results,
+        "failed": failed,
+        "count": len(results),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 2),
+    }
+
 
 @app.post("/predict")
 def predict(state: PatientState):
@@ -331,7 +621,7 @@ def predict(state: PatientState):
                 "tumorSize": round(max(0.1, float(size)), 2),
                 "survivalProb": round(min(100.0, max(60.0, float(survival))), 1),
             })
-    return {
+    result = {
         "evolution": evolution,
         "riskFactors": [
             {"factor": "Age", "impact": 65, "description": "Moderate risk factor"},
@@ -343,6 +633,11 @@ def predict(state: PatientState):
         "treatmentImpact": 92 if treatment == "combined" else (78 if treatment == "chemo" else 74),
         "confidence": 0.87,
     }
+    prediction_writer.submit(
+        state.patient_id, treatment, evolution, result["riskFactors"], result["treatmentImpact"], result["confidence"],
+        model_version="v1.0" if model is not None else "baseline",
+    )
+    return result
 
 
 class ExplainRequest(BaseModel):
@@ -405,6 +700,25 @@ def export_to_sheets_like(payload: dict):
     return {"csv": buf.getvalue()}
 
 
+@app.get("/export/cohort")
+def export_cohort(
+    dataset: str = "followups",
+    format: str = "csv",
+    chunk_rows: int = Query(2000, ge=100, le=50000),
+):
+    """Stream a whole table (patients, followups or predictions) as CSV, NDJSON or Parquet"""
+    try:
+        stream = export_stream(dataset, format, chunk_rows)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"EXPORT_ERROR: {e}")
+    media_type, extension = FORMATS[format]
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="cohort_{dataset}.{extension}"'},
+    )
+
+
 # ================= RL Endpoints ================= #
 
 @app.post("/rl/train")
@@ -507,40 +821,82 @@ def get_rl_status():
 
 # ================= Database Endpoints ================= #
 
+PATIENT_LIST_FIELDS = [
+    "patient_id", "age", "gender", "stage_tnm", "initial_tumor_size_cm",
+    "smoking_status", "hpv_status", "comorbidities", "created_at",
+]
+PATIENT_PROJECTABLE_FIELDS = {c.key for c in Patient.__table__.columns}
+
+
 @app.get("/patients")
-def get_patients(db: Session = Depends(get_db)):
-    """Get all patients from database"""
-    patients = db.query(Patient).all()
-    return [
-        {
-            "patient_id": p.patient_id,
-            "age": p.age,
-            "gender": p.gender,
-            "stage_tnm": p.stage_tnm,
-            "initial_tumor_size_cm": p.initial_tumor_size_cm,
-            "smoking_status": p.smoking_status,
-            "hpv_status": p.hpv_status,
-            "comorbidities": p.comorbidities,
-            "created_at": p.created_at
-        }
-        for p in patients
-    ]
+async def get_patients(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    stage: Optional[str] = None,
+    hpv_status: Optional[str] = None,
+    min_age: Optional[int] = None,
+    max_age: Optional[int] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Get a page of patients from database
+
+    Keyset-paginated on ``patient_id``: pass the ``X-Next-Cursor`` response
+    header back as ``cursor`` to fetch the next page. ``fields`` is a
+    comma-separated column projection; ``patient_id`` is always included.
+    """
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in PATIENT_PROJECTABLE_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        if "patient_id" not in selected:
+            selected.insert(0, "patient_id")
+    else:
+        selected = PATIENT_LIST_FIELDS
+
+    query = select(*[getattr(Patient, f) for f in selected])
+    if cursor:
+        query = query.where(Patient.patient_id > cursor)
+    if stage:
+        query = query.where(Patient.stage_tnm.startswith(stage))
+    if hpv_status:
+        status = next((s for s in HPVStatusEnum if s.value.lower() == hpv_status.lower()), None)
+        if status is None:
+            raise HTTPException(status_code=400, detail=f"Invalid hpv_status: {hpv_status}")
+        query = query.where(Patient.hpv_status == status)
+    if min_age is not None:
+        query = query.where(Patient.age >= min_age)
+    if max_age is not None:
+        query = query.where(Patient.age <= max_age)
+
+    rows = (await db.execute(query.order_by(Patient.patient_id).limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = rows[-1].patient_id
+
+    return [row._asdict() for row in rows]
 
 
 @app.get("/patients/{patient_id}")
-def get_patient(patient_id: str, db: Session = Depends(get_db)):
+async def get_patient(patient_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get specific patient with follow-up data"""
-    patient = db.query(Patient).filter(Patient.patient_id == patient_id).first()
+    patient = (await db.execute(select(Patient).where(Patient.patient_id == patient_id))).scalars().first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    followups = db.query(PatientFollowup).filter(
-        PatientFollowup.patient_id == patient_id
-    ).order_by(PatientFollowup.follow_up_month).all()
+    followups = (await db.execute(
+        select(PatientFollowup).where(
+            PatientFollowup.patient_id == patient_id
+        ).order_by(PatientFollowup.follow_up_month)
+    )).scalars().all()
     
-    predictions = db.query(Prediction).filter(
-        Prediction.patient_id == patient_id
-    ).order_by(Prediction.prediction_date.desc()).all()
+    predictions = (await db.execute(
+        select(Prediction).where(
+            Prediction.patient_id == patient_id
+        ).order_by(Prediction.prediction_date.desc())
+    )).scalars().all()
     
     return {
         "patient": {
@@ -585,7 +941,7 @@ def get_patient(patient_id: str, db: Session = Depends(get_db)):
 
 
 @app.post("/patients")
-def create_patient(patient_data: dict, db: Session = Depends(get_db)):
+async def create_patient(patient_data: dict, db: AsyncSession = Depends(get_async_db)):
     """Create a new patient"""
     try:
         patient = Patient(
@@ -601,75 +957,95 @@ def create_patient(patient_data: dict, db: Session = Depends(get_db)):
             comorbidities=patient_data.get("comorbidities", "")
         )
         db.add(patient)
-        db.commit()
-        return {"message": "Patient created successfully", "patient_id": patient.patient_id}
+        await db.commit()
+        return {"message": "Patient created successfully", "patient_id": patient_data["patient_id"]}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Error creating patient: {str(e)}")
 
 
 @app.get("/analytics/summary")
-def get_analytics_summary(db: Session = Depends(get_db)):
-    """Get analytics summary from database"""
-    total_patients = db.query(Patient).count()
-    total_predictions = db.query(Prediction).count()
-    total_followups = db.query(PatientFollowup).count()
-    
-    # Get treatment effectiveness
-    treatment_stats = db.query(
-        PatientFollowup.treatment_type,
-        PatientFollowup.response_to_treatment
-    ).all()
-    
-    treatment_effectiveness = {}
-    for treatment, response in treatment_stats:
-        if treatment not in treatment_effectiveness:
-            treatment_effectiveness[treatment] = {}
-        if response not in treatment_effectiveness[treatment]:
-            treatment_effectiveness[treatment][response] = 0
-        treatment_effectiveness[treatment][response] += 1
-    
-    return {
-        "total_patients": total_patients,
-        "total_predictions": total_predictions,
-        "total_followups": total_followups,
-        "treatment_effectiveness": treatment_effectiveness
-    }
+async def get_analytics_summary(db: AsyncSession = Depends(get_async_db)):
+    """Get analytics summary from the incrementally maintained summary table"""
+    return await read_summary(db)
 
 
 @app.get("/analytics/patient-trends")
-def get_patient_trends(db: Session = Depends(get_db)):
-    """Get patient trend analysis"""
-    # Get monthly tumor size trends for each patient
-    patients = db.query(Patient).all()
+async def get_patient_trends(
+    stage: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Get patient trend analysis
+
+    Optional filters: ``stage`` (TNM prefix, e.g. ``T2``) and a follow-up date
+    range. Results are paginated by patient with ``limit``/``offset``.
+    """
+    followup_filters = []
+    if start_date is not None:
+        followup_filters.append(PatientFollowup.follow_up_date >= start_date)
+    if end_date is not None:
+        followup_filters.append(PatientFollowup.follow_up_date <= end_date)
+
+    # Page of patients that have at least one matching follow-up
+    has_followups = select(PatientFollowup.id).where(
+        PatientFollowup.patient_id == Patient.patient_id, *followup_filters
+    ).exists()
+    patient_query = select(Patient.patient_id, Patient.stage_tnm).where(has_followups)
+    if stage:
+        patient_query = patient_query.where(Patient.stage_tnm.startswith(stage))
+    page = (await db.execute(
+        patient_query.order_by(Patient.patient_id).offset(offset).limit(limit + 1)
+    )).all()
+
+    has_more = len(page) > limit
+    page = page[:limit]
+    stages = {pid: stage_tnm for pid, stage_tnm in page}
+
+    # One ordered query for the whole page, grouped in a single pass
     trends = []
-    
-    for patient in patients:
-        followups = db.query(PatientFollowup).filter(
-            PatientFollowup.patient_id == patient.patient_id
-        ).order_by(PatientFollowup.follow_up_month).all()
-        
-        if followups:
-            trend_data = {
-                "patient_id": patient.patient_id,
-                "stage": patient.stage_tnm,
+    if stages:
+        rows = (await db.execute(
+            select(
+                PatientFollowup.patient_id,
+                PatientFollowup.follow_up_month,
+                PatientFollowup.tumor_size_cm,
+                PatientFollowup.recurrence
+            ).where(
+                PatientFollowup.patient_id.in_(list(stages)), *followup_filters
+            ).order_by(PatientFollowup.patient_id, PatientFollowup.follow_up_month)
+        )).all()
+
+        for patient_id, group in groupby(rows, key=lambda r: r.patient_id):
+            trends.append({
+                "patient_id": patient_id,
+                "stage": stages[patient_id],
                 "tumor_evolution": [
                     {
                         "month": f.follow_up_month,
                         "tumor_size_cm": f.tumor_size_cm,
                         "recurrence": f.recurrence
                     }
-                    for f in followups
+                    for f in group
                 ]
-            }
-            trends.append(trend_data)
-    
-    return {"patient_trends": trends}
+            })
+
+    return {
+        "patient_trends": trends,
+        "pagination": {
+            "limit": limit,
+            "offset": offset,
+            "next_offset": offset + limit if has_more else None
+        }
+    }
 
 
 # User Management Endpoints
 @app.post("/users")
-def create_user(user_data: dict, db: Session = Depends(get_db)):
+async def create_user(user_data: dict, db: AsyncSession = Depends(get_async_db)):
     """Create a new user"""
     try:
         user = User(
@@ -683,38 +1059,49 @@ def create_user(user_data: dict, db: Session = Depends(get_db)):
             hospital_affiliation=user_data.get("hospital_affiliation")
         )
         db.add(user)
-        db.commit()
-        return {"message": "User created successfully", "user_id": user.user_id}
+        await db.commit()
+        return {"message": "User created successfully", "user_id": user_data["user_id"]}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Error creating user: {str(e)}")
 
 @app.get("/users/{user_id}")
-def get_user(user_id: str, db: Session = Depends(get_db)):
+async def get_user(user_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get user profile and assigned patients"""
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = (await db.execute(select(User).where(User.user_id == user_id))).scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Get assigned patients
-    assignments = db.query(PatientAssignment).filter(
-        PatientAssignment.user_id == user.id,
-        PatientAssignment.is_active == True
-    ).all()
-    
-    assigned_patients = []
-    for assignment in assignments:
-        patient = db.query(Patient).filter(Patient.patient_id == assignment.patient_id).first()
-        if patient:
-            assigned_patients.append({
-                "patient_id": patient.patient_id,
-                "age": patient.age,
-                "gender": patient.gender,
-                "stage_tnm": patient.stage_tnm,
-                "initial_tumor_size_cm": patient.initial_tumor_size_cm,
-                "assignment_type": assignment.assignment_type,
-                "assigned_at": assignment.assigned_at
-            })
+    # Get assigned patients in one joined query
+    rows = (await db.execute(
+        select(
+            Patient.patient_id,
+            Patient.age,
+            Patient.gender,
+            Patient.stage_tnm,
+            Patient.initial_tumor_size_cm,
+            PatientAssignment.assignment_type,
+            PatientAssignment.assigned_at
+        ).join(
+            PatientAssignment, PatientAssignment.patient_id == Patient.patient_id
+        ).where(
+            PatientAssignment.user_id == user.id,
+            PatientAssignment.is_active == True
+        )
+    )).all()
+
+    assigned_patients = [
+        {
+            "patient_id": r.patient_id,
+            "age": r.age,
+            "gender": r.gender,
+            "stage_tnm": r.stage_tnm,
+            "initial_tumor_size_cm": r.initial_tumor_size_cm,
+            "assignment_type": r.assignment_type,
+            "assigned_at": r.assigned_at
+        }
+        for r in rows
+    ]
     
     return {
         "user": {
@@ -733,42 +1120,54 @@ def get_user(user_id: str, db: Session = Depends(get_db)):
     }
 
 @app.get("/users/{user_id}/dashboard")
-def get_user_dashboard(user_id: str, db: Session = Depends(get_db)):
+async def get_user_dashboard(user_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get user-specific dashboard data"""
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = (await db.execute(select(User).where(User.user_id == user_id))).scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Get assigned patients
-    assignments = db.query(PatientAssignment).filter(
+    # Assigned patients as a subquery so every statistic below is a single query
+    assigned_patient_ids = select(PatientAssignment.patient_id).where(
         PatientAssignment.user_id == user.id,
         PatientAssignment.is_active == True
-    ).all()
-    
-    assigned_patient_ids = [a.patient_id for a in assignments]
-    
+    ).scalar_subquery()
+
     # Get patient statistics
-    total_patients = len(assigned_patient_ids)
-    recent_predictions = db.query(Prediction).filter(
-        Prediction.patient_id.in_(assigned_patient_ids)
-    ).order_by(Prediction.prediction_date.desc()).limit(5).all()
-    
+    total_patients = await db.scalar(
+        select(func.count(PatientAssignment.id)).where(
+            PatientAssignment.user_id == user.id,
+            PatientAssignment.is_active == True
+        )
+    )
+    recent_predictions = (await db.execute(
+        select(Prediction).where(
+            Prediction.patient_id.in_(assigned_patient_ids)
+        ).order_by(Prediction.prediction_date.desc()).limit(5)
+    )).scalars().all()
+
     # Get treatment effectiveness for assigned patients
+    response_counts = (await db.execute(
+        select(
+            PatientFollowup.treatment_type,
+            PatientFollowup.response_to_treatment,
+            func.count(PatientFollowup.id)
+        ).where(
+            PatientFollowup.patient_id.in_(assigned_patient_ids)
+        ).group_by(
+            PatientFollowup.treatment_type,
+            PatientFollowup.response_to_treatment
+        )
+    )).all()
+
     treatment_stats = {}
-    for patient_id in assigned_patient_ids:
-        followups = db.query(PatientFollowup).filter(
-            PatientFollowup.patient_id == patient_id
-        ).all()
-        
-        for followup in followups:
-            treatment = followup.treatment_type
-            if treatment not in treatment_stats:
-                treatment_stats[treatment] = {"total": 0, "excellent": 0, "good": 0, "fair": 0, "poor": 0}
-            
-            treatment_stats[treatment]["total"] += 1
-            response = followup.response_to_treatment
-            if response in treatment_stats[treatment]:
-                treatment_stats[treatment][response.lower()] += 1
+    for treatment, response, count in response_counts:
+        if treatment not in treatment_stats:
+            treatment_stats[treatment] = {"total": 0, "excellent": 0, "good": 0, "fair": 0, "poor": 0}
+
+        treatment_stats[treatment]["total"] += count
+        response_key = response.value.lower() if response is not None else None
+        if response_key in treatment_stats[treatment]:
+            treatment_stats[treatment][response_key] += count
     
     # Calculate effectiveness percentages
     for treatment in treatment_stats:
@@ -779,9 +1178,11 @@ def get_user_dashboard(user_id: str, db: Session = Depends(get_db)):
             treatment_stats[treatment]["effectiveness"] = round(((excellent + good) / total) * 100, 1)
     
     # Get recent activity
-    recent_sessions = db.query(UserSession).filter(
-        UserSession.user_id == user.id
-    ).order_by(UserSession.created_at.desc()).limit(10).all()
+    recent_sessions = (await db.execute(
+        select(UserSession).where(
+            UserSession.user_id == user.id
+        ).order_by(UserSession.created_at.desc()).limit(10)
+    )).scalars().all()
     
     return {
         "user_profile": {
@@ -816,39 +1217,55 @@ def get_user_dashboard(user_id: str, db: Session = Depends(get_db)):
     }
 
 @app.get("/users/{user_id}/patients/{patient_id}/report")
-def get_patient_report(user_id: str, patient_id: str, db: Session = Depends(get_db)):
+async def get_patient_report(user_id: str, patient_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get comprehensive patient report for a specific user"""
+    # Taken before the first query: a commit after this point changes the
+    # stamp, so a report read from an older snapshot is never cached
+    generation = report_cache.generation(patient_id)
+
     # Verify user has access to this patient
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = (await db.execute(select(User).where(User.user_id == user_id))).scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    assignment = db.query(PatientAssignment).filter(
-        PatientAssignment.user_id == user.id,
-        PatientAssignment.patient_id == patient_id,
-        PatientAssignment.is_active == True
-    ).first()
+    assignment = (await db.execute(
+        select(PatientAssignment).where(
+            PatientAssignment.user_id == user.id,
+            PatientAssignment.patient_id == patient_id,
+            PatientAssignment.is_active == True
+        )
+    )).scalars().first()
     
     if not assignment and user.role != UserRoleEnum.ADMIN:
         raise HTTPException(status_code=403, detail="Access denied to this patient")
     
+    cached = report_cache.get(patient_id)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
     # Get patient data
-    patient = db.query(Patient).filter(Patient.patient_id == patient_id).first()
+    patient = (await db.execute(select(Patient).where(Patient.patient_id == patient_id))).scalars().first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
     # Get comprehensive patient data
-    followups = db.query(PatientFollowup).filter(
-        PatientFollowup.patient_id == patient_id
-    ).order_by(PatientFollowup.follow_up_month).all()
+    followups = (await db.execute(
+        select(PatientFollowup).where(
+            PatientFollowup.patient_id == patient_id
+        ).order_by(PatientFollowup.follow_up_month)
+    )).scalars().all()
     
-    predictions = db.query(Prediction).filter(
-        Prediction.patient_id == patient_id
-    ).order_by(Prediction.prediction_date.desc()).all()
+    predictions = (await db.execute(
+        select(Prediction).where(
+            Prediction.patient_id == patient_id
+        ).order_by(Prediction.prediction_date.desc())
+    )).scalars().all()
     
-    outcomes = db.query(TreatmentOutcome).filter(
-        TreatmentOutcome.patient_id == patient_id
-    ).order_by(TreatmentOutcome.outcome_date.desc()).all()
+    outcomes = (await db.execute(
+        select(TreatmentOutcome).where(
+            TreatmentOutcome.patient_id == patient_id
+        ).order_by(TreatmentOutcome.outcome_date.desc())
+    )).scalars().all()
     
     # Calculate risk factors
     risk_factors = []
@@ -861,7 +1278,7 @@ def get_patient_report(user_id: str, patient_id: str, db: Session = Depends(get_
     if patient.oral_hygiene in ["Poor", "Very Poor"]:
         risk_factors.append({"factor": "Oral Hygiene", "level": "Medium", "description": f"Oral hygiene: {patient.oral_hygiene}"})
     
-    return {
+    report = {
         "patient": {
             "patient_id": patient.patient_id,
             "age": patient.age,
@@ -920,24 +1337,29 @@ def get_patient_report(user_id: str, patient_id: str, db: Session = Depends(get_
             "follow_up_schedule": "Every 3 months for first year, then every 6 months"
         }
     }
+    body = JSONResponse(content=jsonable_encoder(report)).body
+    report_cache.put(patient_id, body, generation)
+    return Response(content=body, media_type="application/json")
 
 @app.post("/users/{user_id}/patients/{patient_id}/assign")
-def assign_patient_to_user(user_id: str, patient_id: str, assignment_data: dict, db: Session = Depends(get_db)):
+async def assign_patient_to_user(user_id: str, patient_id: str, assignment_data: dict, db: AsyncSession = Depends(get_async_db)):
     """Assign a patient to a user"""
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = (await db.execute(select(User).where(User.user_id == user_id))).scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    patient = db.query(Patient).filter(Patient.patient_id == patient_id).first()
+    patient = (await db.execute(select(Patient).where(Patient.patient_id == patient_id))).scalars().first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
     # Check if assignment already exists
-    existing = db.query(PatientAssignment).filter(
-        PatientAssignment.user_id == user.id,
-        PatientAssignment.patient_id == patient_id,
-        PatientAssignment.is_active == True
-    ).first()
+    existing = (await db.execute(
+        select(PatientAssignment).where(
+            PatientAssignment.user_id == user.id,
+            PatientAssignment.patient_id == patient_id,
+            PatientAssignment.is_active == True
+        )
+    )).scalars().first()
     
     if existing:
         raise HTTPException(status_code=400, detail="Patient already assigned to this user")
@@ -949,7 +1371,7 @@ def assign_patient_to_user(user_id: str, patient_id: str, assignment_data: dict,
     )
     
     db.add(assignment)
-    db.commit()
+    await db.commit()
     
     return {"message": "Patient assigned successfully"}
 
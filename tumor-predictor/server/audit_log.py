@@ -0,0 +1,115 @@
+"""
+Audit trail of user actions in ``user_sessions``
+
+The HTTP middleware maps successful requests on audited routes to an
+``ActionTypeEnum`` and enqueues a record; ``AuditLogger`` writes them in
+batches from its background thread, so logging never adds a database round
+trip to the request.
+
+Only trusted ids are recorded as the actor and patient: the authenticated
+user (``scope["user"]``, when an authentication middleware is installed) or
+the ``user_id`` path parameter, and the ``patient_id`` path parameter.
+``X-User-Id`` / ``X-Patient-Id`` headers are client-supplied, so they only
+appear in ``action_data`` as ``claimed_user_id`` / ``claimed_patient_id``.
+"""
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import insert
+
+from models.database_models import Patient, User, UserSession, ActionTypeEnum
+from write_behind import WriteBehindQueue
+
+AUDIT_ENABLED = os.getenv("AUDIT_LOG_ENABLED", "1") != "0"
+CLAIM_HEADERS = {"x-user-id": "claimed_user_id", "x-patient-id": "claimed_patient_id"}
+
+logger = logging.getLogger(__name__)
+
+# (method, route path) -> action recorded for successful requests
+AUDITED_ROUTES = {
+    ("POST", "/ingest"): ActionTypeEnum.UPLOAD,
+    ("POST", "/image-ingest"): ActionTypeEnum.UPLOAD,
+    ("POST", "/image-ingest-batch"): ActionTypeEnum.UPLOAD,
+    ("POST", "/predict"): ActionTypeEnum.PREDICT,
+    ("POST", "/analyze"): ActionTypeEnum.PREDICT,
+    ("POST", "/explain"): ActionTypeEnum.EXPLAIN,
+    ("GET", "/patients/{patient_id}"): ActionTypeEnum.VIEW,
+    ("GET", "/users/{user_id}/dashboard"): ActionTypeEnum.VIEW,
+    ("GET", "/users/{user_id}/patients/{patient_id}/report"): ActionTypeEnum.VIEW,
+}
+
+
+def client_ip(headers, client) -> Optional[str]:
+    forwarded = headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()[:45]
+    return client.host[:45] if client else None
+
+
+def authenticated_user(scope) -> Optional[str]:
+    """Identity set by an authentication middleware, if any"""
+    user = scope.get("user")
+    if user is None or not getattr(user, "is_authenticated", False):
+        return None
+    try:
+        return user.identity
+    except NotImplementedError:
+        # e.g. Starlette's SimpleUser only provides a display name
+        return user.display_name
+
+
+def claimed_ids(headers) -> dict:
+    """Client-supplied id headers, recorded as claims rather than as the actor"""
+    return {key: headers[header][:100] for header, key in CLAIM_HEADERS.items() if headers.get(header)}
+
+
+class AuditLogger(WriteBehindQueue):
+    """Write-behind queue of ``user_sessions`` rows"""
+
+    name = "audit-logger"
+
+    def record(self, action: ActionTypeEnum, user_key: Optional[str], patient_id: Optional[str],
+               ip_address: Optional[str], user_agent: Optional[str], action_data: dict) -> bool:
+        """Queue one audit row; never raises, so auditing cannot fail the request"""
+        try:
+            return self.enqueue({
+                "session_id": uuid.uuid4().hex,
+                "user_key": user_key,
+                "patient_id": patient_id,
+                "action_type": action,
+                "action_data": action_data,
+                "ip_address": ip_address,
+                "user_agent": user_agent,
+                "created_at": datetime.now(timezone.utc),
+            })
+        except Exception:
+            logger.exception("%s: could not queue %s audit record", self.name, getattr(action, "value", action))
+            return False
+
+    def _write_batch(self, db, batch: List[dict]) -> int:
+        user_keys = {r["user_key"] for r in batch if r["user_key"]}
+        patient_ids = {r["patient_id"] for r in batch if r["patient_id"]}
+        users = dict(db.query(User.user_id, User.id).filter(User.user_id.in_(user_keys))) if user_keys else {}
+        known_patients = (
+            {pid for (pid,) in db.query(Patient.patient_id).filter(Patient.patient_id.in_(patient_ids))}
+            if patient_ids else set()
+        )
+        rows = []
+        for r in batch:
+            row = {k: v for k, v in r.items() if k != "user_key"}
+            row["user_id"] = users.get(r["user_key"])
+            if row["patient_id"] not in known_patients:
+                row["patient_id"] = None
+            rows.append(row)
+        db.execute(insert(UserSession), rows)
+        return len(rows)
+
+
+audit_logger = AuditLogger(
+    batch_size=int(os.getenv("AUDIT_WRITE_BATCH", "500")),
+    flush_interval=float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0")),
+    max_queue=int(os.getenv("AUDIT_QUEUE_MAX", "50000")),
+)
@@ -0,0 +1,171 @@
+"""
+Batch variant of /analyze
+
+``analyze_batch`` takes many normalized frames (one per CSV path or group of
+indexed patients) and produces one /analyze-shaped result per (source,
+patient_id). A source holding one patient gives exactly the /analyze result
+for it. A multi-patient CSV is split into one result per patient, where
+/analyze would treat the whole file as one series.
+Everything that scales with rows runs as groupby operations over a single
+concatenated frame:
+- month ordering and gap-filled sizes
+- the historical evolution
+- growth ratios, stage severity and response mix
+
+All forecast rollouts share one batched model call per step
+(``predict_trajectories``). Only the final assembly into JSON dicts loops,
+once per patient.
+"""
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+HORIZON = 12
+LOOKBACK = 3
+TREATMENT_IMPACT = {"combined": 92, "chemo": 78}
+DEFAULT_TREATMENT_IMPACT = 74
+
+
+def _level(score: int) -> str:
+    return "High" if score >= 70 else ("Medium" if score >= 40 else "Low")
+
+
+def _survival(index: np.ndarray, treatment: str) -> np.ndarray:
+    bonus = 5 if treatment == "combined" else 0
+    return np.clip(100 - index * 2 + bonus, 40.0, 100.0).round(1)
+
+
+def combine_sources(sources: Sequence[Tuple[str, pd.DataFrame]]) -> pd.DataFrame:
+    """One long frame with a ``gid`` per (source, patient), rows in /analyze order within each group"""
+    parts = []
+    for source, df in sources:
+        provides = df.attrs["schema"].provides
+        parts.append(pd.DataFrame({
+            "source": source,
+            "patient_id": df["patient_id"].astype(object),
+            "month_index": df["month_index"].astype("float64"),
+            "tumor_size_cm": df["tumor_size_cm"].astype("float64"),
+            "stage": df["stage"].astype(object),
+            "response": df["response"].astype(object),
+            "has_response": "response" in provides,
+        }))
+    frame = pd.concat(parts, ignore_index=True)
+    # Rows without a patient id stay together as one series per source, as in /analyze
+    frame["group_pid"] = frame["patient_id"].fillna("")
+    frame["gid"] = frame.groupby(["source", "group_pid"], sort=False).ngroup()
+    return frame.sort_values(["gid", "month_index"], kind="stable", na_position="last").reset_index(drop=True)
+
+
+def analyze_batch(
+    sources: Sequence[Tuple[str, pd.DataFrame]],
+    treatment: str,
+    model=None,
+    predict_many: Optional[Callable] = None,
+) -> List[dict]:
+    """Per-(source, patient) /analyze results for ``sources`` of (label, normalized frame)"""
+    if not sources:
+        return []
+    frame = combine_sources(sources)
+    by_group = frame.groupby("gid", sort=True)
+
+    # Historical evolution, one row per follow-up
+    position = by_group.cumcount().to_numpy()
+    has_months = frame["month_index"].notna().groupby(frame["gid"]).transform("any").to_numpy(dtype=bool)
+    month_label = np.where(has_months, frame["month_index"].fillna(0).to_numpy(), position).astype(int)
+    sizes = frame.groupby("gid")["tumor_size_cm"].ffill()
+    sizes = sizes.groupby(frame["gid"]).bfill()
+    frame["size"] = sizes
+    history = pd.DataFrame({
+        "gid": frame["gid"],
+        "month": ["Month %d" % m for m in month_label],
+        "tumorSize": np.fmax(0.1, sizes.to_numpy()).round(2),
+        "survivalProb": _survival(position, treatment),
+    })
+
+    # Per-group summary
+    groups = by_group.agg(
+        source=("source", "first"),
+        patient_id=("patient_id", "first"),
+        rows=("size", "size"),
+        baseline=("size", "first"),
+        last=("size", "last"),
+        month_max=("month_index", "max"),
+        stage=("stage", "first"),
+        has_response=("has_response", "first"),
+    )
+    groups["has_months"] = by_group["month_index"].count() > 0
+    baseline = np.fmax(0.1, groups["baseline"].to_numpy(dtype=float))
+    last = np.fmax(0.1, groups["last"].to_numpy(dtype=float))
+    growth_ratio = last / baseline
+    growth_rate = (last - baseline) / np.maximum(1, groups["rows"].to_numpy() - 1)
+    trend_impact = np.minimum(100, np.trunc(growth_ratio * 50)).astype(int)
+    rate_impact = np.minimum(100, np.trunc(np.abs(growth_rate) * 30)).astype(int)
+
+    stage = groups["stage"].astype("string")
+    t_num = stage.str.upper().str.extract(r"T(\d)", expand=False).astype("float64")
+    stage_severity = np.minimum(100, 25 * np.maximum(0, t_num - 1)).fillna(0).astype(int).to_numpy()
+
+    responses = frame.loc[frame["has_response"], ["gid", "response"]].dropna()
+    responses = responses.assign(response=responses["response"].astype(str).str.lower())
+    counts = responses.groupby(["gid", "response"], sort=False).size().reset_index(name="n")
+    counts = counts.sort_values(["gid", "n"], ascending=[True, False], kind="stable")
+    totals = counts.groupby("gid")["n"].sum()
+    good = counts[counts["response"].isin(["excellent", "good"])].groupby("gid")["n"].sum()
+    good_like = good.reindex(groups.index, fill_value=0) / totals.reindex(groups.index, fill_value=0).replace(0, 1)
+    response_impact = np.trunc((1 - good_like) * 100).astype(int).to_numpy()
+    mixes = {gid: dict(zip(g["response"], g["n"].astype(int).tolist())) for gid, g in counts.groupby("gid", sort=False)}
+
+    # One batched rollout for every group
+    forecasts = None
+    if model is not None and predict_many is not None:
+        forecasts = predict_many(model, groups["last"].fillna(0.1).to_numpy(dtype="float32"), HORIZON, LOOKBACK)
+        forecasts = forecasts[:, 1:] if forecasts.shape[1] > 1 else forecasts
+        next_base = np.where(
+            groups["has_months"].to_numpy(),
+            groups["month_max"].fillna(0).to_numpy(),
+            groups["rows"].to_numpy() - 1,
+        ).astype(int)
+        forecast_index = next_base[:, None] + np.arange(1, forecasts.shape[1] + 1)[None, :]
+        forecast_sizes = np.fmax(0.1, forecasts.astype("float64")).round(2)
+        forecast_survival = _survival(forecast_index, treatment)
+
+    treatment_impact = TREATMENT_IMPACT.get(treatment, DEFAULT_TREATMENT_IMPACT)
+    evolution_by_group = history.drop(columns="gid").to_dict(orient="records")
+    bounds = np.concatenate([[0], np.cumsum(groups["rows"].to_numpy())])
+    results = []
+    for i, gid in enumerate(groups.index):
+        evolution = evolution_by_group[bounds[i]:bounds[i + 1]]
+        if forecasts is not None:
+            evolution = evolution + [
+                {"month": f"Month {idx}", "tumorSize": float(sz), "survivalProb": float(sv)}
+                for idx, sz, sv in zip(forecast_index[i].tolist(), forecast_sizes[i], forecast_survival[i])
+            ]
+        stage_value = groups["stage"].iat[i]
+        stage_value = None if pd.isna(stage_value) else str(stage_value)
+        risk_factors = [
+            {"factor": "Tumor Size Trend", "impact": int(trend_impact[i]), "description": "Relative growth from first to last"},
+            {"factor": "Growth Rate (/mo)", "impact": int(rate_impact[i]), "description": "Absolute monthly growth magnitude"},
+        ]
+        if stage_value is not None:
+            risk_factors.append({"factor": "Stage Severity", "impact": int(stage_severity[i]), "description": f"Stage parsed from CSV: {stage_value}"})
+        if groups["has_response"].iat[i]:
+            mix = mixes.get(gid, {})
+            risk_factors.append({"factor": "Treatment Response Mix", "impact": int(response_impact[i]), "description": f"Distribution: {mix}"})
+        risk_details = [
+            {"factor": rf["factor"], "score": rf["impact"], "level": _level(rf["impact"]), "description": rf["description"]}
+            for rf in risk_factors
+        ]
+        patient_id = groups["patient_id"].iat[i]
+        results.append({
+            "source": groups["source"].iat[i],
+            "patient_id": None if pd.isna(patient_id) else str(patient_id),
+            "evolution": evolution,
+            "riskFactors": risk_factors,
+            "treatmentImpact": treatment_impact,
+            "confidence": round(min(0.98, 0.65 + 0.02 * len(evolution) + (0.05 if model is not None else 0)), 2),
+            "stage": stage_value,
+            "riskDetails": risk_details,
+            "overallRisk": _level(int(np.mean([rf["impact"] for rf in risk_factors]))),
+        })
+    return results
@@ -0,0 +1,297 @@
+"""
+Index advisor benchmark for the API's hot query shapes
+
+Seeds a synthetic cohort into a scratch database, then records the EXPLAIN
+plan and latency of each endpoint query with and without the composite
+indexes declared in models/database_models.py.
+
+All tables in the scratch database are dropped and recreated. By default it
+is a temporary SQLite file removed afterwards; any other ``--database-url``
+is refused unless ``--destroy`` is passed as well.
+
+Usage:
+    python benchmark_indexes.py [--patients 20000] [--repeats 200] [--output report.json]
+    python benchmark_indexes.py --database-url mysql+pymysql://... --destroy
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select, text
+
+from database import Base, is_memory_url
+from models.database_models import (
+    User, Patient, PatientFollowup, Prediction, PatientAssignment, UserSession,
+    GenderEnum, SmokingStatusEnum, AlcoholUseEnum, OralHygieneEnum, HPVStatusEnum,
+    TreatmentTypeEnum, ResponseEnum, ActionTypeEnum, UserRoleEnum,
+)
+
+BENCH_INDEXES = [
+    "ix_patient_followups_patient_month",
+    "ix_predictions_patient_date",
+    "ix_patient_assignments_user_active",
+    "ix_user_sessions_user_created",
+]
+
+
+def _insert_batches(conn, table, rows, batch_size=5000):
+    for start in range(0, len(rows), batch_size):
+        conn.execute(table.insert(), rows[start:start + batch_size])
+
+
+def seed(engine, patients, followups_per_patient, predictions_per_patient, users, sessions_per_user, seed_value=42):
+    """Bulk-load a synthetic cohort"""
+    rng = random.Random(seed_value)
+    base_date = datetime(2024, 1, 1)
+    stages = ["T1N0M0", "T2N0M0", "T2N1M0", "T3N1M0", "T4aN2bM0"]
+    patient_ids = [f"S{i:07d}" for i in range(patients)]
+
+    with engine.begin() as conn:
+        _insert_batches(conn, Patient.__table__, [
+            {
+                "patient_id": pid,
+                "age": rng.randint(30, 85),
+                "gender": rng.choice(list(GenderEnum)),
+                "stage_tnm": rng.choice(stages),
+                "initial_tumor_size_cm": round(rng.uniform(0.5, 6.0), 2),
+                "smoking_status": rng.choice(list(SmokingStatusEnum)),
+                "alcohol_use": rng.choice(list(AlcoholUseEnum)),
+                "oral_hygiene": rng.choice(list(OralHygieneEnum)),
+                "hpv_status": rng.choice(list(HPVStatusEnum)),
+                "comorbidities": "None",
+            }
+            for pid in patient_ids
+        ])
+
+        followups = []
+        predictions = []
+        for pid in patient_ids:
+            treatment = rng.choice(list(TreatmentTypeEnum))
+            size = rng.uniform(0.5, 6.0)
+            for month in range(1, followups_per_patient + 1):
+                size = max(0.1, size + rng.uniform(-0.3, 0.3))
+                followups.append({
+                    "patient_id": pid,
+                    "follow_up_month": month,
+                    "tumor_size_cm": round(size, 2),
+                    "recurrence": False,
+                    "treatment_type": treatment,
+                    "response_to_treatment": rng.choice(list(ResponseEnum)),
+                    "follow_up_date": base_date + timedelta(days=30 * month),
+                })
+            for k in range(predictions_per_patient):
+                predictions.append({
+                    "patient_id": pid,
+                    "prediction_date": base_date + timedelta(days=rng.randint(0, 365)),
+                    "treatment_type": "chemo",
+                    "predicted_evolution": [],
+                    "risk_factors": [],
+                    "treatment_impact": 78.0,
+                    "confidence": 0.87,
+                })
+        _insert_batches(conn, PatientFollowup.__table__, followups)
+        _insert_batches(conn, Prediction.__table__, predictions)
+
+        _insert_batches(conn, User.__table__, [
+            {
+                "user_id": f"bench_user_{u}",
+                "username": f"bench_user_{u}",
+                "email": f"bench_user_{u}@example.com",
+                "full_name": f"Bench User {u}",
+                "role": UserRoleEnum.DOCTOR,
+            }
+            for u in range(users)
+        ])
+        user_pks = conn.execute(select(User.id)).scalars().all()
+
+        _insert_batches(conn, PatientAssignment.__table__, [
+            {
+                "user_id": user_pks[i % len(user_pks)],
+                "patient_id": pid,
+                "assignment_type": "primary",
+                "is_active": rng.random() > 0.1,
+            }
+            for i, pid in enumerate(patient_ids)
+        ])
+
+        _insert_batches(conn, UserSession.__table__, [
+            {
+                "session_id": f"bench_{uid}_{k}",
+                "user_id": uid,
+                "patient_id": rng.choice(patient_ids),
+                "action_type": rng.choice(list(ActionTypeEnum)),
+                "created_at": base_date + timedelta(minutes=rng.randint(0, 525600)),
+            }
+            for uid in user_pks
+            for k in range(sessions_per_user)
+        ])
+
+    return patient_ids, user_pks
+
+
+def query_shapes(patient_ids, user_pks):
+    """Endpoint query shapes, each as (name, factory) producing a fresh statement"""
+    def followups_by_patient(rng):
+        return (select(PatientFollowup)
+                .where(PatientFollowup.patient_id == rng.choice(patient_ids))
+                .order_by(PatientFollowup.follow_up_month))
+
+    def predictions_by_patient(rng):
+        return (select(Prediction)
+                .where(Prediction.patient_id == rng.choice(patient_ids))
+                .order_by(Prediction.prediction_date.desc()))
+
+    def active_assignments(rng):
+        return (select(PatientAssignment.patient_id)
+                .where(PatientAssignment.user_id == rng.choice(user_pks), PatientAssignment.is_active == True))
+
+    def recent_sessions(rng):
+        return (select(UserSession)
+                .where(UserSession.user_id == rng.choice(user_pks))
+                .order_by(UserSession.created_at.desc())
+                .limit(10))
+
+    def trends_page(rng):
+        start = rng.randrange(max(1, len(patient_ids) - 100))
+        page = patient_ids[start:start + 100]
+        return (select(PatientFollowup.patient_id, PatientFollowup.follow_up_month, PatientFollowup.tumor_size_cm)
+                .where(PatientFollowup.patient_id.in_(page))
+                .order_by(PatientFollowup.patient_id, PatientFollowup.follow_up_month))
+
+    def dashboard_response_mix(rng):
+        assigned = (select(PatientAssignment.patient_id)
+                    .where(PatientAssignment.user_id == rng.choice(user_pks), PatientAssignment.is_active == True)
+                    .scalar_subquery())
+        return (select(PatientFollowup.treatment_type, PatientFollowup.response_to_treatment, func.count(PatientFollowup.id))
+                .where(PatientFollowup.patient_id.in_(assigned))
+                .group_by(PatientFollowup.treatment_type, PatientFollowup.response_to_treatment))
+
+    return [
+        ("followups_by_patient", followups_by_patient),
+        ("predictions_by_patient", predictions_by_patient),
+        ("active_assignments", active_assignments),
+        ("recent_sessions", recent_sessions),
+        ("patient_trends_page", trends_page),
+        ("dashboard_response_mix", dashboard_response_mix),
+    ]
+
+
+def explain(conn, stmt):
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    return [" | ".join(str(v) for v in row) for row in conn.execute(text(prefix + sql))]
+
+
+def measure(engine, shapes, repeats, seed_value=7):
+    results = {}
+    with engine.connect() as conn:
+        for name, factory in shapes:
+            rng = random.Random(seed_value)
+            plan = explain(conn, factory(rng))
+            timings = []
+            for _ in range(repeats):
+                stmt = factory(rng)
+                t0 = time.perf_counter()
+                conn.execute(stmt).fetchall()
+                timings.append((time.perf_counter() - t0) * 1000.0)
+            timings.sort()
+            results[name] = {
+                "plan": plan,
+                "median_ms": round(statistics.median(timings), 3),
+                "p95_ms": round(timings[int(0.95 * (len(timings) - 1))], 3),
+            }
+    return results
+
+
+def set_indexes(engine, enabled):
+    indexes = {ix.name: ix for table in Base.metadata.sorted_tables for ix in table.indexes}
+    for name in BENCH_INDEXES:
+        if enabled:
+            indexes[name].create(bind=engine, checkfirst=True)
+        else:
+            indexes[name].drop(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Scratch database URL (default: temporary SQLite file)")
+    parser.add_argument("--destroy", action="store_true",
+                        help="Allow dropping every table in --database-url (required for any non-temporary URL)")
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--followups-per-patient", type=int, default=12)
+    parser.add_argument("--predictions-per-patient", type=int, default=3)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--sessions-per-user", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    url = args.database_url
+    if url is not None and not is_memory_url(url) and not args.destroy:
+        parser.error(f"refusing to drop all tables in {url}; pass --destroy if it is a scratch database")
+
+    tmp_dir = None
+    if url is None:
+        tmp_dir = tempfile.mkdtemp(prefix="tumor_bench_")
+        url = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    try:
+        benchmark(url, args)
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def benchmark(url, args):
+    """Seed ``url`` (dropping its tables), measure both index settings and print the report"""
+    engine = create_engine(url)
+
+    print(f"📦 Seeding {args.patients} patients into {url} ...")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    t0 = time.perf_counter()
+    patient_ids, user_pks = seed(
+        engine, args.patients, args.followups_per_patient, args.predictions_per_patient,
+        args.users, args.sessions_per_user,
+    )
+    print(f"✅ Seeded in {time.perf_counter() - t0:.1f}s")
+
+    shapes = query_shapes(patient_ids, user_pks)
+    report = {"database_url": url, "patients": args.patients, "repeats": args.repeats}
+    for label, enabled in (("without_indexes", False), ("with_indexes", True)):
+        set_indexes(engine, enabled)
+        print(f"⏱  Measuring {label.replace('_', ' ')} ...")
+        report[label] = measure(engine, shapes, args.repeats)
+
+    print()
+    print(f"{'query':<26}{'no index (ms)':>16}{'indexed (ms)':>16}{'speedup':>10}")
+    for name, _ in shapes:
+        before = report["without_indexes"][name]["median_ms"]
+        after = report["with_indexes"][name]["median_ms"]
+        speedup = before / after if after else float("inf")
+        print(f"{name:<26}{before:>16.3f}{after:>16.3f}{speedup:>9.1f}x")
+    for label in ("without_indexes", "with_indexes"):
+        print(f"\n--- plans {label.replace('_', ' ')} ---")
+        for name, _ in shapes:
+            print(f"{name}:")
+            for line in report[label][name]["plan"]:
+                print(f"    {line}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📝 Report written to {args.output}")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Concurrent read/write benchmark for the SQLite performance profile
+
+Runs the same mixed workload (reader threads fetching a patient's
+follow-ups, writer threads committing single follow-up rows, as the API
+does) against a default-configured SQLite engine and against the tuned
+profile from database.py, then reports throughput and lock errors.
+
+Usage:
+    python benchmark_sqlite.py [--readers 16] [--writers 2] [--seconds 10]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+
+from database import Base, create_sqlite_engine
+from models.database_models import PatientFollowup, TreatmentTypeEnum, ResponseEnum
+from benchmark_indexes import seed
+
+
+def run_workload(engine, patient_ids, readers, writers, seconds):
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def bump(key):
+        with lock:
+            counts[key] += 1
+
+    def reader(worker_id):
+        rng = random.Random(worker_id)
+        while not stop.is_set():
+            stmt = (select(PatientFollowup)
+                    .where(PatientFollowup.patient_id == rng.choice(patient_ids))
+                    .order_by(PatientFollowup.follow_up_month))
+            try:
+                with engine.connect() as conn:
+                    conn.execute(stmt).fetchall()
+                bump("reads")
+            except OperationalError:
+                bump("errors")
+
+    def writer(worker_id):
+        rng = random.Random(1000 + worker_id)
+        month = 100
+        while not stop.is_set():
+            month += 1
+            row = {
+                "patient_id": rng.choice(patient_ids),
+                "follow_up_month": month,
+                "tumor_size_cm": round(rng.uniform(0.5, 6.0), 2),
+                "recurrence": False,
+                "treatment_type": rng.choice(list(TreatmentTypeEnum)),
+                "response_to_treatment": rng.choice(list(ResponseEnum)),
+            }
+            try:
+                with engine.begin() as conn:
+                    conn.execute(PatientFollowup.__table__.insert(), row)
+                bump("writes")
+            except OperationalError:
+                bump("errors")
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "reads_per_sec": round(counts["reads"] / elapsed, 1),
+        "writes_per_sec": round(counts["writes"] / elapsed, 1),
+        "errors": counts["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="tumor_sqlite_bench_")
+    profiles = {
+        # The engine configuration database.py used before the tuned profile
+        "default": lambda url: create_engine(url, connect_args={"check_same_thread": False}),
+        "tuned": lambda url: create_sqlite_engine(url, tuned=True),
+    }
+    results = {}
+    try:
+        for name, factory in profiles.items():
+            url = f"sqlite:///{os.path.join(tmp_dir, name + '.db')}"
+            engine = factory(url)
+            Base.metadata.create_all(bind=engine)
+            patient_ids, _ = seed(engine, args.patients, 12, 1, 20, 10)
+            print(f"⏱  {name}: {args.readers} readers / {args.writers} writers for {args.seconds:.0f}s ...")
+            results[name] = run_workload(engine, patient_ids, args.readers, args.writers, args.seconds)
+            engine.dispose()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print()
+    print(f"{'profile':<10}{'reads/s':>12}{'writes/s':>12}{'errors':>10}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['reads_per_sec']:>12.1f}{r['writes_per_sec']:>12.1f}{r['errors']:>10}")
+    base, tuned = results["default"], results["tuned"]
+    if base["reads_per_sec"]:
+        print(f"\nRead throughput gain: {tuned['reads_per_sec'] / base['reads_per_sec']:.1f}x")
+    if base["writes_per_sec"]:
+        print(f"Write throughput gain: {tuned['writes_per_sec'] / base['writes_per_sec']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
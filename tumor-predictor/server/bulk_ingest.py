@@ -0,0 +1,285 @@
+"""
+Bulk loader for uploaded cohort CSVs
+
+Validates and normalizes a follow-up export, maps it onto ``patients`` and
+``patient_followups`` and loads it with batched executemany upserts inside a
+single transaction.
+
+Usage:
+    python bulk_ingest.py path/to/export.csv [--batch-size 5000] [--chunk-rows 200000]
+"""
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, delete, func, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, upsert
+from models.analytics_summary import METRIC_PATIENTS, adjust_followups, adjust_total, ensure_summary
+from models.report_cache import report_cache
+from models.database_models import (
+    Patient, PatientFollowup,
+    GenderEnum, SmokingStatusEnum, AlcoholUseEnum, OralHygieneEnum, HPVStatusEnum,
+    TreatmentTypeEnum, ResponseEnum,
+)
+from schema_normalizer import normalize_frame
+
+REQUIRED_COLUMNS = ["patient_id", "month_index", "tumor_size_cm", "treatment_type", "response"]
+
+ENUM_COLUMNS = {
+    "gender": GenderEnum,
+    "smoking_status": SmokingStatusEnum,
+    "alcohol_use": AlcoholUseEnum,
+    "oral_hygiene": OralHygieneEnum,
+    "hpv_status": HPVStatusEnum,
+    "treatment_type": TreatmentTypeEnum,
+    "response": ResponseEnum,
+}
+
+PATIENT_COLUMNS = [
+    "age", "gender", "stage_tnm", "smoking_status", "alcohol_use", "oral_hygiene", "hpv_status",
+]
+
+def _map_enum(series: pd.Series, enum_cls) -> pd.Series:
+    """Map free-text values onto enum members, matching on the distinct values only"""
+    lookup = {member.value.lower(): member for member in enum_cls}
+    lookup.update({member.name.lower(): member for member in enum_cls})
+    codes, uniques = pd.factorize(series)
+    # Trailing None so missing values (code -1) map to None
+    members = np.array([lookup.get(str(u).strip().lower()) for u in uniques] + [None], dtype=object)
+    return pd.Series(members[codes], index=series.index, dtype=object)
+
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Canonicalize a follow-up frame via ``schema_normalizer`` and map enum columns
+
+    Raises ValueError when a required follow-up column is missing.
+    """
+    frame = normalize_frame(df)
+    provided = frame.attrs["schema"].provides
+    missing = [c for c in REQUIRED_COLUMNS if c not in provided]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    out = frame[["patient_id", "month_index", "tumor_size_cm"]].copy()
+    if "age" in provided:
+        out["age"] = frame["age"]
+    if "stage" in provided:
+        out["stage_tnm"] = frame["stage"]
+    out["recurrence"] = frame["recurrence"].fillna(False).astype(bool)
+    if "comorbidities" in provided:
+        out["comorbidities"] = frame["comorbidities"]
+    if "follow_up_date" in provided:
+        out["follow_up_date"] = frame["follow_up_date"]
+    for column, enum_cls in ENUM_COLUMNS.items():
+        if column in provided:
+            out[column] = _map_enum(frame[column], enum_cls)
+    return out
+
+
+def _column(series: pd.Series) -> list:
+    """Python-native values with missing entries as None"""
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _records(columns: Dict[str, list]) -> List[Dict]:
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+def _patient_rows(followups: pd.DataFrame, stored_first_month: Dict[str, Optional[int]]) -> List[Dict]:
+    """One row per patient, taking attributes from its earliest follow-up
+
+    Patients already in the database are only rewritten when this frame
+    reaches back to (or before) their earliest stored follow-up, so a later
+    chunk or upload with newer months keeps the baseline attributes.
+    """
+    if not all(c in followups.columns for c in PATIENT_COLUMNS):
+        return []
+    first = followups.sort_values("month_index").drop_duplicates("patient_id", keep="first")
+    first = first.dropna(subset=PATIENT_COLUMNS)
+    # NaN for new patients and for patients without stored follow-ups
+    stored = first["patient_id"].astype(object).map(stored_first_month).astype("float64")
+    first = first[stored.isna() | (first["month_index"].astype("float64") <= stored)]
+    comorbidities = first["comorbidities"] if "comorbidities" in first.columns else pd.Series(None, index=first.index)
+    return _records({
+        "patient_id": _column(first["patient_id"]),
+        "age": first["age"].astype(int).tolist(),
+        "gender": _column(first["gender"]),
+        "stage_tnm": _column(first["stage_tnm"]),
+        "initial_tumor_size_cm": first["tumor_size_cm"].astype(float).tolist(),
+        "smoking_status": _column(first["smoking_status"]),
+        "alcohol_use": _column(first["alcohol_use"]),
+        "oral_hygiene": _column(first["oral_hygiene"]),
+        "hpv_status": _column(first["hpv_status"]),
+        "comorbidities": _column(comorbidities),
+    })
+
+
+def _followup_rows(followups: pd.DataFrame) -> List[Dict]:
+    dates = followups["follow_up_date"] if "follow_up_date" in followups.columns else pd.Series(None, index=followups.index)
+    return _records({
+        "patient_id": _column(followups["patient_id"]),
+        "follow_up_month": followups["month_index"].astype(int).tolist(),
+        "tumor_size_cm": followups["tumor_size_cm"].astype(float).tolist(),
+        "recurrence": followups["recurrence"].astype(bool).tolist(),
+        "treatment_type": _column(followups["treatment_type"]),
+        "response_to_treatment": _column(followups["response"]),
+        "follow_up_date": [d.to_pydatetime() if d is not None else None for d in _column(dates)],
+    })
+
+
+def load_dataframe(df: pd.DataFrame, db: Optional[Session] = None, batch_size: int = 5000) -> dict:
+    """Validate, normalize and bulk-load a follow-up export
+
+    Patients are upserted on ``patient_id`` from their earliest follow-up
+    (see ``_patient_rows``); follow-ups replace any existing row for the same
+    (patient_id, follow_up_month). Everything, including the
+    analytics summary deltas, commits in one transaction.
+    """
+    return load_chunks([df], db=db, batch_size=batch_size)
+
+
+def load_chunks(chunks: Iterable[pd.DataFrame], db: Optional[Session] = None, batch_size: int = 5000) -> dict:
+    """``load_dataframe`` over an iterable of frames (e.g. ``read_csv(chunksize=...)``)
+
+    All chunks load in one transaction; a later chunk's row for the same
+    (patient_id, follow_up_month) replaces an earlier one.
+    """
+    started = time.perf_counter()
+    totals = {"followups_loaded": 0, "rows_rejected": 0}
+    touched = set()
+    upserted = set()
+
+    owns_session = db is None
+    db = db or SessionLocal()
+    try:
+        # The load only adds deltas, so the summary has to exist first
+        ensure_summary(db)
+        conn = db.connection()
+        for df in chunks:
+            stats, patient_ids, upserted_ids = _load_frame(db, conn, df, batch_size)
+            for key, value in stats.items():
+                totals[key] += value
+            touched.update(patient_ids)
+            upserted.update(upserted_ids)
+
+        db.commit()
+        report_cache.invalidate(touched)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if owns_session:
+            db.close()
+
+    elapsed = time.perf_counter() - started
+    loaded = len(upserted) + totals["followups_loaded"]
+    return {
+        "patients_upserted": len(upserted),
+        **totals,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(loaded / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def _load_frame(db: Session, conn, df: pd.DataFrame, batch_size: int):
+    frame = normalize(df)
+    valid = frame.dropna(subset=REQUIRED_COLUMNS)
+    valid = valid[valid["patient_id"].str.len() > 0]
+    valid = valid.drop_duplicates(["patient_id", "month_index"], keep="last")
+    rejected = int(frame.shape[0] - valid.shape[0])
+
+    upload_ids = valid["patient_id"].unique().tolist()
+
+    # Patients already in the database may have follow-ups to replace;
+    # their earliest stored month decides whether the baseline is rewritten
+    stored_first_month = {}
+    for start in range(0, len(upload_ids), batch_size):
+        chunk = upload_ids[start:start + batch_size]
+        stored_first_month.update(
+            db.query(Patient.patient_id, func.min(PatientFollowup.follow_up_month))
+            .outerjoin(PatientFollowup, PatientFollowup.patient_id == Patient.patient_id)
+            .filter(Patient.patient_id.in_(chunk))
+            .group_by(Patient.patient_id)
+        )
+    pre_existing = set(stored_first_month)
+
+    patients = _patient_rows(valid, stored_first_month)
+    if patients:
+        patient_table = Patient.__table__
+        patient_stmt = upsert(
+            conn, patient_table, index_elements=["patient_id"],
+            update=lambda incoming: {c: getattr(incoming, c) for c in PATIENT_COLUMNS + ["initial_tumor_size_cm", "comorbidities"]},
+        )
+        for start in range(0, len(patients), batch_size):
+            conn.execute(patient_stmt, patients[start:start + batch_size])
+
+    # Follow-ups need a patient row (FK)
+    loadable_ids = pre_existing | {p["patient_id"] for p in patients}
+    loadable = valid[valid["patient_id"].isin(loadable_ids)]
+    rejected += int(valid.shape[0] - loadable.shape[0])
+
+    # Core writes bypass the ORM hooks, so the summary gets this frame's deltas
+    adjust_total(conn, METRIC_PATIENTS, len({p["patient_id"] for p in patients} - pre_existing))
+    counts = Counter(zip(loadable["treatment_type"], loadable["response"]))
+
+    followup_table = PatientFollowup.__table__
+    replaced = loadable[loadable["patient_id"].isin(pre_existing)]
+    if not replaced.empty:
+        counts.subtract(_stored_counts(conn, replaced, batch_size))
+        replace_stmt = delete(followup_table).where(
+            followup_table.c.patient_id == bindparam("pid"),
+            followup_table.c.follow_up_month == bindparam("month"),
+        )
+        keys = _records({
+            "pid": _column(replaced["patient_id"]),
+            "month": replaced["month_index"].astype(int).tolist(),
+        })
+        for start in range(0, len(keys), batch_size):
+            conn.execute(replace_stmt, keys[start:start + batch_size])
+
+    followups = _followup_rows(loadable)
+    for start in range(0, len(followups), batch_size):
+        conn.execute(followup_table.insert(), followups[start:start + batch_size])
+    adjust_followups(conn, counts)
+
+    stats = {"followups_loaded": len(followups), "rows_rejected": rejected}
+    return stats, loadable_ids, {p["patient_id"] for p in patients}
+
+
+def _stored_counts(conn, replaced: pd.DataFrame, batch_size: int) -> Counter:
+    """(treatment, response) counts of the stored follow-ups that ``replaced`` overwrites"""
+    table = PatientFollowup.__table__
+    keys = set(zip(replaced["patient_id"].astype(object), replaced["month_index"].astype(int)))
+    patient_ids = sorted({pid for pid, _ in keys})
+    counts = Counter()
+    for start in range(0, len(patient_ids), batch_size):
+        rows = conn.execute(
+            select(table.c.patient_id, table.c.follow_up_month, table.c.treatment_type, table.c.response_to_treatment)
+            .where(table.c.patient_id.in_(patient_ids[start:start + batch_size]))
+        )
+        counts.update((r.treatment_type, r.response_to_treatment) for r in rows if (r.patient_id, r.follow_up_month) in keys)
+    return counts
+
+
+def main(argv: List[str]) -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv_path")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--chunk-rows", type=int, default=200000, help="CSV rows parsed per chunk")
+    args = parser.parse_args(argv)
+
+    print(f"📥 Loading {args.csv_path} ...")
+    stats = load_chunks(pd.read_csv(args.csv_path, chunksize=args.chunk_rows), batch_size=args.batch_size)
+    print(f"✅ {stats['patients_upserted']} patients, {stats['followups_loaded']} follow-ups "
+          f"({stats['rows_rejected']} rejected) in {stats['seconds']}s — {stats['rows_per_sec']} rows/sec")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
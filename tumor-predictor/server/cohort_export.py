@@ -0,0 +1,172 @@
+"""
+Streaming cohort export
+
+Each dataset is read with ``yield_per`` (a server-side cursor where the
+driver supports one) and encoded chunk by chunk, so an export of the whole
+database runs in constant memory and the first bytes go out as soon as the
+first chunk is read. CSV and NDJSON are always available; Parquet needs
+``pyarrow``.
+"""
+import csv
+import decimal
+import enum
+import io
+import json
+from datetime import date, datetime
+from typing import Iterator, List
+
+from sqlalchemy import select
+from sqlalchemy import types as sqltypes
+
+from database import SessionLocal
+from models.database_models import Patient, PatientFollowup, Prediction
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None  # Parquet export unavailable without pyarrow
+    pq = None
+
+DATASETS = {
+    "patients": Patient.__table__,
+    "followups": PatientFollowup.__table__,
+    "predictions": Prediction.__table__,
+}
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+DEFAULT_CHUNK_ROWS = 2000
+
+
+def _scalar(value):
+    """Flat representation used by CSV and Parquet (JSON columns become strings)"""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _json_value(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _chunks(table, chunk_rows: int) -> Iterator[List[tuple]]:
+    db = SessionLocal()
+    try:
+        result = db.execute(select(table).order_by(*table.primary_key.columns).execution_options(yield_per=chunk_rows))
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def stream_csv(table, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(table.columns.keys())
+    yield buf.getvalue().encode("utf-8")
+    for rows in _chunks(table, chunk_rows):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows([_scalar(v) for v in row] for row in rows)
+        yield buf.getvalue().encode("utf-8")
+
+
+def stream_ndjson(table, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[bytes]:
+    keys = table.columns.keys()
+    for rows in _chunks(table, chunk_rows):
+        lines = [json.dumps(dict(zip(keys, row)), default=_json_value) for row in rows]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _arrow_type(column_type):
+    if isinstance(column_type, sqltypes.Boolean):
+        return pa.bool_()
+    if isinstance(column_type, sqltypes.Integer):
+        return pa.int64()
+    if isinstance(column_type, (sqltypes.Float, sqltypes.Numeric)):
+        return pa.float64()
+    if isinstance(column_type, sqltypes.DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, sqltypes.Date):
+        return pa.date32()
+    return pa.string()  # String, Text, Enum, JSON
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose buffered bytes are taken by the stream"""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buf.extend(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def stream_parquet(table, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[bytes]:
+    """One row group per chunk"""
+    schema = pa.schema([(c.name, _arrow_type(c.type)) for c in table.columns])
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for rows in _chunks(table, chunk_rows):
+            columns = list(zip(*rows))
+            batch = pa.record_batch(
+                [pa.array([_scalar(v) for v in values], type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            )
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_stream(dataset: str, fmt: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[bytes]:
+    """Byte stream for ``dataset`` in ``fmt``
+
+    Raises ValueError for unknown datasets/formats or when Parquet is requested
+    without pyarrow installed.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset '{dataset}' (expected one of: {', '.join(DATASETS)})")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}' (expected one of: {', '.join(FORMATS)})")
+    table = DATASETS[dataset]
+    if fmt == "parquet":
+        if pa is None:
+            raise ValueError("Parquet export requires pyarrow")
+        return stream_parquet(table, chunk_rows)
+    if fmt == "ndjson":
+        return stream_ndjson(table, chunk_rows)
+    return stream_csv(table, chunk_rows)
@@ -0,0 +1,108 @@
+"""
+Parsed CSV cache for /analyze
+
+The front end re-runs /analyze on the same upload every time the user
+switches treatment. ``FrameCache.load`` keeps the normalized frame for each
+path, sorted by month, together with its gap-filled size series. It is keyed
+by (size, mtime) from ``os.stat``, so a rewritten file is reparsed and the
+old entry is replaced. Entries are evicted LRU once their pandas memory
+footprint passes ``FRAME_CACHE_MAX_BYTES``. Cached frames are shared between
+requests and must be treated as read-only.
+"""
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import pandas as pd
+
+from schema_normalizer import read_normalized
+
+FRAME_CACHE_MAX_BYTES = int(os.getenv("FRAME_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+@dataclass(frozen=True)
+class AnalysisFrame:
+    frame: pd.DataFrame  # normalized, sorted by month_index when the file has one
+    sizes: pd.Series  # tumor_size_cm, forward/back filled
+    has_months: bool
+    nbytes: int
+
+
+def prepare_frame(path: str) -> AnalysisFrame:
+    """Read, normalize and sort one CSV (uncached)"""
+    return analysis_frame(read_normalized(path))
+
+
+def analysis_frame(df: pd.DataFrame) -> AnalysisFrame:
+    """Sort a normalized frame by month and gap-fill its sizes"""
+    has_months = bool(df["month_index"].notna().any())
+    if has_months:
+        df = df.sort_values(by=["month_index"]).reset_index(drop=True)
+    sizes = df["tumor_size_cm"].ffill().bfill()
+    nbytes = int(df.memory_usage(deep=True).sum() + sizes.memory_usage(deep=True))
+    return AnalysisFrame(df, sizes, has_months, nbytes)
+
+
+class FrameCache:
+    """Thread-safe LRU of ``AnalysisFrame`` per path, bounded by total bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def load(self, path: str) -> AnalysisFrame:
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        version = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            if entry is not None:
+                self.stale += 1
+
+        # Parse outside the lock; concurrent misses on the same file both parse
+        prepared = prepare_frame(path)
+        if prepared.nbytes > self.max_bytes:
+            return prepared
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1].nbytes
+            self._entries[key] = (version, prepared)
+            self._bytes += prepared.nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+        return prepared
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+            }
+
+
+frame_cache = FrameCache(FRAME_CACHE_MAX_BYTES)
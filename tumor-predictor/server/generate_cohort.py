@@ -0,0 +1,409 @@
+"""
+Synthetic cohort generator for load and benchmark data
+
+Produces patients whose follow-up trajectories follow the three reference
+profiles in data/ (A001 aggressive growth, B001 moderate linear response,
+C001 fast early response that levels off), plus predictions and doctors with
+patient assignments. Output is CSV parts in the data/ follow-up schema
+and/or bulk inserts into the configured database (DATABASE_URL).
+
+Patients are generated in fixed-size shards across a process pool. Each shard
+has its own RNG derived from (seed, shard index), so output is identical for a
+given seed regardless of worker count.
+
+Loading is re-runnable: patients are upserted, and a shard's synthetic
+follow-ups, predictions and assignments replace the ones a previous run
+loaded for the same patients, all in the shard's transaction.
+
+Usage:
+    python generate_cohort.py --patients 1000000 --csv-dir synthetic_data --load-db [--workers 8] [--seed 42]
+"""
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Column order of data/patient_*_data.csv
+CSV_COLUMNS = [
+    "Patient_ID", "Age", "Gender", "stage", "tumor_size_cm", "Recurrence", "treatment_type", "response",
+    "Smoking_Status", "Alcohol_Use", "Oral_Hygiene", "HPV_Status", "Comorbidities", "month_index",
+]
+
+# Per-profile distributions; values match the enums in models/database_models.py
+PROFILES = {
+    "A": {  # aggressive: steady growth despite multimodal treatment
+        "weight": 0.25,
+        "age": (63, 8),
+        "initial_size": (3.5, 5.5),
+        "trajectory": "linear",
+        "slope": (0.2, 0.05),
+        "stages": (["T4aN2bM0", "T4aN2cM0", "T3N2bM0", "T4bN2cM0"], [0.4, 0.2, 0.3, 0.1]),
+        "treatments": (["Surgery+Chemo+RT", "Chemo+RT"], [0.8, 0.2]),
+        "responses": (["Poor", "Fair"], [0.85, 0.15]),
+        "recurrence": 0.9,
+        "smoking": (["Current Smoker", "Former Smoker", "Never Smoked"], [0.7, 0.2, 0.1]),
+        "alcohol": (["Heavy Daily", "Moderate", "Light"], [0.6, 0.3, 0.1]),
+        "hygiene": (["Poor", "Very Poor", "Fair"], [0.5, 0.3, 0.2]),
+        "hpv": (["Negative", "Positive", "Unknown"], [0.75, 0.15, 0.1]),
+        "comorbidities": (["Diabetes, Hypertension", "Hypertension", "COPD", ""], [0.35, 0.3, 0.15, 0.2]),
+    },
+    "B": {  # moderate: slow linear shrinkage
+        "weight": 0.45,
+        "age": (55, 8),
+        "initial_size": (1.8, 3.2),
+        "trajectory": "linear",
+        "slope": (-0.09, 0.02),
+        "stages": (["T2N1M0", "T2N0M0", "T3N1M0", "T3N0M0"], [0.45, 0.25, 0.2, 0.1]),
+        "treatments": (["Surgery+RT", "Chemo+RT", "RT Only"], [0.7, 0.2, 0.1]),
+        "responses": (["Good", "Fair", "Excellent"], [0.75, 0.15, 0.1]),
+        "recurrence": 0.1,
+        "smoking": (["Quit 1.5 years ago", "Former Smoker", "Never Smoked", "Current Smoker"], [0.35, 0.3, 0.25, 0.1]),
+        "alcohol": (["Moderate", "Light", "None"], [0.5, 0.3, 0.2]),
+        "hygiene": (["Fair", "Good", "Poor"], [0.5, 0.35, 0.15]),
+        "hpv": (["Positive", "Negative", "Unknown"], [0.55, 0.35, 0.1]),
+        "comorbidities": (["", "Hypertension", "Diabetes"], [0.6, 0.25, 0.15]),
+    },
+    "C": {  # early responder: fast exponential shrinkage that levels off
+        "weight": 0.30,
+        "age": (47, 8),
+        "initial_size": (0.8, 1.6),
+        "trajectory": "decay",
+        "decay_rate": (0.35, 0.08),
+        "floor_ratio": (0.5, 0.05),
+        "stages": (["T1N0M0", "T1N1M0", "T2N0M0"], [0.7, 0.15, 0.15]),
+        "treatments": (["Surgery Only", "Surgery+RT"], [0.8, 0.2]),
+        "responses": (["Excellent", "Good"], [0.85, 0.15]),
+        "recurrence": 0.03,
+        "smoking": (["Current Smoker", "Never Smoked", "Former Smoker"], [0.4, 0.35, 0.25]),
+        "alcohol": (["Heavy Daily", "Light", "None", "Moderate"], [0.3, 0.3, 0.2, 0.2]),
+        "hygiene": (["Very Poor", "Poor", "Fair", "Good"], [0.3, 0.3, 0.2, 0.2]),
+        "hpv": (["Negative", "Positive", "Unknown"], [0.6, 0.3, 0.1]),
+        "comorbidities": (["", "Hypertension"], [0.85, 0.15]),
+    },
+}
+
+BASE_DATE = datetime(2022, 1, 1)
+
+
+def _choice(rng, spec, n):
+    values, probs = spec
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=n, p=probs)]
+
+
+def _dates(days_after_base):
+    return pd.to_datetime(np.datetime64(BASE_DATE, "D") + days_after_base.astype("timedelta64[D]"))
+
+
+def _trajectories(rng, profile, n, months):
+    """(n, months) tumor sizes in cm"""
+    lo, hi = profile["initial_size"]
+    start = rng.uniform(lo, hi, size=n)
+    steps = np.arange(months)
+    if profile["trajectory"] == "linear":
+        slope = rng.normal(*profile["slope"], size=n)
+        sizes = start[:, None] + slope[:, None] * steps[None, :]
+    else:
+        rate = np.clip(rng.normal(*profile["decay_rate"], size=n), 0.05, None)
+        floor = start * np.clip(rng.normal(*profile["floor_ratio"], size=n), 0.2, 0.9)
+        sizes = floor[:, None] + (start - floor)[:, None] * np.exp(-rate[:, None] * steps[None, :])
+    sizes = sizes + rng.normal(0.0, 0.04, size=sizes.shape)
+    return np.clip(np.round(sizes, 1), 0.1, None)
+
+
+def generate_shard(args):
+    """Generate patients [start, stop) with an RNG derived from (seed, shard)
+
+    Returns (patients, followups, predictions) DataFrames and writes the CSV
+    part when ``csv_dir`` is set.
+    """
+    shard, start, stop, months, predictions_per_patient, seed, csv_dir = args
+    rng = np.random.default_rng([seed, shard])
+    n = stop - start
+    names = list(PROFILES)
+    weights = np.array([PROFILES[k]["weight"] for k in names])
+    profile_idx = rng.choice(len(names), size=n, p=weights / weights.sum())
+    index = np.arange(start, stop)
+
+    patient_parts, followup_parts, prediction_parts = [], [], []
+    for k, name in enumerate(names):
+        mask = profile_idx == k
+        count = int(mask.sum())
+        if count == 0:
+            continue
+        profile = PROFILES[name]
+        ids = np.char.add(name, np.char.zfill(index[mask].astype(str), 7)).astype(object)
+        sizes = _trajectories(rng, profile, count, months)
+        patients = pd.DataFrame({
+            "patient_id": ids,
+            "age": np.clip(np.round(rng.normal(*profile["age"], size=count)), 25, 90).astype(np.int64),
+            "gender": _choice(rng, (["Male", "Female"], [0.65, 0.35]), count),
+            "stage_tnm": _choice(rng, profile["stages"], count),
+            "initial_tumor_size_cm": sizes[:, 0],
+            "smoking_status": _choice(rng, profile["smoking"], count),
+            "alcohol_use": _choice(rng, profile["alcohol"], count),
+            "oral_hygiene": _choice(rng, profile["hygiene"], count),
+            "hpv_status": _choice(rng, profile["hpv"], count),
+            "comorbidities": _choice(rng, profile["comorbidities"], count),
+            "treatment_type": _choice(rng, profile["treatments"], count),
+            "diagnosis_offset_days": rng.integers(0, 730, size=count),
+        })
+        patient_parts.append(patients)
+
+        # Long format: one row per (patient, month); the response is drawn per visit
+        month_index = np.tile(np.arange(1, months + 1), count)
+        repeat = np.repeat(np.arange(count), months)
+        recurrence = rng.random(count) < profile["recurrence"]
+        followup_parts.append(pd.DataFrame({
+            "patient_id": ids[repeat],
+            "month_index": month_index,
+            "tumor_size_cm": sizes.reshape(-1),
+            "recurrence": recurrence[repeat],
+            "treatment_type": patients["treatment_type"].to_numpy()[repeat],
+            "response": _choice(rng, profile["responses"], count * months),
+            "follow_up_date": _dates(patients["diagnosis_offset_days"].to_numpy()[repeat] + 30 * month_index),
+        }))
+
+        if predictions_per_patient:
+            pred_repeat = np.repeat(np.arange(count), predictions_per_patient)
+            prediction_parts.append(pd.DataFrame({
+                "patient_id": ids[pred_repeat],
+                "last_size": sizes[pred_repeat, -1],
+                "slope": (sizes[pred_repeat, -1] - sizes[pred_repeat, 0]) / max(1, months - 1),
+                "treatment_type": patients["treatment_type"].to_numpy()[pred_repeat],
+                "confidence": np.round(rng.uniform(0.7, 0.95, size=pred_repeat.size), 2),
+                "prediction_date": _dates(patients["diagnosis_offset_days"].to_numpy()[pred_repeat]
+                                          + 30 * months + rng.integers(0, 90, size=pred_repeat.size)),
+            }))
+
+    patients = pd.concat(patient_parts, ignore_index=True)
+    followups = pd.concat(followup_parts, ignore_index=True)
+    predictions = pd.concat(prediction_parts, ignore_index=True) if prediction_parts else None
+
+    if csv_dir:
+        attrs = patients.set_index("patient_id")
+        rows = followups.join(attrs.drop(columns=["treatment_type"]), on="patient_id")
+        csv = pd.DataFrame({
+            "Patient_ID": rows["patient_id"],
+            "Age": rows["age"],
+            "Gender": rows["gender"],
+            "stage": rows["stage_tnm"],
+            "tumor_size_cm": rows["tumor_size_cm"],
+            "Recurrence": np.where(rows["recurrence"], "Yes", "No"),
+            "treatment_type": rows["treatment_type"],
+            "response": rows["response"],
+            "Smoking_Status": rows["smoking_status"],
+            "Alcohol_Use": rows["alcohol_use"],
+            "Oral_Hygiene": rows["oral_hygiene"],
+            "HPV_Status": rows["hpv_status"],
+            "Comorbidities": rows["comorbidities"],
+            "month_index": rows["month_index"],
+        }, columns=CSV_COLUMNS)
+        csv.to_csv(os.path.join(csv_dir, f"cohort_part_{shard:05d}.csv"), index=False)
+
+    return shard, patients, followups, predictions
+
+
+def _evolution(last_size, slope, horizon=12):
+    return [
+        {
+            "month": f"Month {m}",
+            "tumorSize": round(max(0.1, last_size + slope * m), 2),
+            "survivalProb": round(min(100.0, max(40.0, 100.0 - 2 * m - 10 * max(0.0, slope))), 1),
+        }
+        for m in range(horizon + 1)
+    ]
+
+
+class DatabaseLoader:
+    """Bulk-loads generated shards into the configured database"""
+
+    def __init__(self, users, batch_size=10000):
+        from database import create_tables, create_indexes, engine, upsert
+        from models.database_models import (
+            User, Patient, PatientFollowup, Prediction, PatientAssignment,
+            GenderEnum, SmokingStatusEnum, AlcoholUseEnum, OralHygieneEnum, HPVStatusEnum,
+            TreatmentTypeEnum, ResponseEnum, UserRoleEnum,
+        )
+        from sqlalchemy import select
+
+        create_tables()
+        create_indexes()
+        self.engine = engine
+        self.upsert = upsert
+        self.batch_size = batch_size
+        self.tables = {
+            "patients": Patient.__table__,
+            "followups": PatientFollowup.__table__,
+            "predictions": Prediction.__table__,
+            "assignments": PatientAssignment.__table__,
+        }
+        # Enum columns bind members, not display values
+        self.enum_maps = {
+            column: {m.value: m for m in enum_cls}
+            for column, enum_cls in {
+                "gender": GenderEnum, "smoking_status": SmokingStatusEnum, "alcohol_use": AlcoholUseEnum,
+                "oral_hygiene": OralHygieneEnum, "hpv_status": HPVStatusEnum,
+                "treatment_type": TreatmentTypeEnum, "response": ResponseEnum,
+            }.items()
+        }
+        with engine.begin() as conn:
+            existing = set(conn.execute(select(User.user_id).where(User.user_id.like("synth_doctor_%"))).scalars())
+            new_users = [
+                {
+                    "user_id": f"synth_doctor_{u:04d}",
+                    "username": f"synth_doctor_{u:04d}",
+                    "email": f"synth_doctor_{u:04d}@example.com",
+                    "full_name": f"Synthetic Doctor {u:04d}",
+                    "role": UserRoleEnum.DOCTOR,
+                    "specialization": "Oral Oncology",
+                }
+                for u in range(users) if f"synth_doctor_{u:04d}" not in existing
+            ]
+            if new_users:
+                conn.execute(User.__table__.insert(), new_users)
+            self.user_pks = conn.execute(
+                select(User.id).where(User.user_id.like("synth_doctor_%")).order_by(User.user_id)
+            ).scalars().all()[:users]
+        self.rows = 0
+
+    def _insert(self, conn, table, frame):
+        records = frame.to_dict("records")
+        for start in range(0, len(records), self.batch_size):
+            conn.execute(table, records[start:start + self.batch_size])
+        self.rows += len(records)
+
+    def _replace_children(self, conn, patient_ids):
+        """Drop rows an earlier run loaded for these patients, so a re-run replaces them"""
+        followups = self.tables["followups"]
+        predictions = self.tables["predictions"]
+        assignments = self.tables["assignments"]
+        for start in range(0, len(patient_ids), self.batch_size):
+            ids = patient_ids[start:start + self.batch_size]
+            conn.execute(followups.delete().where(followups.c.patient_id.in_(ids)))
+            conn.execute(predictions.delete().where(
+                predictions.c.patient_id.in_(ids), predictions.c.model_version == "synthetic"))
+            if self.user_pks:
+                conn.execute(assignments.delete().where(
+                    assignments.c.patient_id.in_(ids), assignments.c.user_id.in_(self.user_pks)))
+
+    def load(self, start, patients, followups, predictions):
+        patient_rows = patients.drop(columns=["treatment_type", "diagnosis_offset_days"])
+        for column in ("gender", "smoking_status", "alcohol_use", "oral_hygiene", "hpv_status"):
+            patient_rows[column] = patient_rows[column].map(self.enum_maps[column])
+
+        followup_rows = pd.DataFrame({
+            "patient_id": followups["patient_id"],
+            "follow_up_month": followups["month_index"],
+            "tumor_size_cm": followups["tumor_size_cm"],
+            "recurrence": followups["recurrence"],
+            "treatment_type": followups["treatment_type"].map(self.enum_maps["treatment_type"]),
+            "response_to_treatment": followups["response"].map(self.enum_maps["response"]),
+            "follow_up_date": followups["follow_up_date"],
+        })
+
+        with self.engine.begin() as conn:
+            patient_table = self.tables["patients"]
+            self._insert(conn, self.upsert(
+                conn, patient_table, index_elements=["patient_id"],
+                update=lambda incoming: {c: getattr(incoming, c) for c in patient_rows.columns if c != "patient_id"},
+            ), patient_rows)
+            self._replace_children(conn, patient_rows["patient_id"].tolist())
+            self._insert(conn, self.tables["followups"].insert(), followup_rows)
+            if predictions is not None and len(predictions):
+                self._insert(conn, self.tables["predictions"].insert(), pd.DataFrame({
+                    "patient_id": predictions["patient_id"],
+                    "prediction_date": predictions["prediction_date"],
+                    "treatment_type": predictions["treatment_type"],
+                    "predicted_evolution": [
+                        _evolution(float(s), float(k)) for s, k in zip(predictions["last_size"], predictions["slope"])
+                    ],
+                    "risk_factors": [
+                        [{"factor": "Tumor Size Trend", "impact": int(min(100, max(0, 50 + 200 * k))), "description": "Synthetic"}]
+                        for k in predictions["slope"]
+                    ],
+                    "treatment_impact": np.where(predictions["slope"] < 0, 78.0, 60.0),
+                    "confidence": predictions["confidence"],
+                    "model_version": "synthetic",
+                }))
+            if self.user_pks:
+                # Patients are spread round-robin over doctors by global index
+                order = np.argsort(patients["patient_id"].str.slice(1).astype(np.int64).to_numpy())
+                ids = patients["patient_id"].to_numpy()[order]
+                self._insert(conn, self.tables["assignments"].insert(), pd.DataFrame({
+                    "user_id": [self.user_pks[(start + i) % len(self.user_pks)] for i in range(len(ids))],
+                    "patient_id": ids,
+                    "assignment_type": "primary",
+                    "is_active": True,
+                }))
+
+    def finish(self):
+        from database import SessionLocal
+        from models.analytics_summary import rebuild_summary
+        db = SessionLocal()
+        try:
+            rebuild_summary(db)
+        finally:
+            db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--months", type=int, default=10, help="Follow-ups per patient")
+    parser.add_argument("--predictions-per-patient", type=int, default=1)
+    parser.add_argument("--users", type=int, default=100, help="Doctors to create and assign patients to")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--shard-size", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--csv-dir", help="Write cohort_part_*.csv files here")
+    parser.add_argument("--load-db", action="store_true", help="Bulk-load into DATABASE_URL")
+    args = parser.parse_args()
+    if not args.csv_dir and not args.load_db:
+        parser.error("nothing to do: pass --csv-dir and/or --load-db")
+    if args.csv_dir:
+        os.makedirs(args.csv_dir, exist_ok=True)
+
+    shards = [
+        (i, start, min(start + args.shard_size, args.patients), args.months, args.predictions_per_patient, args.seed, args.csv_dir)
+        for i, start in enumerate(range(0, args.patients, args.shard_size))
+    ]
+    loader = DatabaseLoader(args.users) if args.load_db else None
+
+    print(f"🧬 Generating {args.patients} patients x {args.months} months in {len(shards)} shards on {args.workers} workers ...")
+    started = time.perf_counter()
+    generated = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        # Keep a bounded window of shards in flight; consume in order so ids load deterministically
+        pending = deque()
+        shard_iter = iter(shards)
+        for spec in shard_iter:
+            pending.append((spec[1], pool.submit(generate_shard, spec)))
+            if len(pending) >= args.workers * 2:
+                break
+        while pending:
+            start, future = pending.popleft()
+            _, patients, followups, predictions = future.result()
+            spec = next(shard_iter, None)
+            if spec is not None:
+                pending.append((spec[1], pool.submit(generate_shard, spec)))
+            if loader is not None:
+                loader.load(start, patients, followups, predictions)
+            generated += len(followups)
+            print(f"   {generated:,} follow-up rows ({generated / (time.perf_counter() - started):,.0f}/s)", end="\r")
+    print()
+    if loader is not None:
+        loader.finish()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {args.patients:,} patients / {generated:,} follow-ups in {elapsed:.1f}s"
+          + (f"; {loader.rows:,} rows loaded into the database" if loader is not None else "")
+          + (f"; CSVs in {args.csv_dir}/" if args.csv_dir else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Content-addressed image store
+
+Uploaded images are stored once per distinct content under
+``data/uploads/images/<aa>/<bb>/<sha256>`` (first two byte pairs of the hash
+as shard directories). The spooled upload is read once, in fixed-size
+chunks that are hashed while being written to a temp file in the store
+root. The temp file is then renamed into its content-addressed path, or
+discarded if that object already exists. All file I/O runs in a worker
+thread.
+"""
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+
+from fastapi.concurrency import run_in_threadpool
+
+IMAGE_STORE_ROOT = os.getenv("IMAGE_STORE_ROOT", os.path.join("data", "uploads", "images"))
+HASH_CHUNK_BYTES = 1024 * 1024
+ALLOWED_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+
+
+@dataclass
+class StoredImage:
+    sha256: str
+    path: str
+    size_bytes: int
+    deduplicated: bool
+
+
+def object_path(sha256: str, root: str = IMAGE_STORE_ROOT) -> str:
+    return os.path.join(root, sha256[:2], sha256[2:4], sha256)
+
+
+def store_fileobj(fileobj, root: str = IMAGE_STORE_ROOT) -> StoredImage:
+    """Store a seekable binary file object (blocking)"""
+    os.makedirs(root, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".incoming-", dir=root)
+    try:
+        digest = hashlib.sha256()
+        size = 0
+        fileobj.seek(0)
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(HASH_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        path = object_path(sha256, root)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return StoredImage(sha256, path, size, deduplicated=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Identical content racing in from another request lands on the same bytes
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return StoredImage(sha256, path, size, deduplicated=False)
+
+
+async def store_upload(upload, root: str = IMAGE_STORE_ROOT) -> StoredImage:
+    """Store a FastAPI UploadFile without blocking the event loop"""
+    return await run_in_threadpool(store_fileobj, upload.file, root)
+
+
+def is_allowed_image(filename: str) -> bool:
+    return filename.lower().endswith(ALLOWED_IMAGE_EXTENSIONS)
@@ -0,0 +1,114 @@
+"""
+Preprocessed image tensors, keyed by content hash
+
+After an upload lands in the content-addressed image store, ``schedule``
+hands it to a thread pool that decodes it once, converts to RGB, resizes to
+``IMAGE_TENSOR_SIZE`` and scales to float32 in [0, 1]. The result is saved
+as ``data/uploads/tensors/<aa>/<bb>/<sha256>.npy``; ``load_tensor`` opens it
+memory-mapped, so readers pay no decode cost and share pages across
+processes. Decoding needs Pillow; without it scheduling is a no-op.
+
+Pillow's decode and resize and numpy's scaling release the GIL, so worker
+threads run in parallel without forking the threaded server process.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+try:
+    from PIL import Image
+except Exception:
+    Image = None  # preprocessing unavailable without Pillow
+
+TENSOR_STORE_ROOT = os.getenv("TENSOR_STORE_ROOT", os.path.join("data", "uploads", "tensors"))
+IMAGE_TENSOR_SIZE = int(os.getenv("IMAGE_TENSOR_SIZE", "224"))
+IMAGE_PREPROCESS_WORKERS = int(os.getenv("IMAGE_PREPROCESS_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+logger = logging.getLogger(__name__)
+
+
+def tensor_path(sha256: str, root: str = TENSOR_STORE_ROOT) -> str:
+    return os.path.join(root, sha256[:2], sha256[2:4], f"{sha256}.npy")
+
+
+def preprocess_image(source_path: str, dest_path: str, size: int = IMAGE_TENSOR_SIZE) -> tuple:
+    """Decode, resize and normalize one image into ``dest_path`` (runs in a worker thread)"""
+    with Image.open(source_path) as img:
+        img = img.convert("RGB").resize((size, size), Image.BILINEAR)
+        array = np.asarray(img, dtype=np.float32) / 255.0
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = f"{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, dest_path)
+    return array.shape
+
+
+class Preprocessor:
+    """Lazily started thread pool with de-duplicated, fire-and-forget jobs"""
+
+    def __init__(self, workers: int, root: str = TENSOR_STORE_ROOT):
+        self.workers = workers
+        self.root = root
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.counters = {"scheduled": 0, "completed": 0, "failed": 0, "already_cached": 0}
+
+    def schedule(self, sha256: str, source_path: str) -> bool:
+        """Queue preprocessing unless the tensor exists or is in flight; never blocks"""
+        if Image is None:
+            return False
+        dest = tensor_path(sha256, self.root)
+        with self._lock:
+            if sha256 in self._pending:
+                return False
+            if os.path.exists(dest):
+                self.counters["already_cached"] += 1
+                return False
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-preprocess")
+            self._pending.add(sha256)
+            self.counters["scheduled"] += 1
+            future = self._pool.submit(preprocess_image, source_path, dest)
+        future.add_done_callback(lambda f: self._done(sha256, f))
+        return True
+
+    def _done(self, sha256, future) -> None:
+        error = future.exception()
+        with self._lock:
+            self._pending.discard(sha256)
+            self.counters["failed" if error is not None else "completed"] += 1
+        if error is not None:
+            logger.error("Image preprocessing failed for %s: %s", sha256, error, exc_info=error)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "pending": len(self._pending),
+                "available": Image is not None,
+                "workers": self.workers,
+                "tensor_size": IMAGE_TENSOR_SIZE,
+            }
+
+
+preprocessor = Preprocessor(IMAGE_PREPROCESS_WORKERS)
+
+
+def load_tensor(sha256: str, root: str = TENSOR_STORE_ROOT) -> Optional[np.ndarray]:
+    """Memory-mapped (H, W, 3) float32 tensor, or None if not preprocessed (yet)"""
+    path = tensor_path(sha256, root)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")
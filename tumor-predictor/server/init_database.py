@@ -5,14 +5,16 @@ Creates tables and inserts sample data
 import os
 import sys
 from sqlalchemy import text
-from database import engine, create_tables
+from database import engine, create_tables, create_indexes, SessionLocal
 from models.database_models import *
+from models.analytics_summary import rebuild_summary
 
 def init_database():
     """Initialize the database with tables and sample data"""
     print("Creating database tables...")
     create_tables()
-    print("✅ Tables created successfully")
+    create_indexes()
+    print("✅ Tables and indexes created successfully")
     
     # Insert sample data
     print("Inserting sample data...")
@@ -58,14 +60,21 @@ def init_database():
             }
         ]
         
-        for patient in sample_patients:
-            conn.execute(text("""
-                INSERT IGNORE INTO patients 
-                (patient_id, age, gender, stage_tnm, initial_tumor_size_cm, 
-                 smoking_status, alcohol_use, oral_hygiene, hpv_status, comorbidities)
-                VALUES (:patient_id, :age, :gender, :stage_tnm, :initial_tumor_size_cm,
-                        :smoking_status, :alcohol_use, :oral_hygiene, :hpv_status, :comorbidities)
-            """), patient)
+        conn.execute(text("""
+            INSERT IGNORE INTO patients 
+            (patient_id, age, gender, stage_tnm, initial_tumor_size_cm, 
+             smoking_status, alcohol_use, oral_hygiene, hpv_status, comorbidities)
+            VALUES (:patient_id, :age, :gender, :stage_tnm, :initial_tumor_size_cm,
+                    :smoking_status, :alcohol_use, :oral_hygiene, :hpv_status, :comorbidities)
+        """), sample_patients)
+        
+        # One executemany per patient instead of one execute per row
+        followup_insert = text("""
+            INSERT IGNORE INTO patient_followups 
+            (patient_id, follow_up_month, tumor_size_cm, recurrence, 
+             treatment_type, response_to_treatment, follow_up_date)
+            VALUES (:patient_id, :month, :size, :recurrence, :treatment, :response, :date)
+        """)
         
         # Insert follow-up data for Patient A001 (Aggressive case)
         followup_data_a001 = [
@@ -83,16 +92,13 @@ def init_database():
             (12, 7.2, True, 'Surgery+Chemo+RT', 'Poor', '2024-12-15')
         ]
         
-        for month, size, recurrence, treatment, response, date in followup_data_a001:
-            conn.execute(text("""
-                INSERT IGNORE INTO patient_followups 
-                (patient_id, follow_up_month, tumor_size_cm, recurrence, 
-                 treatment_type, response_to_treatment, follow_up_date)
-                VALUES ('A001', :month, :size, :recurrence, :treatment, :response, :date)
-            """), {
-                'month': month, 'size': size, 'recurrence': recurrence,
+        conn.execute(followup_insert, [
+            {
+                'patient_id': 'A001', 'month': month, 'size': size, 'recurrence': recurrence,
                 'treatment': treatment, 'response': response, 'date': date
-            })
+            }
+            for month, size, recurrence, treatment, response, date in followup_data_a001
+        ])
         
         # Insert follow-up data for Patient B001 (Moderate case)
         followup_data_b001 = [
@@ -110,16 +116,13 @@ def init_database():
             (12, 1.5, False, 'Surgery+RT', 'Good', '2024-12-20')
         ]
         
-        for month, size, recurrence, treatment, response, date in followup_data_b001:
-            conn.execute(text("""
-                INSERT IGNORE INTO patient_followups 
-                (patient_id, follow_up_month, tumor_size_cm, recurrence, 
-                 treatment_type, response_to_treatment, follow_up_date)
-                VALUES ('B001', :month, :size, :recurrence, :treatment, :response, :date)
-            """), {
-                'month': month, 'size': size, 'recurrence': recurrence,
+        conn.execute(followup_insert, [
+            {
+                'patient_id': 'B001', 'month': month, 'size': size, 'recurrence': recurrence,
                 'treatment': treatment, 'response': response, 'date': date
-            })
+            }
+            for month, size, recurrence, treatment, response, date in followup_data_b001
+        ])
         
         # Insert follow-up data for Patient C001 (High risk case)
         followup_data_c001 = [
@@ -137,19 +140,23 @@ def init_database():
             (12, 0.5, False, 'Surgery Only', 'Excellent', '2024-12-25')
         ]
         
-        for month, size, recurrence, treatment, response, date in followup_data_c001:
-            conn.execute(text("""
-                INSERT IGNORE INTO patient_followups 
-                (patient_id, follow_up_month, tumor_size_cm, recurrence, 
-                 treatment_type, response_to_treatment, follow_up_date)
-                VALUES ('C001', :month, :size, :recurrence, :treatment, :response, :date)
-            """), {
-                'month': month, 'size': size, 'recurrence': recurrence,
+        conn.execute(followup_insert, [
+            {
+                'patient_id': 'C001', 'month': month, 'size': size, 'recurrence': recurrence,
                 'treatment': treatment, 'response': response, 'date': date
-            })
+            }
+            for month, size, recurrence, treatment, response, date in followup_data_c001
+        ])
         
         conn.commit()
     
+    # Raw inserts bypass the ORM hooks, so rebuild the analytics summary
+    db = SessionLocal()
+    try:
+        rebuild_summary(db)
+    finally:
+        db.close()
+    
     print("✅ Sample data inserted successfully")
     print("Database initialization complete!")
 
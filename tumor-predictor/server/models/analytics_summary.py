@@ -0,0 +1,195 @@
+"""
+Incrementally maintained analytics summary
+
+Row counts and the treatment/response distribution are kept in the
+``analytics_summary`` table so ``/analytics/summary`` reads a handful of rows
+instead of scanning ``patient_followups``. Mapper hooks on ``Patient``,
+``PatientFollowup`` and ``Prediction`` collect deltas during a flush, and the
+deltas are applied as counter upserts in the same transaction. The hooks
+are registered by importing ``models.database_models``, so every writer of
+these models keeps the summary current.
+
+Core-level writes bypass the mapper hooks. Report what they changed from
+inside the writing transaction with ``adjust_total`` / ``adjust_followups``;
+``rebuild_summary`` recomputes the table from the base tables and is meant for
+repair and one-off CLI loads.
+"""
+from collections import Counter
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from database import upsert
+from models.database_models import AnalyticsSummary, Patient, PatientFollowup, Prediction
+
+_DELTAS_KEY = "analytics_summary_deltas"
+
+METRIC_PATIENTS = "patients"
+METRIC_PREDICTIONS = "predictions"
+METRIC_FOLLOWUPS = "followups"
+METRIC_TREATMENT_RESPONSE = "treatment_response"
+
+
+def _enum_value(value):
+    return getattr(value, "value", value) or ""
+
+
+def _record(target, key, delta):
+    session = Session.object_session(target)
+    if session is None:
+        return
+    session.info.setdefault(_DELTAS_KEY, Counter())[key] += delta
+
+
+def _apply_deltas(connection, deltas, skip_zero=True):
+    """Add each (metric, treatment, response) delta to its summary counter"""
+    rows = [
+        {"metric": metric, "treatment_type": treatment, "response_to_treatment": response, "row_count": delta}
+        for (metric, treatment, response), delta in deltas.items()
+        if delta or not skip_zero
+    ]
+    if not rows:
+        return
+    table = AnalyticsSummary.__table__
+    stmt = upsert(
+        connection,
+        table,
+        index_elements=["metric", "treatment_type", "response_to_treatment"],
+        update=lambda incoming: {"row_count": table.c.row_count + incoming.row_count},
+    )
+    connection.execute(stmt, rows)
+
+
+def _followup_key(treatment, response):
+    return (METRIC_TREATMENT_RESPONSE, _enum_value(treatment), _enum_value(response))
+
+
+# ---- mapper hooks ----
+
+@event.listens_for(Patient, "after_insert")
+def _patient_inserted(mapper, connection, target):
+    _record(target, (METRIC_PATIENTS, "", ""), 1)
+
+
+@event.listens_for(Patient, "after_delete")
+def _patient_deleted(mapper, connection, target):
+    _record(target, (METRIC_PATIENTS, "", ""), -1)
+
+
+@event.listens_for(Prediction, "after_insert")
+def _prediction_inserted(mapper, connection, target):
+    _record(target, (METRIC_PREDICTIONS, "", ""), 1)
+
+
+@event.listens_for(Prediction, "after_delete")
+def _prediction_deleted(mapper, connection, target):
+    _record(target, (METRIC_PREDICTIONS, "", ""), -1)
+
+
+@event.listens_for(PatientFollowup, "after_insert")
+def _followup_inserted(mapper, connection, target):
+    _record(target, (METRIC_FOLLOWUPS, "", ""), 1)
+    _record(target, _followup_key(target.treatment_type, target.response_to_treatment), 1)
+
+
+@event.listens_for(PatientFollowup, "after_update")
+def _followup_updated(mapper, connection, target):
+    attrs = inspect(target).attrs
+    treatment_hist = attrs.treatment_type.history
+    response_hist = attrs.response_to_treatment.history
+    if not (treatment_hist.has_changes() or response_hist.has_changes()):
+        return
+    old_treatment = treatment_hist.deleted[0] if treatment_hist.deleted else target.treatment_type
+    old_response = response_hist.deleted[0] if response_hist.deleted else target.response_to_treatment
+    _record(target, _followup_key(old_treatment, old_response), -1)
+    _record(target, _followup_key(target.treatment_type, target.response_to_treatment), 1)
+
+
+@event.listens_for(PatientFollowup, "after_delete")
+def _followup_deleted(mapper, connection, target):
+    _record(target, (METRIC_FOLLOWUPS, "", ""), -1)
+    _record(target, _followup_key(target.treatment_type, target.response_to_treatment), -1)
+
+
+# ---- session hooks ----
+
+@event.listens_for(Session, "before_flush")
+def _reset_deltas(session, flush_context, instances):
+    session.info.pop(_DELTAS_KEY, None)
+
+
+@event.listens_for(Session, "after_flush")
+def _flush_deltas(session, flush_context):
+    deltas = session.info.pop(_DELTAS_KEY, None)
+    if deltas:
+        _apply_deltas(session.connection(), deltas)
+
+
+# ---- maintenance / reads ----
+
+def adjust_total(connection, metric: str, delta: int) -> None:
+    """Apply ``delta`` to a total counter for rows written through Core"""
+    _apply_deltas(connection, Counter({(metric, "", ""): delta}))
+
+
+def adjust_followups(connection, counts: Counter) -> None:
+    """Apply (treatment, response) -> delta follow-up counts for rows written through Core
+
+    The follow-up total moves by the sum of the deltas.
+    """
+    deltas = Counter()
+    for (treatment, response), delta in counts.items():
+        deltas[_followup_key(treatment, response)] += delta
+        deltas[(METRIC_FOLLOWUPS, "", "")] += delta
+    _apply_deltas(connection, deltas)
+
+
+def rebuild_summary(db: Session) -> None:
+    """Recompute the summary table from the base tables"""
+    deltas = Counter()
+    deltas[(METRIC_PATIENTS, "", "")] = db.query(func.count(Patient.patient_id)).scalar() or 0
+    deltas[(METRIC_PREDICTIONS, "", "")] = db.query(func.count(Prediction.id)).scalar() or 0
+    deltas[(METRIC_FOLLOWUPS, "", "")] = db.query(func.count(PatientFollowup.id)).scalar() or 0
+    grouped = db.query(
+        PatientFollowup.treatment_type,
+        PatientFollowup.response_to_treatment,
+        func.count(PatientFollowup.id)
+    ).group_by(
+        PatientFollowup.treatment_type,
+        PatientFollowup.response_to_treatment
+    ).all()
+    for treatment, response, count in grouped:
+        deltas[_followup_key(treatment, response)] += count
+
+    db.query(AnalyticsSummary).delete(synchronize_session=False)
+    # Zero totals are written too, so an empty database still counts as built
+    _apply_deltas(db.connection(), deltas, skip_zero=False)
+    db.commit()
+
+
+def ensure_summary(db: Session) -> None:
+    """Build the summary table on first use (e.g. for pre-existing databases)"""
+    exists = db.execute(select(AnalyticsSummary.id).limit(1)).first()
+    if exists is None:
+        rebuild_summary(db)
+
+
+async def read_summary(db) -> dict:
+    """Return totals and the nested treatment -> response -> count mapping
+
+    ``db`` is an AsyncSession (or the ThreadedSession fallback).
+    """
+    totals = {METRIC_PATIENTS: 0, METRIC_PREDICTIONS: 0, METRIC_FOLLOWUPS: 0}
+    treatment_effectiveness = {}
+    for row in (await db.execute(select(AnalyticsSummary))).scalars().all():
+        if row.metric == METRIC_TREATMENT_RESPONSE:
+            if row.row_count > 0:
+                treatment_effectiveness.setdefault(row.treatment_type, {})[row.response_to_treatment] = row.row_count
+        elif row.metric in totals:
+            totals[row.metric] = row.row_count
+    return {
+        "total_patients": totals[METRIC_PATIENTS],
+        "total_predictions": totals[METRIC_PREDICTIONS],
+        "total_followups": totals[METRIC_FOLLOWUPS],
+        "treatment_effectiveness": treatment_effectiveness
+    }
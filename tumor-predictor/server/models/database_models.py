@@ -1,7 +1,7 @@
 """
 SQLAlchemy models for the tumor predictor database
 """
-from sqlalchemy import Column, String, Integer, Float, Boolean, Text, DateTime, JSON, ForeignKey, Enum
+from sqlalchemy import Column, String, Integer, Float, Boolean, Text, DateTime, JSON, ForeignKey, Enum, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -95,6 +95,10 @@ class PatientAssignment(Base):
     user = relationship("User", back_populates="assigned_patients")
     patient = relationship("Patient")
 
+    __table_args__ = (
+        Index("ix_patient_assignments_user_active", "user_id", "is_active"),
+    )
+
 class Patient(Base):
     __tablename__ = "patients"
     
@@ -134,6 +138,10 @@ class PatientFollowup(Base):
     # Relationships
     patient = relationship("Patient", back_populates="followups")
 
+    __table_args__ = (
+        Index("ix_patient_followups_patient_month", "patient_id", "follow_up_month"),
+    )
+
 class Prediction(Base):
     __tablename__ = "predictions"
     
@@ -153,6 +161,10 @@ class Prediction(Base):
     risk_factor_details = relationship("RiskFactor", back_populates="prediction", cascade="all, delete-orphan")
     outcomes = relationship("TreatmentOutcome", back_populates="prediction")
 
+    __table_args__ = (
+        Index("ix_predictions_patient_date", "patient_id", "prediction_date"),
+    )
+
 class RiskFactor(Base):
     __tablename__ = "risk_factors"
     
@@ -199,3 +211,26 @@ class UserSession(Base):
     # Relationships
     user = relationship("User", back_populates="sessions")
     patient = relationship("Patient", back_populates="sessions")
+
+    __table_args__ = (
+        Index("ix_user_sessions_user_created", "user_id", "created_at"),
+    )
+
+class AnalyticsSummary(Base):
+    __tablename__ = "analytics_summary"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    metric = Column(String(50), nullable=False)  # patients, predictions, followups, treatment_response
+    treatment_type = Column(String(50), nullable=False, default="")
+    response_to_treatment = Column(String(20), nullable=False, default="")
+    row_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+    __table_args__ = (
+        UniqueConstraint("metric", "treatment_type", "response_to_treatment", name="uq_analytics_summary_key"),
+    )
+
+
+# The summary's mapper and session hooks must be registered wherever these
+# models are written, not only in processes that import the summary module
+import models.analytics_summary  # noqa: E402,F401
@@ -4,6 +4,9 @@ from typing import List, Tuple
 import numpy as np
 import pandas as pd
 
+from schema_normalizer import concat_normalized, read_normalized
+from series_store import series_store
+
 try:
     import tensorflow as tf
     from tensorflow.keras import layers, models
@@ -20,23 +23,15 @@ def _read_csvs(data_dir: str) -> pd.DataFrame:
             continue
         path = os.path.join(data_dir, name)
         try:
-            df = pd.read_csv(path)
-            # normalize expected columns
-            if "Follow_Up_Month" in df.columns:
-                df.rename(columns={"Follow_Up_Month": "month_index"}, inplace=True)
-            if "Tumor_Size_cm" in df.columns:
-                df.rename(columns={"Tumor_Size_cm": "tumor_size_cm"}, inplace=True)
-            if "Patient_ID" in df.columns:
-                df.rename(columns={"Patient_ID": "patient_id"}, inplace=True)
+            df = read_normalized(path)
             frames.append(df)
         except Exception:
             continue
     if not frames:
         raise RuntimeError("No CSVs found or readable in data directory")
-    df_all = pd.concat(frames, ignore_index=True)
-    # keep essential columns
-    keep = [c for c in ["patient_id", "month_index", "tumor_size_cm"] if c in df_all.columns]
-    df_all = df_all[keep].dropna()
+    df_all = concat_normalized(frames)
+    # keep essential columns; snapshot files have no month axis and drop out here
+    df_all = df_all[["patient_id", "month_index", "tumor_size_cm"]].dropna()
     return df_all
 
 
@@ -46,7 +41,7 @@ def _build_sequences(df: pd.DataFrame, lookback: int = 3, horizon: int = 12) ->
         df["patient_id"] = 0
     X_list: List[np.ndarray] = []
     y_list: List[np.ndarray] = []
-    for pid, grp in df.groupby("patient_id"):
+    for pid, grp in df.groupby("patient_id", observed=True):
         g = grp.sort_values("month_index")
         series = g["tumor_size_cm"].astype(float).values
         if len(series) < lookback + 1:
@@ -65,6 +60,23 @@ def _build_sequences(df: pd.DataFrame, lookback: int = 3, horizon: int = 12) ->
     return X, y
 
 
+def _build_sequences_from_store(store, lookback: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """Same windows as ``_build_sequences``, sliced straight from the memory-mapped series store"""
+    X_list: List[np.ndarray] = []
+    y_list: List[np.ndarray] = []
+    for _, _, sizes in store.iter_arrays():
+        if len(sizes) < lookback + 1:
+            continue
+        windows = np.lib.stride_tricks.sliding_window_view(sizes, lookback + 1)
+        X_list.append(windows[:, :lookback])
+        y_list.append(windows[:, lookback:])
+    if not X_list:
+        raise RuntimeError("Insufficient sequence data for training")
+    X = np.concatenate(X_list).astype("float32").reshape((-1, lookback, 1))
+    y = np.concatenate(y_list).astype("float32").reshape((-1, 1))
+    return X, y
+
+
 def build_model(lookback: int = 3) -> "tf.keras.Model":
     if tf is None:
         raise RuntimeError("TensorFlow is not available")
@@ -77,11 +89,20 @@ def build_model(lookback: int = 3) -> "tf.keras.Model":
     return model
 
 
+def training_sequences(data_dir: str, lookback: int = 3, store=series_store) -> Tuple[np.ndarray, np.ndarray]:
+    """(X, y) windows from ``data_dir``, via the series store when it mirrors that directory"""
+    source = store.source() if store.available else None
+    if source and source.get("data_dir") == os.path.abspath(data_dir):
+        # Rebuild first if CSVs were added or changed outside /ingest
+        store.ensure_current(data_dir)
+        return _build_sequences_from_store(store, lookback=lookback)
+    return _build_sequences(_read_csvs(data_dir), lookback=lookback)
+
+
 def train_and_save(data_dir: str, artifacts_dir: str, lookback: int = 3, epochs: int = 20, batch_size: int = 16) -> dict:
     if tf is None:
         raise RuntimeError("TensorFlow is not available")
-    df = _read_csvs(data_dir)
-    X, y = _build_sequences(df, lookback=lookback)
+    X, y = training_sequences(data_dir, lookback=lookback)
     model = build_model(lookback=lookback)
     model.fit(X, y, epochs=epochs, batch_size=batch_size, verbose=0)
     os.makedirs(artifacts_dir, exist_ok=True)
@@ -114,3 +135,18 @@ def predict_trajectory(model: "tf.keras.Model | None", start_size: float, months
     return preds
 
 
+
+
+def predict_trajectories(model: "tf.keras.Model | None", start_sizes: np.ndarray, months: int = 12, lookback: int = 3) -> np.ndarray:
+    """``predict_trajectory`` for many start sizes at once: one batched predict per step -> (n, months + 1)"""
+    start_sizes = np.asarray(start_sizes, dtype="float32")
+    if model is None or start_sizes.size == 0:
+        return np.empty((start_sizes.size, 0), dtype="float32")
+    history = np.repeat(start_sizes[:, None], lookback, axis=1)
+    preds = np.empty((start_sizes.size, months + 1), dtype="float32")
+    for step in range(months + 1):
+        x = history[:, -lookback:].reshape((-1, lookback, 1))
+        yhat = model.predict(x, verbose=0)[:, 0]
+        preds[:, step] = np.maximum(0.05, yhat)
+        history = np.concatenate([history, yhat[:, None]], axis=1)
+    return preds
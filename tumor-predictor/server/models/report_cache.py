@@ -0,0 +1,145 @@
+"""
+Read-through cache for rendered patient reports
+
+Stores the JSON body of ``/users/{user_id}/patients/{patient_id}/report``
+per patient under a byte budget (LRU eviction). Session hooks collect the
+patient ids touched by a flush and invalidate exactly those entries once
+the transaction commits. The per-user access check is not cached.
+
+Each invalidation stamps the patient with a new value of one global counter;
+a read only caches its body if the patient's stamp is unchanged. Stamps are
+kept for at most ``max_generations`` patients: forgetting the oldest raises
+a floor that unknown patients report instead, so a dropped stamp can only
+turn a racing put into a miss, never cache a stale body.
+
+Core-level writes bypass the hooks; call ``report_cache.invalidate`` for the
+affected patients after them.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models.database_models import Patient, PatientFollowup, Prediction, TreatmentOutcome, PatientAssignment
+
+_TOUCHED_KEY = "report_cache_touched"
+_TRACKED_MODELS = (Patient, PatientFollowup, Prediction, TreatmentOutcome, PatientAssignment)
+
+
+class ReportCache:
+    """Thread-safe LRU of rendered report bodies bounded by total bytes"""
+
+    def __init__(self, max_bytes: int, max_generations: int = 10000):
+        self.max_bytes = max_bytes
+        self.max_generations = max_generations
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._counter = 0
+        self._floor = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, patient_id: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(patient_id)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(patient_id)
+            self.hits += 1
+            return body
+
+    def generation(self, patient_id: str) -> int:
+        """Token to pass to ``put`` so a read racing a commit is not cached
+
+        Take it before the read's first query, so that the read's snapshot
+        cannot predate the token.
+        """
+        with self._lock:
+            return self._generations.get(patient_id, self._floor)
+
+    def put(self, patient_id: str, body: bytes, generation: int) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if self._generations.get(patient_id, self._floor) != generation:
+                return
+            old = self._entries.pop(patient_id, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[patient_id] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def invalidate(self, patient_ids: Iterable[str]) -> None:
+        with self._lock:
+            for patient_id in patient_ids:
+                self._counter += 1
+                self._generations[patient_id] = self._counter
+                self._generations.move_to_end(patient_id)
+                body = self._entries.pop(patient_id, None)
+                if body is not None:
+                    self._bytes -= len(body)
+                    self.invalidations += 1
+            while len(self._generations) > self.max_generations:
+                _, dropped = self._generations.popitem(last=False)
+                self._floor = max(self._floor, dropped)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counter += 1
+            self._floor = self._counter
+            self._generations.clear()
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "generations": len(self._generations),
+            }
+
+
+report_cache = ReportCache(
+    max_bytes=int(os.getenv("REPORT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    max_generations=int(os.getenv("REPORT_CACHE_MAX_GENERATIONS", "10000")),
+)
+
+
+# ---- session hooks ----
+
+@event.listens_for(Session, "after_flush")
+def _collect_touched_patients(session, flush_context):
+    touched = session.info.setdefault(_TOUCHED_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, _TRACKED_MODELS) and obj.patient_id is not None:
+            touched.add(obj.patient_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    touched = session.info.pop(_TOUCHED_KEY, None)
+    if touched:
+        report_cache.invalidate(touched)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop(_TOUCHED_KEY, None)
@@ -0,0 +1,268 @@
+"""
+Persistent per-patient index over the CSVs in data/
+
+For every CSV the index records, per ``patient_id``, the runs of
+consecutive rows it occupies as (first_row, row_count, byte_start, byte_end).
+It also records the patient's month range in that file. ``read_patient``
+seeks straight to those byte ranges and parses only the header plus the
+patient's rows, instead of reading and concatenating the whole directory.
+
+Each file entry carries the size and mtime it was built from. ``refresh``
+only rescans files whose stat changed, so /ingest (via ``index_file``) and
+startup keep it up to date incrementally. The index is stored as JSON at
+``PATIENT_INDEX_PATH`` and rewritten atomically after each change.
+"""
+import csv
+import io
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from schema_normalizer import concat_normalized, detect, normalize_frame
+
+DATA_DIR = "data"
+PATIENT_INDEX_PATH = os.getenv("PATIENT_INDEX_PATH", os.path.join(DATA_DIR, ".patient_index.json"))
+INDEX_VERSION = 1
+
+
+def _month(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def scan_file(path: str) -> dict:
+    """Index entry for one CSV: header length and per-patient row runs"""
+    st = os.stat(path)
+    entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "rows": 0, "header_bytes": 0, "patients": {}}
+    with open(path, "rb") as f:
+        position = [0]
+
+        def lines():
+            for raw in f:
+                position[0] += len(raw)
+                yield raw.decode("utf-8", errors="replace")
+
+        reader = csv.reader(lines())
+        header = next(reader, None)
+        entry["header_bytes"] = position[0]
+        if header is None:
+            return entry
+        plan = detect(header)
+        id_source, month_source = plan.sources.get("patient_id"), plan.sources.get("month_index")
+        if id_source is None:
+            return entry
+        id_col = header.index(id_source)
+        month_col = header.index(month_source) if month_source is not None else None
+
+        patients = entry["patients"]
+        row = -1
+        last_pid, run = None, None
+        start = position[0]
+        for record in reader:
+            end = position[0]
+            if not any(field.strip() for field in record):
+                last_pid, run, start = None, None, end
+                continue
+            row += 1
+            pid = record[id_col].strip() if id_col < len(record) else ""
+            if not pid:
+                last_pid, run, start = None, None, end
+                continue
+            info = patients.get(pid)
+            if info is None:
+                info = patients[pid] = {"runs": [], "month_min": None, "month_max": None}
+            if pid == last_pid:
+                run[1] += 1
+                run[3] = end
+            else:
+                run = [row, 1, start, end]
+                info["runs"].append(run)
+            if month_col is not None and month_col < len(record):
+                month = _month(record[month_col])
+                if month is not None:
+                    info["month_min"] = month if info["month_min"] is None else min(info["month_min"], month)
+                    info["month_max"] = month if info["month_max"] is None else max(info["month_max"], month)
+            last_pid, start = pid, end
+        entry["rows"] = row + 1
+    return entry
+
+
+class PatientIndex:
+    """patient_id -> row locations across the CSVs of one directory"""
+
+    def __init__(self, data_dir: str = DATA_DIR, index_path: str = PATIENT_INDEX_PATH):
+        self.data_dir = data_dir
+        self.index_path = index_path
+        self._files: Dict[str, dict] = {}
+        self._by_patient: Dict[str, set] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("version") == INDEX_VERSION:
+                self._files = stored.get("files", {})
+        except (OSError, ValueError):
+            self._files = {}
+        self._by_patient = {}
+        for name, entry in self._files.items():
+            for pid in entry["patients"]:
+                self._by_patient.setdefault(pid, set()).add(name)
+        self._loaded = True
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "files": self._files}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+
+    def _drop(self, name: str) -> None:
+        entry = self._files.pop(name, None)
+        if entry is None:
+            return
+        for pid in entry["patients"]:
+            names = self._by_patient.get(pid)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._by_patient[pid]
+
+    def _put(self, name: str, entry: dict) -> None:
+        self._drop(name)
+        self._files[name] = entry
+        for pid in entry["patients"]:
+            self._by_patient.setdefault(pid, set()).add(name)
+
+    def _is_current(self, name: str) -> bool:
+        entry = self._files.get(name)
+        if entry is None:
+            return False
+        try:
+            st = os.stat(os.path.join(self.data_dir, name))
+        except OSError:
+            return False
+        return entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns
+
+    def index_file(self, path: str) -> int:
+        """(Re)index one CSV under the data directory; returns its patient count"""
+        name = os.path.relpath(path, self.data_dir)
+        entry = scan_file(os.path.join(self.data_dir, name))
+        with self._lock:
+            self._ensure_loaded()
+            self._put(name, entry)
+            self._save()
+        return len(entry["patients"])
+
+    def refresh(self) -> dict:
+        """Rescan new or changed CSVs and forget deleted ones"""
+        names = sorted(
+            n for n in os.listdir(self.data_dir)
+            if n.lower().endswith(".csv") and not n.startswith(".")
+        ) if os.path.isdir(self.data_dir) else []
+        with self._lock:
+            self._ensure_loaded()
+            removed = [n for n in self._files if n not in names]
+            for name in removed:
+                self._drop(name)
+            stale = [n for n in names if not self._is_current(n)]
+            for name in stale:
+                self._put(name, scan_file(os.path.join(self.data_dir, name)))
+            if removed or stale:
+                self._save()
+            return {"files": len(self._files), "reindexed": len(stale), "removed": len(removed)}
+
+    def locate(self, patient_id: str) -> List[dict]:
+        """Files and row runs holding ``patient_id`` (files changed on disk are rescanned first)"""
+        with self._lock:
+            self._ensure_loaded()
+            names = sorted(self._by_patient.get(patient_id, ()))
+            changed = [n for n in names if not self._is_current(n)]
+            if changed:
+                for name in changed:
+                    path = os.path.join(self.data_dir, name)
+                    if os.path.exists(path):
+                        self._put(name, scan_file(path))
+                    else:
+                        self._drop(name)
+                self._save()
+                names = sorted(self._by_patient.get(patient_id, ()))
+            return [
+                {"file": name, "header_bytes": self._files[name]["header_bytes"], **self._files[name]["patients"][patient_id]}
+                for name in names
+            ]
+
+    def read_patient(self, patient_id: str) -> Optional[pd.DataFrame]:
+        """Normalized rows of ``patient_id`` across data/, read by byte range; None if unknown"""
+        return self.read_patients([patient_id])
+
+    def read_patients(self, patient_ids: Sequence[str]) -> Optional[pd.DataFrame]:
+        """Normalized rows of several patients, parsing each file's byte ranges once; None if none are known"""
+        wanted = list(dict.fromkeys(patient_ids))
+        frames, _ = self._read_ranges(wanted)
+        if not frames:
+            return None
+        df = concat_normalized(list(frames.values()))
+        return df[df["patient_id"].isin(wanted)].reset_index(drop=True)
+
+    def read_patient_groups(self, patient_ids: Sequence[str]) -> List[pd.DataFrame]:
+        """Like ``read_patients``, but one frame per set of patients living in the same files
+
+        Each frame's schema covers only its own files, so it matches what
+        ``read_patient`` returns for any one of its patients.
+        """
+        wanted = list(dict.fromkeys(patient_ids))
+        frames, files_of = self._read_ranges(wanted)
+        groups: Dict[tuple, List[str]] = {}
+        for patient_id in wanted:
+            if files_of.get(patient_id):
+                groups.setdefault(files_of[patient_id], []).append(patient_id)
+        out = []
+        for names, members in groups.items():
+            df = concat_normalized([frames[name] for name in names])
+            out.append(df[df["patient_id"].isin(members)].reset_index(drop=True))
+        return out
+
+    def _read_ranges(self, wanted: List[str]):
+        """Per-file normalized frames of the wanted patients' rows, and each patient's file names"""
+        by_file: Dict[str, dict] = {}
+        files_of: Dict[str, tuple] = {}
+        for patient_id in wanted:
+            locations = self.locate(patient_id)
+            files_of[patient_id] = tuple(loc["file"] for loc in locations)
+            for loc in locations:
+                entry = by_file.setdefault(loc["file"], {"header_bytes": loc["header_bytes"], "runs": []})
+                entry["runs"].extend(loc["runs"])
+        frames = {}
+        for name, entry in by_file.items():
+            with open(os.path.join(self.data_dir, name), "rb") as f:
+                buf = io.BytesIO()
+                buf.write(f.read(entry["header_bytes"]))
+                for _, _, byte_start, byte_end in sorted(entry["runs"], key=lambda run: run[2]):
+                    f.seek(byte_start)
+                    buf.write(f.read(byte_end - byte_start))
+            buf.seek(0)
+            frames[name] = normalize_frame(pd.read_csv(buf))
+        return frames, files_of
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                "files": len(self._files),
+                "patients": len(self._by_patient),
+                "rows": sum(e["rows"] for e in self._files.values()),
+                "index_path": self.index_path,
+            }
+
+
+patient_index = PatientIndex()
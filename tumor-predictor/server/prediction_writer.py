@@ -0,0 +1,66 @@
+"""
+Write-behind persistence for /predict and /analyze results
+
+Request handlers hand finished predictions to ``prediction_writer.submit``,
+which only enqueues them; batches are written as ``Prediction`` rows with
+their ``RiskFactor`` children (see write_behind.py).
+"""
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from models.database_models import Patient, Prediction, RiskFactor
+from write_behind import WriteBehindQueue
+
+PERSIST_PREDICTIONS = os.getenv("PERSIST_PREDICTIONS", "1") != "0"
+
+
+class PredictionWriter(WriteBehindQueue):
+    """Write-behind queue of predictions and their risk factors"""
+
+    name = "prediction-writer"
+
+    def submit(self, patient_id: Optional[str], treatment_type: str, evolution: List[dict], risk_factors: List[dict],
+               treatment_impact: float, confidence: float, model_version: str = "v1.0") -> bool:
+        """Queue a prediction for persistence; never blocks the caller"""
+        if not patient_id:
+            return False
+        return self.enqueue({
+            "patient_id": patient_id,
+            "prediction_date": datetime.utcnow(),
+            "treatment_type": treatment_type,
+            "predicted_evolution": evolution,
+            "risk_factors": risk_factors,
+            "treatment_impact": treatment_impact,
+            "confidence": confidence,
+            "model_version": model_version,
+        })
+
+    def _write_batch(self, db, batch: List[dict]) -> int:
+        patient_ids = {r["patient_id"] for r in batch}
+        known = {pid for (pid,) in db.query(Patient.patient_id).filter(Patient.patient_id.in_(patient_ids))}
+        rows = [r for r in batch if r["patient_id"] in known]
+        if len(rows) < len(batch):
+            self._bump("dropped_unknown_patient", len(batch) - len(rows))
+        db.add_all([
+            Prediction(
+                **record,
+                risk_factor_details=[
+                    RiskFactor(
+                        factor_name=str(rf.get("factor", ""))[:100],
+                        impact_score=int(rf.get("impact", 0)),
+                        description=rf.get("description"),
+                    )
+                    for rf in record["risk_factors"]
+                ],
+            )
+            for record in rows
+        ])
+        return len(rows)
+
+
+prediction_writer = PredictionWriter(
+    batch_size=int(os.getenv("PREDICTION_WRITE_BATCH", "200")),
+    flush_interval=float(os.getenv("PREDICTION_FLUSH_INTERVAL", "2.0")),
+    max_queue=int(os.getenv("PREDICTION_QUEUE_MAX", "10000")),
+)
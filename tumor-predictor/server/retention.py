@@ -0,0 +1,203 @@
+"""
+Monthly retention for user_sessions and predictions
+
+Rows older than the retention window are rolled out of the hot tables one
+calendar month at a time: each row is appended to a gzip-compressed NDJSON
+archive (``<archive_dir>/<table>/<YYYY-MM>.jsonl.gz``) and then deleted in
+the same batch. Archive files are written and closed before the delete
+commits, so a crash can at worst archive a batch twice, never lose it.
+
+Predictions are archived together with their risk factors. Predictions
+referenced by a treatment outcome stay in the hot table. The Core deletes
+bypass the ORM hooks, so each prediction batch lowers the analytics summary
+count in its own transaction and drops the affected patients' cached reports
+once it commits.
+
+Usage:
+    python retention.py [--keep-months 6] [--archive-dir archive] [--batch-size 5000] [--dry-run] [--vacuum]
+"""
+import argparse
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List
+
+from sqlalchemy import delete, exists, func, select, text
+
+from database import engine
+from models.analytics_summary import METRIC_PREDICTIONS, adjust_total
+from models.database_models import Prediction, RiskFactor, TreatmentOutcome, UserSession
+from models.report_cache import report_cache
+
+ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", "archive")
+KEEP_MONTHS = int(os.getenv("RETENTION_KEEP_MONTHS", "6"))
+
+
+def month_cutoff(keep_months: int, today: date = None) -> datetime:
+    """First day of the oldest month that stays hot"""
+    today = today or date.today()
+    months = today.year * 12 + (today.month - 1) - keep_months
+    return datetime(months // 12, months % 12 + 1, 1)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _append_archive(archive_dir: str, table_name: str, rows_by_month: Dict[str, List[dict]]) -> int:
+    """Append rows to their monthly archive files; returns compressed bytes written"""
+    written = 0
+    table_dir = os.path.join(archive_dir, table_name)
+    os.makedirs(table_dir, exist_ok=True)
+    for month, rows in rows_by_month.items():
+        path = os.path.join(table_dir, f"{month}.jsonl.gz")
+        before = os.path.getsize(path) if os.path.exists(path) else 0
+        # Each batch becomes its own gzip member; readers see one stream
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=_json_default))
+                f.write("\n")
+        written += os.path.getsize(path) - before
+    return written
+
+
+def _cold_rows(conn, table, ts_column, cutoff, last_id, batch_size, extra_filters=()):
+    stmt = (select(table)
+            .where(ts_column < cutoff, table.c.id > last_id, *extra_filters)
+            .order_by(table.c.id)
+            .limit(batch_size))
+    return [dict(row._mapping) for row in conn.execute(stmt)]
+
+
+def archive_user_sessions(cutoff: datetime, archive_dir: str, batch_size: int, dry_run: bool = False) -> dict:
+    table = UserSession.__table__
+    return _archive(table, table.c.created_at, cutoff, archive_dir, batch_size, dry_run)
+
+
+def archive_predictions(cutoff: datetime, archive_dir: str, batch_size: int, dry_run: bool = False) -> dict:
+    table = Prediction.__table__
+    risk_table = RiskFactor.__table__
+    outcome_table = TreatmentOutcome.__table__
+    keep_referenced = ~exists().where(outcome_table.c.prediction_id == table.c.id)
+
+    def with_risk_factors(conn, rows):
+        ids = [r["id"] for r in rows]
+        children = defaultdict(list)
+        for rf in conn.execute(select(risk_table).where(risk_table.c.prediction_id.in_(ids)).order_by(risk_table.c.id)):
+            children[rf.prediction_id].append(dict(rf._mapping))
+        for r in rows:
+            r["risk_factor_details"] = children.get(r["id"], [])
+        return rows
+
+    def delete_children(conn, ids):
+        conn.execute(delete(risk_table).where(risk_table.c.prediction_id.in_(ids)))
+        adjust_total(conn, METRIC_PREDICTIONS, -len(ids))
+
+    def invalidate_reports(rows):
+        report_cache.invalidate({r["patient_id"] for r in rows})
+
+    return _archive(table, table.c.prediction_date, cutoff, archive_dir, batch_size, dry_run,
+                    extra_filters=(keep_referenced,), enrich=with_risk_factors, before_delete=delete_children,
+                    after_commit=invalidate_reports)
+
+
+def _archive(table, ts_column, cutoff, archive_dir, batch_size, dry_run, extra_filters=(), enrich=None,
+             before_delete=None, after_commit=None) -> dict:
+    started = time.perf_counter()
+    moved = 0
+    archive_bytes = 0
+    months = defaultdict(int)
+
+    if dry_run:
+        with engine.connect() as conn:
+            month_expr = func.strftime("%Y-%m", ts_column) if engine.dialect.name == "sqlite" else func.date_format(ts_column, "%Y-%m")
+            for month, count in conn.execute(
+                select(month_expr, func.count()).where(ts_column < cutoff, *extra_filters).group_by(month_expr)
+            ):
+                months[month] = count
+                moved += count
+    else:
+        last_id = 0
+        while True:
+            with engine.begin() as conn:
+                rows = _cold_rows(conn, table, ts_column, cutoff, last_id, batch_size, extra_filters)
+                if not rows:
+                    break
+                if enrich is not None:
+                    rows = enrich(conn, rows)
+                by_month = defaultdict(list)
+                for row in rows:
+                    by_month[row[ts_column.name].strftime("%Y-%m")].append(row)
+                archive_bytes += _append_archive(archive_dir, table.name, by_month)
+
+                ids = [r["id"] for r in rows]
+                if before_delete is not None:
+                    before_delete(conn, ids)
+                conn.execute(delete(table).where(table.c.id.in_(ids)))
+            if after_commit is not None:
+                after_commit(rows)
+            last_id = ids[-1]
+            moved += len(rows)
+            for month, month_rows in by_month.items():
+                months[month] += len(month_rows)
+
+    with engine.connect() as conn:
+        remaining = conn.execute(select(func.count()).select_from(table)).scalar()
+    return {
+        "table": table.name,
+        "rows_moved": moved,
+        "rows_remaining": remaining,
+        "months": dict(sorted(months.items())),
+        "archive_bytes": archive_bytes,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def run(keep_months: int = KEEP_MONTHS, archive_dir: str = ARCHIVE_DIR, batch_size: int = 5000,
+        dry_run: bool = False, vacuum: bool = False) -> dict:
+    """Roll every table; returns a report with per-table counts and timings"""
+    started = time.perf_counter()
+    cutoff = month_cutoff(keep_months)
+    tables = [
+        archive_user_sessions(cutoff, archive_dir, batch_size, dry_run),
+        archive_predictions(cutoff, archive_dir, batch_size, dry_run),
+    ]
+    if vacuum and not dry_run and engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+    return {
+        "cutoff": cutoff.isoformat(),
+        "dry_run": dry_run,
+        "archive_dir": archive_dir,
+        "tables": tables,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keep-months", type=int, default=KEEP_MONTHS, help="Whole months kept in the hot tables")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be moved")
+    parser.add_argument("--vacuum", action="store_true", help="Reclaim space afterwards (SQLite)")
+    args = parser.parse_args()
+
+    print(f"🗄  Archiving rows older than {month_cutoff(args.keep_months):%Y-%m-%d} into {args.archive_dir}/ ...")
+    report = run(args.keep_months, args.archive_dir, args.batch_size, args.dry_run, args.vacuum)
+    verb = "would move" if report["dry_run"] else "moved"
+    for t in report["tables"]:
+        print(f"✅ {t['table']}: {verb} {t['rows_moved']} rows across {len(t['months'])} months "
+              f"({t['archive_bytes'] / 1024:.1f} KiB archived, {t['rows_remaining']} remaining) in {t['seconds']}s")
+        for month, count in t["months"].items():
+            print(f"    {month}: {count}")
+    print(f"⏱  Done in {report['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Schema detection and normalization for cohort CSVs
+
+The CSVs we receive come in several layouts:
+- follow-up exports with one row per (patient, month), e.g.
+  Patient_ID/month_index or Follow_Up_Month/Tumor_Size_cm
+- patient snapshots with one row per patient, e.g. patients_part_*.csv
+  (t_category/n_category/m_category, follow_up_months) and
+  patient_data_over50.csv (Tumor_Stage, Followup_Months)
+
+``detect`` matches a header against the aliases below. The plan is cached
+per header fingerprint, so a header is only analysed once. ``normalize_frame``
+applies a plan. It drops blank rows and coerces every canonical column with
+vectorized pandas operations. Its output always has ``CANONICAL_COLUMNS`` in
+that order; columns the source doesn't provide are all-NA.
+
+Parsed frames use the lean dtype policy (``lean_dtypes``). Run the module on
+a CSV for a memory-usage comparison against plain ``read_csv``:
+
+    python schema_normalizer.py path/to/cohort.csv [...]
+"""
+import hashlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from models.database_models import (
+    GenderEnum, SmokingStatusEnum, AlcoholUseEnum, OralHygieneEnum, HPVStatusEnum,
+    TreatmentTypeEnum, ResponseEnum,
+)
+
+CANONICAL_COLUMNS = [
+    "patient_id", "month_index", "tumor_size_cm", "stage", "treatment_type", "response",
+    "age", "gender", "recurrence", "smoking_status", "alcohol_use", "oral_hygiene", "hpv_status",
+    "comorbidities", "follow_up_date", "diagnosis_date", "follow_up_months",
+]
+
+# Canonical column -> accepted headers, compared lower-cased with spaces as underscores
+COLUMN_ALIASES = {
+    "patient_id": ["patient_id", "patientid"],
+    "month_index": ["month_index", "follow_up_month", "month"],
+    "tumor_size_cm": ["tumor_size_cm", "tumor_size"],
+    "stage": ["stage", "stage_tnm", "tumor_stage", "tnm_stage"],
+    "treatment_type": ["treatment_type", "treatment"],
+    "response": ["response", "response_to_treatment", "chemotherapy_result"],
+    "age": ["age"],
+    "gender": ["gender", "sex"],
+    "recurrence": ["recurrence"],
+    "smoking_status": ["smoking_status", "lifestyle_smoking"],
+    "alcohol_use": ["alcohol_use", "lifestyle_alcohol"],
+    "oral_hygiene": ["oral_hygiene"],
+    "hpv_status": ["hpv_status"],
+    "comorbidities": ["comorbidities"],
+    "follow_up_date": ["follow_up_date"],
+    "diagnosis_date": ["diagnosis_date"],
+    "follow_up_months": ["follow_up_months", "followup_months"],
+}
+
+TNM_PARTS = ("t_category", "n_category", "m_category")
+
+NUMERIC_COLUMNS = ("month_index", "tumor_size_cm", "age", "follow_up_months")
+DATE_COLUMNS = ("follow_up_date", "diagnosis_date")
+TEXT_COLUMNS = (
+    "patient_id", "stage", "treatment_type", "response", "gender",
+    "smoking_status", "alcohol_use", "oral_hygiene", "hpv_status", "comorbidities",
+)
+
+# Dtype policy: enum-like text columns become categoricals whose categories start with the
+# matching database enum's values (observed extras are appended, nothing is rewritten),
+# month counts become Int16 when whole, and other numbers float32. Tumor sizes stay float64:
+# they are stored and rounded downstream, and float32 would move half-way values (0.015)
+CATEGORY_COLUMNS = {
+    "patient_id": None,
+    "stage": None,
+    "treatment_type": TreatmentTypeEnum,
+    "response": ResponseEnum,
+    "gender": GenderEnum,
+    "smoking_status": SmokingStatusEnum,
+    "alcohol_use": AlcoholUseEnum,
+    "oral_hygiene": OralHygieneEnum,
+    "hpv_status": HPVStatusEnum,
+    "comorbidities": None,
+}
+MONTH_COLUMNS = ("month_index", "follow_up_months")
+EXACT_COLUMNS = ("tumor_size_cm",)
+INT16_MAX = 32767
+
+GENDER_VALUES = {"m": "Male", "male": "Male", "f": "Female", "female": "Female", "o": "Other", "other": "Other"}
+TRUE_STRINGS = {"yes", "y", "true", "1"}
+
+
+def _key(header: str) -> str:
+    return str(header).strip().lower().replace(" ", "_")
+
+
+def fingerprint(columns: Sequence[str]) -> str:
+    return hashlib.sha1("\x1f".join(str(c) for c in columns).encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class SchemaPlan:
+    """How one header layout maps onto the canonical columns"""
+
+    fingerprint: str
+    kind: str  # "followup" (rows per patient-month) or "snapshot" (one row per patient)
+    sources: Dict[str, str]  # canonical column -> source header
+    tnm_sources: Optional[tuple]  # (t, n, m) headers when the stage is split
+    extra: tuple  # source headers that map to nothing
+
+    @property
+    def provides(self) -> FrozenSet[str]:
+        return frozenset(self.sources) | (frozenset(["stage"]) if self.tnm_sources else frozenset())
+
+
+@lru_cache(maxsize=256)
+def _plan_for(columns: tuple) -> SchemaPlan:
+    by_key = {}
+    for header in columns:
+        by_key.setdefault(_key(header), header)
+    sources = {}
+    for canonical, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in by_key:
+                sources[canonical] = by_key[alias]
+                break
+    tnm = None
+    if "stage" not in sources and all(part in by_key for part in TNM_PARTS):
+        tnm = tuple(by_key[part] for part in TNM_PARTS)
+    used = set(sources.values()) | set(tnm or ())
+    return SchemaPlan(
+        fingerprint=fingerprint(columns),
+        kind="followup" if "month_index" in sources else "snapshot",
+        sources=sources,
+        tnm_sources=tnm,
+        extra=tuple(c for c in columns if c not in used),
+    )
+
+
+def detect(columns: Sequence[str]) -> SchemaPlan:
+    """Mapping plan for a header (cached per fingerprint)"""
+    return _plan_for(tuple(columns))
+
+
+def schema_cache_info():
+    return _plan_for.cache_info()
+
+
+def _text(series: pd.Series) -> pd.Series:
+    out = series.astype("string").str.strip()
+    return out.mask(out == "")
+
+
+def _categories(column: str, observed) -> pd.Index:
+    enum_cls = CATEGORY_COLUMNS[column]
+    known = [member.value for member in enum_cls] if enum_cls is not None else []
+    extra = sorted(set(observed) - set(known))
+    return pd.Index(known + extra, dtype=object)
+
+
+def _category(column: str, series: pd.Series) -> pd.Series:
+    return series.astype(pd.CategoricalDtype(_categories(column, series.dropna().unique())))
+
+
+def _factorized(series: pd.Series):
+    """(codes, cleaned distinct values): text cleanup then runs once per distinct value"""
+    codes, uniques = pd.factorize(series)
+    return codes, _text(pd.Series(uniques, dtype=object))
+
+
+def _category_from(column: str, series: pd.Series) -> pd.Series:
+    """Parse a raw text column straight into its policy categorical"""
+    codes, cleaned = _factorized(series)
+    if column == "gender":
+        cleaned = cleaned.str.lower().map(GENDER_VALUES).astype("string").fillna(cleaned)
+    dtype = pd.CategoricalDtype(_categories(column, cleaned.dropna().unique()))
+    # Cleaned value -> category code; -1 (missing) stays -1 through the appended sentinel
+    value_codes = dtype.categories.get_indexer(cleaned.astype(object).where(cleaned.notna(), None))
+    value_codes = np.append(value_codes, -1)[codes]
+    return pd.Series(pd.Categorical.from_codes(value_codes, dtype=dtype), index=series.index)
+
+
+def _month(series: pd.Series) -> pd.Series:
+    """Int16 when every value is a whole month in range, float32 otherwise"""
+    values = series.dropna()
+    if ((values % 1 == 0) & (values.abs() <= INT16_MAX)).all():
+        return series.astype("Int16")
+    return series.astype("float32")
+
+
+def lean_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply the dtype policy to canonical columns of ``df`` (in place where possible)"""
+    for column in df.columns:
+        if column in CATEGORY_COLUMNS:
+            if not isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = _category(column, df[column])
+        elif column in MONTH_COLUMNS:
+            df[column] = _month(df[column])
+        elif column in NUMERIC_COLUMNS and column not in EXACT_COLUMNS:
+            df[column] = df[column].astype("float32")
+    return df
+
+
+def normalize_frame(df: pd.DataFrame, keep_extra: bool = False) -> pd.DataFrame:
+    """Canonical frame for ``df``; already-normalized frames are returned as is
+
+    ``keep_extra`` appends the source columns that have no canonical mapping.
+    The plan is available as ``result.attrs["schema"]``.
+    """
+    if "schema" in df.attrs:
+        return df if keep_extra else df[CANONICAL_COLUMNS]
+    plan = detect(df.columns)
+    df = df.dropna(how="all")
+    out = pd.DataFrame(index=df.index)
+    for column in CANONICAL_COLUMNS:
+        source = plan.sources.get(column)
+        if source is None:
+            if column == "stage" and plan.tnm_sources:
+                t, n, m = (_text(df[c]).fillna("") for c in plan.tnm_sources)
+                value = _text(t + n + m)
+            elif column == "recurrence":
+                value = pd.Series(pd.NA, index=df.index, dtype="boolean")
+            elif column in NUMERIC_COLUMNS:
+                value = pd.Series(float("nan"), index=df.index, dtype="float64")
+            elif column in DATE_COLUMNS:
+                value = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+            else:
+                value = pd.Series(pd.NA, index=df.index, dtype="string")
+        elif column in NUMERIC_COLUMNS:
+            value = pd.to_numeric(df[source], errors="coerce").astype("float64")
+        elif column in DATE_COLUMNS:
+            value = pd.to_datetime(df[source], errors="coerce", format="mixed")
+        elif column == "recurrence":
+            codes, cleaned = _factorized(df[source])
+            flags = cleaned.str.lower().isin(TRUE_STRINGS).astype(object).where(cleaned.notna(), pd.NA)
+            value = pd.Series(pd.array(np.append(flags.to_numpy(), pd.NA)[codes], dtype="boolean"), index=df.index)
+        elif column in CATEGORY_COLUMNS:
+            value = _category_from(column, df[source])
+        else:
+            value = _text(df[source])
+        out[column] = value
+    if keep_extra:
+        for column in plan.extra:
+            if column not in out.columns:
+                out[column] = df[column]
+    out = lean_dtypes(out.reset_index(drop=True))
+    out.attrs["schema"] = plan
+    return out
+
+
+def concat_normalized(frames: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate normalized frames; the combined plan provides what any input provides"""
+    plans = [f.attrs["schema"] for f in frames]
+    frames = [f[CANONICAL_COLUMNS] for f in frames]
+    if len(frames) > 1:
+        # Matching dtypes keep concat from falling back to object/float64 columns
+        frames = [f.copy() for f in frames]
+        for column in CATEGORY_COLUMNS:
+            observed = set()
+            for f in frames:
+                observed.update(f[column].cat.categories)
+            dtype = pd.CategoricalDtype(_categories(column, observed))
+            for f in frames:
+                f[column] = f[column].astype(dtype)
+        for column in MONTH_COLUMNS:
+            if any(f[column].dtype != "Int16" for f in frames):
+                for f in frames:
+                    f[column] = f[column].astype("float32")
+    out = pd.concat(frames, ignore_index=True)
+    sources, tnm = {}, None
+    for plan in plans:
+        sources.update(plan.sources)
+        tnm = tnm or plan.tnm_sources
+    out.attrs["schema"] = plans[0] if len({p.fingerprint for p in plans}) == 1 else SchemaPlan(
+        fingerprint="+".join(sorted({p.fingerprint for p in plans})),
+        kind="followup" if any(p.kind == "followup" for p in plans) else "snapshot",
+        sources=sources,
+        tnm_sources=tnm,
+        extra=(),
+    )
+    return out
+
+
+def read_normalized(path: str, keep_extra: bool = False, **read_csv_kwargs) -> pd.DataFrame:
+    """``pd.read_csv`` + ``normalize_frame``"""
+    return normalize_frame(pd.read_csv(path, **read_csv_kwargs), keep_extra=keep_extra)
+
+
+def memory_report(path: str) -> dict:
+    """Deep memory use of ``path`` as plain ``read_csv`` vs. the normalized lean frame, per column"""
+    raw = pd.read_csv(path)
+    lean = normalize_frame(raw)
+    plan = lean.attrs["schema"]
+    columns = []
+    for column in CANONICAL_COLUMNS:
+        if column not in plan.provides:
+            continue
+        sources = [plan.sources[column]] if column in plan.sources else list(plan.tnm_sources)
+        columns.append({
+            "column": column,
+            "source": "+".join(sources),
+            "default_dtype": str(raw[sources[0]].dtype),
+            "lean_dtype": str(lean[column].dtype),
+            "default_bytes": int(sum(raw[s].memory_usage(deep=True, index=False) for s in sources)),
+            "lean_bytes": int(lean[column].memory_usage(deep=True, index=False)),
+        })
+    default_total = sum(c["default_bytes"] for c in columns)
+    lean_total = sum(c["lean_bytes"] for c in columns)
+    return {
+        "path": path,
+        "rows": int(lean.shape[0]),
+        "columns": columns,
+        "default_bytes": default_total,
+        "lean_bytes": lean_total,
+        "reduction": round(1 - lean_total / default_total, 3) if default_total else None,
+    }
+
+
+def main():
+    import sys
+
+    if len(sys.argv) < 2:
+        raise SystemExit("usage: python schema_normalizer.py path/to/cohort.csv [...]")
+    for path in sys.argv[1:]:
+        report = memory_report(path)
+        print(f"📊 {report['path']}: {report['rows']} rows")
+        for c in report["columns"]:
+            print(f"    {c['column']:<18} {c['default_dtype']:>8} {c['default_bytes'] / 1024:>10.1f} KiB  ->  "
+                  f"{c['lean_dtype'][:12]:>12} {c['lean_bytes'] / 1024:>10.1f} KiB")
+        print(f"✅ {report['default_bytes'] / 1024 ** 2:.2f} MiB -> {report['lean_bytes'] / 1024 ** 2:.2f} MiB "
+              f"({report['reduction']:.0%} smaller)")
+
+
+if __name__ == "__main__":
+    main()
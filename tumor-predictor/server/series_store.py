@@ -0,0 +1,415 @@
+"""
+Memory-mapped follow-up time-series store
+
+Follow-up series are kept as Arrow IPC (Feather v2) segment files under
+``SERIES_STORE_DIR``. Each segment holds the columns
+(patient_id, month, tumor_size, treatment, response), sorted by patient
+and month. A sidecar ``.offsets.arrow`` file records each patient's
+(start, length) within the segment. Segments are memory-mapped and never
+decompressed, so readers get zero-copy slices and numpy views. Appends
+(/ingest) write a new segment and swap ``manifest.json`` atomically. Once
+there are ``SERIES_MAX_SEGMENTS`` segments they are compacted into one.
+Rows for the same (patient, month) in a later segment supersede earlier ones.
+
+The manifest also records what the store was built from: for a data
+directory, each CSV's size and mtime. ``is_current(data_dir)`` compares that
+fingerprint with the directory, and ``ensure_current`` rebuilds on mismatch.
+CSVs added to data/ outside /ingest (copied files, generate_cohort output)
+are therefore picked up on the next check.
+
+Needs pyarrow; without it the store reports itself unavailable and callers
+fall back to reading the CSVs.
+
+Usage:
+    python series_store.py [--data-dir data] [--from-db] [--compact]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from schema_normalizer import normalize_frame, read_normalized
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except Exception:
+    pa = None  # series store unavailable without pyarrow
+    ipc = None
+
+SERIES_STORE_DIR = os.getenv("SERIES_STORE_DIR", os.path.join("data", "series"))
+SERIES_MAX_SEGMENTS = int(os.getenv("SERIES_MAX_SEGMENTS", "16"))
+MANIFEST = "manifest.json"
+
+# Store column -> canonical column from schema_normalizer
+SERIES_COLUMNS = {
+    "patient_id": "patient_id",
+    "month": "month_index",
+    "tumor_size": "tumor_size_cm",
+    "treatment": "treatment_type",
+    "response": "response",
+}
+
+
+def _schema():
+    return pa.schema([
+        ("patient_id", pa.string()),
+        ("month", pa.int16()),
+        ("tumor_size", pa.float32()),
+        ("treatment", pa.dictionary(pa.int32(), pa.string())),
+        ("response", pa.dictionary(pa.int32(), pa.string())),
+    ])
+
+
+def series_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Store columns of a (raw or normalized) follow-up frame, sorted, one row per (patient, month)"""
+    df = normalize_frame(df)
+    out = df[list(SERIES_COLUMNS.values())].rename(columns={v: k for k, v in SERIES_COLUMNS.items()})
+    return _dedupe_sorted(out.dropna(subset=["patient_id", "month", "tumor_size"]))
+
+
+def _dedupe_sorted(frame: pd.DataFrame) -> pd.DataFrame:
+    """Last row per (patient, month), ordered by patient then month"""
+    frame = frame.drop_duplicates(["patient_id", "month"], keep="last")
+    return frame.sort_values(["patient_id", "month"], kind="stable").reset_index(drop=True)
+
+
+def _to_table(frame: pd.DataFrame):
+    return pa.table({
+        "patient_id": pa.array(frame["patient_id"].astype(object), type=pa.string()),
+        "month": pa.array(frame["month"].round().astype("int16").to_numpy(), type=pa.int16()),
+        "tumor_size": pa.array(frame["tumor_size"].astype("float32").to_numpy(), type=pa.float32()),
+        "treatment": pa.array(frame["treatment"].astype(object), type=pa.string()).dictionary_encode(),
+        "response": pa.array(frame["response"].astype(object), type=pa.string()).dictionary_encode(),
+    }, schema=_schema())
+
+
+def _offsets(patient_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(ids, starts, lengths) of the runs in a sorted id array"""
+    if len(patient_ids) == 0:
+        empty = np.array([], dtype=np.int64)
+        return np.array([], dtype=object), empty, empty
+    starts = np.concatenate([[0], np.flatnonzero(patient_ids[1:] != patient_ids[:-1]) + 1]).astype(np.int64)
+    lengths = np.diff(np.concatenate([starts, [len(patient_ids)]])).astype(np.int64)
+    return patient_ids[starts], starts, lengths
+
+
+def source_fingerprint(data_dir: str) -> Dict[str, List[int]]:
+    """name -> [size, mtime_ns] of the CSVs ``csv_frames`` reads from ``data_dir``"""
+    if not os.path.isdir(data_dir):
+        return {}
+    fingerprint = {}
+    for name in sorted(os.listdir(data_dir)):
+        if name.lower().endswith(".csv") and not name.startswith("."):
+            st = os.stat(os.path.join(data_dir, name))
+            fingerprint[name] = [st.st_size, st.st_mtime_ns]
+    return fingerprint
+
+
+def _write_ipc(table, path: str) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def _read_ipc(path: str):
+    return ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+class Segment:
+    def __init__(self, root: str, name: str):
+        self.name = name
+        self.table = _read_ipc(os.path.join(root, f"{name}.arrow"))
+        offsets = _read_ipc(os.path.join(root, f"{name}.offsets.arrow"))
+        self.offsets: Dict[str, Tuple[int, int]] = dict(zip(
+            offsets.column("patient_id").to_pylist(),
+            zip(offsets.column("start").to_pylist(), offsets.column("length").to_pylist()),
+        ))
+
+
+class SeriesStore:
+    """Segmented, memory-mapped follow-up series with per-patient offsets"""
+
+    def __init__(self, root: str = SERIES_STORE_DIR, max_segments: int = SERIES_MAX_SEGMENTS):
+        self.root = root
+        self.max_segments = max_segments
+        self._lock = threading.RLock()
+        self._manifest_version = None
+        self._segments: List[Segment] = []
+        self._next = 1
+        self._source: Optional[dict] = None
+
+    @property
+    def available(self) -> bool:
+        return pa is not None
+
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.root, MANIFEST))
+
+    def _segments_now(self) -> List[Segment]:
+        """Segments of the current manifest, remapped only when it changed"""
+        path = os.path.join(self.root, MANIFEST)
+        with self._lock:
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._manifest_version, self._segments, self._next, self._source = None, [], 1, None
+                return []
+            # Publishes go through os.replace, so a new inode also marks a change within one mtime tick
+            version = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if version != self._manifest_version:
+                with open(path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+                known = {s.name: s for s in self._segments}
+                self._segments = [known.get(name) or Segment(self.root, name) for name in manifest["segments"]]
+                self._next = manifest["next"]
+                self._source = manifest.get("source")
+                self._manifest_version = version
+            return self._segments
+
+    def _publish(self, names: List[str], next_id: int, obsolete: Iterable[str] = (), source: Optional[dict] = None) -> None:
+        """Swap in a new manifest; ``source`` defaults to the current one"""
+        path = os.path.join(self.root, MANIFEST)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(self.root, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segments": names, "next": next_id, "source": source if source is not None else self._source}, f)
+        os.replace(tmp_path, path)
+        # Open memory maps keep unlinked segments readable
+        for name in obsolete:
+            for suffix in (".arrow", ".offsets.arrow"):
+                try:
+                    os.remove(os.path.join(self.root, f"{name}{suffix}"))
+                except OSError:
+                    pass
+
+    def _write_segment(self, frame: pd.DataFrame, seg_id: int) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        name = f"seg-{seg_id:06d}"
+        ids, starts, lengths = _offsets(frame["patient_id"].to_numpy(dtype=object))
+        _write_ipc(_to_table(frame), os.path.join(self.root, f"{name}.arrow"))
+        _write_ipc(
+            pa.table({"patient_id": pa.array(ids, type=pa.string()), "start": starts, "length": lengths}),
+            os.path.join(self.root, f"{name}.offsets.arrow"),
+        )
+        return name
+
+    def append(self, df: pd.DataFrame, source_path: Optional[str] = None) -> int:
+        """Add follow-up rows as a new segment; returns the rows written"""
+        return self.append_series([series_frame(df)], source_path=source_path)
+
+    def append_series(self, parts: List[pd.DataFrame], source_path: Optional[str] = None) -> int:
+        """Add ``series_frame`` outputs (e.g. one per upload chunk) as a single new segment
+
+        ``source_path`` is the CSV the rows were saved to. A new file in the
+        store's data directory is added to the fingerprint; a rewritten one
+        leaves the fingerprint stale, so the next ``ensure_current`` rebuilds
+        without the file's old rows.
+        """
+        parts = [p for p in parts if not p.empty]
+        if not parts:
+            return 0
+        frame = _dedupe_sorted(pd.concat(parts, ignore_index=True)) if len(parts) > 1 else parts[0]
+        with self._lock:
+            segments = self._segments_now()
+            name = self._write_segment(frame, self._next)
+            self._publish([s.name for s in segments] + [name], self._next + 1, source=self._with_file(source_path))
+            if len(segments) + 1 >= self.max_segments:
+                self.compact()
+        return int(frame.shape[0])
+
+    def _with_file(self, path: Optional[str]) -> Optional[dict]:
+        source = self._source
+        if path is None or not source or "data_dir" not in source:
+            return None
+        data_dir, name = os.path.split(os.path.abspath(path))
+        if data_dir != source["data_dir"] or name in source["files"]:
+            return None
+        st = os.stat(path)
+        return {**source, "files": {**source["files"], name: [st.st_size, st.st_mtime_ns]}}
+
+    def rebuild(self, frames: Iterable[pd.DataFrame], source: Optional[dict] = None) -> int:
+        """Replace the whole store with ``frames`` as a single segment
+
+        ``source`` describes where the frames came from (see ``rebuild_from_csvs``).
+        """
+        parts = [series_frame(df) for df in frames]
+        parts = [p for p in parts if not p.empty]
+        frame = _dedupe_sorted(pd.concat(parts, ignore_index=True)) if parts else None
+        with self._lock:
+            old = [s.name for s in self._segments_now()]
+            names = []
+            if frame is not None:
+                names.append(self._write_segment(frame, self._next))
+            self._publish(names, self._next + 1, obsolete=old, source=source or {})
+        return 0 if frame is None else int(frame.shape[0])
+
+    def rebuild_from_csvs(self, data_dir: str) -> int:
+        """Rebuild from the CSVs in ``data_dir``, recording their fingerprint"""
+        # Fingerprint first: a file changing during the read leaves the store stale, not wrongly current
+        source = {"data_dir": os.path.abspath(data_dir), "files": source_fingerprint(data_dir)}
+        return self.rebuild(csv_frames(data_dir), source=source)
+
+    def source(self) -> Optional[dict]:
+        """What the current store was built from, or None without a store"""
+        with self._lock:
+            self._segments_now()
+            return self._source
+
+    def is_current(self, data_dir: str) -> bool:
+        """True when the store was built from exactly the CSVs now in ``data_dir``"""
+        source = self.source()
+        return bool(source) and source.get("data_dir") == os.path.abspath(data_dir) \
+            and source.get("files") == source_fingerprint(data_dir)
+
+    def ensure_current(self, data_dir: str) -> bool:
+        """Rebuild from ``data_dir`` unless the store already matches it; returns True if rebuilt"""
+        with self._lock:
+            if self.is_current(data_dir):
+                return False
+            self.rebuild_from_csvs(data_dir)
+            return True
+
+    def compact(self) -> int:
+        """Merge all segments into one, later segments winning per (patient, month)"""
+        with self._lock:
+            segments = self._segments_now()
+            if len(segments) <= 1:
+                return len(segments)
+            merged = _dedupe_sorted(pd.concat([s.table.to_pandas() for s in segments], ignore_index=True))
+            name = self._write_segment(merged, self._next)
+            self._publish([name], self._next + 1, obsolete=[s.name for s in segments])
+            return len(segments)
+
+    def series(self, patient_id: str):
+        """Arrow table of one patient's follow-ups (zero-copy when it lives in one segment)"""
+        slices = []
+        for segment in self._segments_now():
+            span = segment.offsets.get(patient_id)
+            if span is not None:
+                slices.append(segment.table.slice(*span))
+        if not slices:
+            return None
+        if len(slices) == 1:
+            return slices[0]
+        merged = pa.concat_tables(slices).to_pandas()
+        merged = merged.drop_duplicates("month", keep="last").sort_values("month", kind="stable")
+        return _to_table(merged.reset_index(drop=True))
+
+    def arrays(self, patient_id: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(months int16, sizes float32) numpy arrays for one patient, or None"""
+        table = self.series(patient_id)
+        if table is None:
+            return None
+        return (
+            table.column("month").to_numpy(),
+            table.column("tumor_size").to_numpy(),
+        )
+
+    def iter_arrays(self) -> Iterator[Tuple[str, np.ndarray, np.ndarray]]:
+        """(patient_id, months, sizes) for every patient in the store"""
+        for patient_id in self.patients():
+            months, sizes = self.arrays(patient_id)
+            yield patient_id, months, sizes
+
+    def frame(self, patient_id: str) -> Optional[pd.DataFrame]:
+        """One patient's follow-ups as a normalized (canonical-column) frame"""
+        table = self.series(patient_id)
+        if table is None:
+            return None
+        df = table.to_pandas().rename(columns=SERIES_COLUMNS)
+        for column in ("treatment_type", "response"):
+            df[column] = df[column].astype(object)
+        return normalize_frame(df)
+
+    def patients(self) -> List[str]:
+        ids = set()
+        for segment in self._segments_now():
+            ids.update(segment.offsets)
+        return sorted(ids)
+
+    def stats(self) -> dict:
+        segments = self._segments_now() if self.available else []
+        return {
+            "available": self.available,
+            "root": self.root,
+            "segments": len(segments),
+            "rows": sum(s.table.num_rows for s in segments),
+            "patients": len(self.patients()) if segments else 0,
+            "bytes": sum(s.table.nbytes for s in segments),
+            "source": self.source() if self.available else None,
+        }
+
+
+series_store = SeriesStore()
+
+
+def csv_frames(data_dir: str) -> Iterator[pd.DataFrame]:
+    for name in sorted(os.listdir(data_dir)):
+        if name.lower().endswith(".csv") and not name.startswith("."):
+            try:
+                yield read_normalized(os.path.join(data_dir, name))
+            except Exception as e:
+                print(f"⚠️  Skipping {name}: {e}")
+
+
+def _db_frames(chunk_rows: int = 50000) -> Iterator[pd.DataFrame]:
+    from sqlalchemy import select
+
+    from database import SessionLocal
+    from models.database_models import PatientFollowup
+
+    columns = [
+        PatientFollowup.patient_id, PatientFollowup.follow_up_month, PatientFollowup.tumor_size_cm,
+        PatientFollowup.treatment_type, PatientFollowup.response_to_treatment,
+    ]
+    db = SessionLocal()
+    try:
+        result = db.execute(select(*columns).execution_options(yield_per=chunk_rows))
+        for rows in result.partitions():
+            yield pd.DataFrame({
+                "patient_id": [r[0] for r in rows],
+                "month_index": [r[1] for r in rows],
+                "tumor_size_cm": [float(r[2]) for r in rows],
+                "treatment_type": [r[3].value if r[3] is not None else None for r in rows],
+                "response": [r[4].value if r[4] is not None else None for r in rows],
+            })
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default="data", help="Rebuild from the CSVs in this directory")
+    parser.add_argument("--from-db", action="store_true", help="Rebuild from patient_followups instead")
+    parser.add_argument("--compact", action="store_true", help="Only merge existing segments")
+    args = parser.parse_args()
+
+    if not series_store.available:
+        raise SystemExit("❌ pyarrow is required for the series store")
+    started = time.perf_counter()
+    if args.compact:
+        merged = series_store.compact()
+        print(f"✅ Compacted {merged} segments")
+    else:
+        source = "patient_followups" if args.from_db else f"{args.data_dir}/"
+        print(f"📈 Rebuilding series store in {series_store.root}/ from {source} ...")
+        if args.from_db:
+            rows = series_store.rebuild(_db_frames(), source={"database": True})
+        else:
+            rows = series_store.rebuild_from_csvs(args.data_dir)
+        print(f"✅ Wrote {rows} follow-up rows")
+    stats = series_store.stats()
+    print(f"⏱  {stats['patients']} patients, {stats['rows']} rows in {stats['segments']} segment(s), "
+          f"{stats['bytes'] / 1024:.1f} KiB, {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Per-request SQL instrumentation
+
+Engine-wide cursor hooks time every statement and attribute it to the
+request being served (tracked through a context variable, which follows the
+request into worker threads and async greenlets). For each request we keep
+the query count, total DB time, the slowest statements and any statement
+shape repeated often enough to suggest an N+1 pattern.
+
+``/debug/sql-stats`` exposes statement text and timings (and can reset
+them), so it is only served when ``SQL_STATS_ENDPOINT=1``; the per-response
+summary headers stay on with ``SQL_STATS_ENABLED``.
+"""
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_STATS_ENABLED = os.getenv("SQL_STATS_ENABLED", "1") != "0"
+SQL_STATS_ENDPOINT = os.getenv("SQL_STATS_ENDPOINT", "0") == "1"
+NPLUS1_THRESHOLD = int(os.getenv("SQL_NPLUS1_THRESHOLD", "5"))
+SLOWEST_KEPT = 5
+RECENT_REQUESTS = int(os.getenv("SQL_STATS_HISTORY", "200"))
+STATEMENT_PREVIEW = 300
+
+# Expanded IN lists vary in length; collapse them so they share one shape
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%s|:\w+)\s*,)+\s*(?:\?|%s|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_current = ContextVar("sql_request_stats", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    return _IN_LIST.sub("(?, ...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class RequestSQLStats:
+    """Statements executed while serving one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest = []  # (ms, statement), kept sorted descending
+        self.shapes = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        shape = statement_shape(statement)
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            self.shapes[shape] += 1
+            if len(self.slowest) < SLOWEST_KEPT or elapsed_ms > self.slowest[-1][0]:
+                self.slowest.append((elapsed_ms, shape))
+                self.slowest.sort(key=lambda item: item[0], reverse=True)
+                del self.slowest[SLOWEST_KEPT:]
+
+    def suspected_n_plus_one(self):
+        return [
+            {"statement": shape[:STATEMENT_PREVIEW], "count": count}
+            for shape, count in self.shapes.most_common()
+            if count >= NPLUS1_THRESHOLD
+        ]
+
+    def header_value(self) -> str:
+        return f"count={self.count}; time_ms={self.total_ms:.2f}; n_plus_one={len(self.suspected_n_plus_one())}"
+
+    def to_dict(self) -> dict:
+        return {
+            "query_count": self.count,
+            "db_time_ms": round(self.total_ms, 3),
+            "slowest": [{"ms": round(ms, 3), "statement": shape[:STATEMENT_PREVIEW]} for ms, shape in self.slowest],
+            "suspected_n_plus_one": self.suspected_n_plus_one(),
+        }
+
+
+class SQLStatsRegistry:
+    """Recent per-request stats plus running per-endpoint totals"""
+
+    def __init__(self, history: int):
+        self.recent = deque(maxlen=history)
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def add(self, method: str, endpoint: str, path: str, status_code: int, stats: RequestSQLStats) -> None:
+        entry = {"method": method, "endpoint": endpoint, "path": path, "status_code": status_code, **stats.to_dict()}
+        key = f"{method} {endpoint}"
+        with self._lock:
+            self.recent.append(entry)
+            totals = self.endpoints.setdefault(key, {"requests": 0, "queries": 0, "db_time_ms": 0.0, "max_queries": 0, "n_plus_one_requests": 0})
+            totals["requests"] += 1
+            totals["queries"] += stats.count
+            totals["db_time_ms"] += stats.total_ms
+            totals["max_queries"] = max(totals["max_queries"], stats.count)
+            if entry["suspected_n_plus_one"]:
+                totals["n_plus_one_requests"] += 1
+
+    def snapshot(self, limit: int) -> dict:
+        with self._lock:
+            endpoints = {
+                key: {
+                    **totals,
+                    "db_time_ms": round(totals["db_time_ms"], 3),
+                    "avg_queries": round(totals["queries"] / totals["requests"], 2),
+                    "avg_db_time_ms": round(totals["db_time_ms"] / totals["requests"], 3),
+                }
+                for key, totals in self.endpoints.items()
+            }
+            recent = list(self.recent)[-limit:] if limit > 0 else []
+        return {
+            "enabled": SQL_STATS_ENABLED,
+            "n_plus_one_threshold": NPLUS1_THRESHOLD,
+            "endpoints": endpoints,
+            "recent": list(reversed(recent)),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.recent.clear()
+            self.endpoints.clear()
+
+
+registry = SQLStatsRegistry(RECENT_REQUESTS)
+
+
+def begin_request() -> Optional[tuple]:
+    """Start collecting for the current request; returns a token for ``end_request``"""
+    if not SQL_STATS_ENABLED:
+        return None
+    stats = RequestSQLStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token: tuple) -> RequestSQLStats:
+    stats, reset_token = token
+    _current.reset(reset_token)
+    return stats
+
+
+# ---- engine hooks ----
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("sql_stats_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    starts = conn.info.get("sql_stats_start")
+    if stats is None or not starts:
+        return
+    stats.record(statement, (time.perf_counter() - starts.pop()) * 1000.0)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    starts = conn.info.get("sql_stats_start") if conn is not None else None
+    if starts:
+        starts.pop()
@@ -0,0 +1,210 @@
+"""
+Streaming CSV uploads for /ingest
+
+``UploadSizeLimit`` rejects request bodies over ``INGEST_MAX_BYTES`` (multipart
+framing included) before the form is parsed, from the Content-Length header
+or, for chunked requests, as the body streams in, so the cap also bounds
+what Starlette spools to disk. The upload is copied to a temp file in
+fixed-size chunks (never held in memory whole) and rejected once the file
+itself passes the limit. A worker
+thread then parses it with ``read_csv(chunksize=...)``, normalizes each chunk,
+writes it to a second temp file and, if requested, feeds it to the bulk
+loader. The result is renamed into data/ with ``os.replace``, so readers
+never see a partial file; its follow-up series are then appended to the
+series store as one segment. Progress for each upload id is kept in memory and
+exposed by the API. Uploads without data rows are rejected.
+"""
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from bulk_ingest import load_chunks
+from schema_normalizer import normalize_frame
+from series_store import series_frame, series_store
+
+INGEST_MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", str(2 * 1024 ** 3)))
+INGEST_READ_CHUNK_BYTES = int(os.getenv("INGEST_READ_CHUNK_BYTES", str(1024 * 1024)))
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "100000"))
+PROGRESS_KEPT = 200
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class ProgressRegistry:
+    """Most recent uploads' progress, keyed by upload id"""
+
+    def __init__(self, kept: int):
+        self.kept = kept
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, upload_id: Optional[str], filename: str) -> str:
+        upload_id = upload_id or uuid.uuid4().hex
+        with self._lock:
+            self._entries[upload_id] = {
+                "upload_id": upload_id,
+                "filename": filename,
+                "stage": "receiving",
+                "bytes_received": 0,
+                "rows_processed": 0,
+                "started_at": time.time(),
+                "updated_at": time.time(),
+                "error": None,
+            }
+            self._entries.move_to_end(upload_id)
+            while len(self._entries) > self.kept:
+                self._entries.popitem(last=False)
+        return upload_id
+
+    def update(self, upload_id: str, **fields) -> None:
+        with self._lock:
+            entry = self._entries.get(upload_id)
+            if entry is not None:
+                entry.update(fields, updated_at=time.time())
+
+    def get(self, upload_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(upload_id)
+            return dict(entry) if entry is not None else None
+
+
+progress = ProgressRegistry(PROGRESS_KEPT)
+
+
+class UploadSizeLimit:
+    """ASGI middleware capping request bodies on ``paths`` at ``INGEST_MAX_BYTES``"""
+
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        max_bytes = INGEST_MAX_BYTES
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > max_bytes:
+            await self._reject(scope, receive, send, max_bytes)
+            return
+
+        received = 0
+        state = {"started": False, "rejected": False}
+
+        async def limited_receive():
+            nonlocal received
+            if state["rejected"]:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes and not state["started"]:
+                    # Answer now and end the body; whatever the app sends afterwards is dropped
+                    await self._reject(scope, receive, send, max_bytes)
+                    state["rejected"] = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracked_send(message):
+            if state["rejected"]:
+                return
+            if message["type"] == "http.response.start":
+                state["started"] = True
+            await send(message)
+
+        await self.app(scope, limited_receive, tracked_send)
+
+    @staticmethod
+    async def _reject(scope, receive, send, max_bytes):
+        response = JSONResponse({"detail": f"INGEST_ERROR: request body exceeds {max_bytes} bytes"}, status_code=413)
+        await response(scope, receive, send)
+
+
+def _remove(path: Optional[str]) -> None:
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+async def receive_upload(file, dest_dir: str, upload_id: str, max_bytes: int = INGEST_MAX_BYTES) -> str:
+    """Copy an UploadFile to a temp file in ``dest_dir``; returns its path
+
+    Raises UploadTooLarge once more than ``max_bytes`` have been received.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".upload-", suffix=".part", dir=dest_dir)
+    received = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(INGEST_READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if received > max_bytes:
+                    raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+                await run_in_threadpool(out.write, chunk)
+                progress.update(upload_id, bytes_received=received)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def process_upload(raw_path: str, save_path: str, upload_id: str, load_to_db: bool = False,
+                   chunk_rows: int = INGEST_CHUNK_ROWS) -> dict:
+    """Normalize ``raw_path`` chunk by chunk into ``save_path`` (atomically), optionally bulk-loading it
+
+    Runs in a worker thread. Raises ValueError for unreadable CSVs or failed
+    loads; nothing is written to ``save_path`` in that case.
+    """
+    dest_dir = os.path.dirname(save_path) or "."
+    fd, out_path = tempfile.mkstemp(prefix=".ingest-", suffix=".csv", dir=dest_dir)
+    os.close(fd)
+    counts = {"rows": 0}
+    series_parts = []
+
+    def normalized_chunks():
+        try:
+            reader = pd.read_csv(raw_path, chunksize=chunk_rows)
+            for i, chunk in enumerate(reader):
+                chunk = normalize_frame(chunk, keep_extra=True)
+                if series_store.available:
+                    series_parts.append(series_frame(chunk))
+                chunk.to_csv(out_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+                counts["rows"] += int(chunk.shape[0])
+                progress.update(upload_id, rows_processed=counts["rows"])
+                yield chunk
+        except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as e:
+            raise ValueError(f"Failed to parse CSV: {e}")
+        # Raised inside the load, so a header-only file rolls back and is never published
+        if counts["rows"] == 0:
+            raise ValueError("CSV has no data rows")
+
+    try:
+        progress.update(upload_id, stage="loading" if load_to_db else "parsing")
+        database = load_chunks(normalized_chunks()) if load_to_db else None
+        if not load_to_db:
+            for _ in normalized_chunks():
+                pass
+        os.replace(out_path, save_path)
+    except BaseException:
+        _remove(out_path)
+        raise
+    finally:
+        _remove(raw_path)
+
+    result = {"rows": counts["rows"], "path": save_path}
+    if series_store.available:
+        result["series_rows"] = series_store.append_series(series_parts, source_path=save_path)
+    if database is not None:
+        result["database"] = database
+    return result
@@ -0,0 +1,94 @@
+"""
+Shared fixtures for the server tests
+
+Run from ``tumor-predictor/server`` with ``python -m pytest -q tests``. The
+app's modules read their configuration at import time, so the database URL
+and working directory point at a temporary copy of ``data/`` before anything
+from the server is imported.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix="tumor-predictor-tests-")
+DATA_DIR = os.path.join(WORK_DIR, "data")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{WORK_DIR}/test.db"
+sys.path.insert(0, SERVER_DIR)
+shutil.copytree(os.path.join(SERVER_DIR, "data"), DATA_DIR)
+os.chdir(WORK_DIR)
+
+from database import Base, SessionLocal, create_tables, engine  # noqa: E402
+from models.analytics_summary import rebuild_summary  # noqa: E402
+from models.report_cache import report_cache  # noqa: E402
+
+create_tables()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    os.chdir(SERVER_DIR)
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    """A session on an emptied database with a freshly built summary"""
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    report_cache.clear()
+    session = SessionLocal()
+    rebuild_summary(session)
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    import app as app_module
+    return TestClient(app_module.app)
+
+
+@pytest.fixture
+def make_patient(db):
+    """Insert a patient with fixed demographics through the ORM"""
+    from models.database_models import Patient
+
+    def make(patient_id: str, **overrides) -> Patient:
+        values = dict(
+            patient_id=patient_id, age=55, gender="Male", stage_tnm="T2N1M0", initial_tumor_size_cm=2.0,
+            smoking_status="Current Smoker", alcohol_use="Moderate", oral_hygiene="Poor", hpv_status="Negative",
+        )
+        values.update(overrides)
+        patient = Patient(**values)
+        db.add(patient)
+        db.commit()
+        return patient
+
+    return make
+
+
+@pytest.fixture
+def make_followup(db):
+    """Insert a follow-up through the ORM (Chemo+RT, good response unless overridden)"""
+    from models.database_models import PatientFollowup, ResponseEnum, TreatmentTypeEnum
+
+    def make(patient_id: str, month: int, size: float, **overrides) -> PatientFollowup:
+        values = dict(
+            patient_id=patient_id, follow_up_month=month, tumor_size_cm=size,
+            treatment_type=TreatmentTypeEnum.CHEMO_RT, response_to_treatment=ResponseEnum.GOOD,
+        )
+        values.update(overrides)
+        followup = PatientFollowup(**values)
+        db.add(followup)
+        db.commit()
+        return followup
+
+    return make
@@ -0,0 +1,33 @@
+import subprocess
+import sys
+import textwrap
+
+from conftest import SERVER_DIR, WORK_DIR
+from models.database_models import Patient
+
+
+def test_hooks_registered_without_importing_summary_module(db):
+    """A writer that only imports database_models still maintains the summary"""
+    script = textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {SERVER_DIR!r})
+        from database import SessionLocal
+        from models.database_models import AnalyticsSummary, Patient
+        db = SessionLocal()
+        db.add(Patient(patient_id="S001", age=60, gender="Male", stage_tnm="T1N0M0", initial_tumor_size_cm=1.5,
+                       smoking_status="Never Smoked", alcohol_use="None", oral_hygiene="Good", hpv_status="Negative"))
+        db.commit()
+        print(db.query(AnalyticsSummary.row_count).filter_by(metric="patients").scalar())
+    """)
+    out = subprocess.run([sys.executable, "-c", script], cwd=WORK_DIR, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "1"
+
+
+def test_summary_tracks_orm_writes(client, db, make_patient):
+    make_patient("S002")
+    make_patient("S003")
+    assert client.get("/analytics/summary").json()["total_patients"] == 2
+
+    db.delete(db.get(Patient, "S002"))
+    db.commit()
+    assert client.get("/analytics/summary").json()["total_patients"] == 1
@@ -0,0 +1,78 @@
+import pytest
+
+import app as app_module
+from audit_log import AuditLogger
+from models.database_models import PatientAssignment, User, UserRoleEnum, UserSession
+
+
+@pytest.fixture
+def audit(monkeypatch):
+    """A started audit logger that only writes when stopped"""
+    logger = AuditLogger(batch_size=1000, flush_interval=60.0)
+    logger.start()
+    monkeypatch.setattr(app_module, "audit_logger", logger)
+    yield logger
+    logger.stop()
+
+
+@pytest.fixture
+def doctor(db, make_patient):
+    make_patient("P1")
+    user = User(user_id="doc1", username="doc1", email="doc1@example.com", full_name="Doc One", role=UserRoleEnum.DOCTOR)
+    db.add(user)
+    db.commit()
+    db.add(PatientAssignment(user_id=user.id, patient_id="P1", assignment_type="primary"))
+    db.commit()
+    return user
+
+
+def test_request_queues_one_row_with_trusted_actor(client, db, audit, doctor):
+    forged = {"X-User-Id": "someone-else", "X-Patient-Id": "P999"}
+    assert client.get("/users/doc1/patients/P1/report", headers=forged).status_code == 200
+    assert audit.stats()["enqueued"] == 1
+    audit.stop()
+
+    rows = db.query(UserSession).all()
+    assert len(rows) == 1
+    row = rows[0]
+    assert (row.user_id, row.patient_id, row.action_type.value) == (doctor.id, "P1", "view")
+    assert row.action_data["claimed_user_id"] == "someone-else"
+    assert row.action_data["claimed_patient_id"] == "P999"
+    assert row.action_data["path"] == "/users/doc1/patients/P1/report"
+
+
+def test_header_ids_are_only_claims(client, db, audit, doctor):
+    headers = {"X-User-Id": "doc1", "X-Patient-Id": "P1"}
+    assert client.post("/predict", json={"treatment": "chemo"}, headers=headers).status_code == 200
+    audit.stop()
+
+    row = db.query(UserSession).one()
+    assert (row.user_id, row.patient_id) == (None, None)
+    assert (row.action_data["claimed_user_id"], row.action_data["claimed_patient_id"]) == ("doc1", "P1")
+
+
+def test_authenticated_identity_is_the_actor(client, db, audit, doctor, monkeypatch):
+    from starlette.authentication import SimpleUser
+
+    monkeypatch.setattr(app_module, "authenticated_user", lambda scope: SimpleUser("doc1").display_name)
+    assert client.post("/predict", json={"treatment": "chemo"}).status_code == 200
+    audit.stop()
+    assert db.query(UserSession).one().user_id == doctor.id
+
+
+def test_writer_failure_does_not_fail_the_request(client, db, audit, doctor, monkeypatch):
+    def broken_write(db, batch):
+        raise RuntimeError("audit table unavailable")
+
+    monkeypatch.setattr(audit, "_write_batch", broken_write)
+    monkeypatch.setattr(audit, "max_retries", 0)
+    assert client.get("/users/doc1/dashboard").status_code == 200
+    audit.stop()
+    assert audit.stats()["failed"] == 1
+    assert db.query(UserSession).count() == 0
+
+    def broken_enqueue(record):
+        raise RuntimeError("queue broken")
+
+    monkeypatch.setattr(audit, "enqueue", broken_enqueue)
+    assert client.get("/users/doc1/dashboard").status_code == 200
@@ -0,0 +1,59 @@
+"""
+/analyze-batch against /analyze
+
+A batch result matches a single /analyze call whenever the source holds one
+patient. Multi-patient CSVs are split into one result per patient_id.
+"""
+import pandas as pd
+import pytest
+
+from conftest import DATA_DIR
+
+SINGLE_PATIENT_CSVS = [
+    "data/patient_a_aggressive_data.csv",
+    "data/patient_b_moderate_data.csv",
+    "data/patient_c_high_risk_data.csv",
+]
+
+
+def _without_batch_keys(result):
+    return {k: v for k, v in result.items() if k not in ("source", "patient_id")}
+
+
+@pytest.mark.parametrize("treatment", ["chemo", "combined"])
+@pytest.mark.parametrize("csv_path", SINGLE_PATIENT_CSVS)
+def test_single_patient_csv_matches_analyze(client, csv_path, treatment):
+    single = client.post("/analyze", json={"csv_path": csv_path, "treatment": treatment})
+    batch = client.post("/analyze-batch", json={"csv_paths": [csv_path], "treatment": treatment})
+    assert single.status_code == 200 and batch.status_code == 200
+
+    results = batch.json()["results"]
+    assert len(results) == 1
+    assert results[0]["source"] == csv_path
+    assert _without_batch_keys(results[0]) == single.json()
+
+
+def test_patient_id_sources_match_analyze(client):
+    import patient_index as patient_index_module
+    patient_index = patient_index_module.patient_index
+    patient_index.refresh()
+    patient_ids = ["A001", "C001", "OC1001"]
+
+    batch = client.post("/analyze-batch", json={"patient_ids": patient_ids, "treatment": "chemo"}).json()
+    assert batch["failed"] == []
+    by_patient = {r["patient_id"]: r for r in batch["results"]}
+    assert sorted(by_patient) == sorted(patient_ids)
+    for patient_id in patient_ids:
+        single = client.post("/analyze", json={"patient_id": patient_id, "treatment": "chemo"})
+        assert single.status_code == 200
+        assert _without_batch_keys(by_patient[patient_id]) == single.json()
+
+
+def test_multi_patient_csv_splits_per_patient(client):
+    csv_path = "data/patient_data_over50.csv"
+    expected = pd.read_csv(f"{DATA_DIR}/patient_data_over50.csv", dtype=str)["Patient_ID"].dropna().unique()
+
+    batch = client.post("/analyze-batch", json={"csv_paths": [csv_path]}).json()
+    assert batch["count"] == len(expected) > 1
+    assert [r["patient_id"] for r in batch["results"]] == list(expected)
+    assert {r["source"] for r in batch["results"]} == {csv_path}
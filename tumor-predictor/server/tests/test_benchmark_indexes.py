@@ -0,0 +1,70 @@
+import sys
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+import benchmark_indexes
+
+
+def _run(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["benchmark_indexes.py", *argv])
+    benchmark_indexes.main()
+
+
+def test_refuses_real_database_without_destroy(monkeypatch, tmp_path):
+    path = tmp_path / "real.db"
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE keep_me (id INTEGER)"))
+
+    with pytest.raises(SystemExit):
+        _run(monkeypatch, "--database-url", f"sqlite:///{path}", "--patients", "5")
+
+    assert inspect(engine).get_table_names() == ["keep_me"]
+
+
+def test_default_run_removes_its_temp_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(benchmark_indexes.tempfile, "tempdir", str(tmp_path))
+    _run(monkeypatch, "--patients", "20", "--users", "2", "--sessions-per-user", "2", "--repeats", "2")
+    assert list(tmp_path.iterdir()) == []
+
+
+def _query_count(response):
+    fields = dict(part.strip().split("=") for part in response.headers["X-SQL-Stats"].split(";"))
+    return int(fields["count"])
+
+
+def test_trends_page_plan_uses_patient_month_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bench.db'}")
+    benchmark_indexes.Base.metadata.create_all(bind=engine)
+    patient_ids, user_pks = benchmark_indexes.seed(engine, 50, 4, 1, 2, 2)
+    shapes = [s for s in benchmark_indexes.query_shapes(patient_ids, user_pks) if s[0] == "patient_trends_page"]
+
+    benchmark_indexes.set_indexes(engine, False)
+    without = benchmark_indexes.measure(engine, shapes, repeats=1)["patient_trends_page"]["plan"]
+    benchmark_indexes.set_indexes(engine, True)
+    with_index = benchmark_indexes.measure(engine, shapes, repeats=1)["patient_trends_page"]["plan"]
+    engine.dispose()
+
+    assert not any("ix_patient_followups_patient_month" in line for line in without)
+    assert any("ix_patient_followups_patient_month" in line for line in with_index)
+
+
+def test_patient_trends_query_count_does_not_grow_with_page(client, make_patient, make_followup):
+    for i in range(8):
+        make_patient(f"T{i:03d}", stage_tnm="T2N1M0" if i % 2 else "T3N2M0")
+        for month in (3, 1, 2):
+            make_followup(f"T{i:03d}", month, 1.0 + month)
+
+    small = client.get("/analytics/patient-trends", params={"limit": 2})
+    large = client.get("/analytics/patient-trends", params={"limit": 8})
+    assert _query_count(small) == _query_count(large)
+
+    trends = large.json()["patient_trends"]
+    assert [t["patient_id"] for t in trends] == [f"T{i:03d}" for i in range(8)]
+    assert all([f["month"] for f in t["tumor_evolution"]] == [1, 2, 3] for t in trends)
+    assert small.json()["pagination"]["next_offset"] == 2
+    assert large.json()["pagination"]["next_offset"] is None
+
+    staged = client.get("/analytics/patient-trends", params={"stage": "T2"}).json()["patient_trends"]
+    assert [t["patient_id"] for t in staged] == ["T001", "T003", "T005", "T007"]
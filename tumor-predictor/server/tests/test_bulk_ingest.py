@@ -0,0 +1,98 @@
+import os
+
+import pandas as pd
+import pytest
+
+import bulk_ingest
+from conftest import DATA_DIR
+from models.database_models import Patient, PatientFollowup
+
+PATIENT_A = os.path.join(DATA_DIR, "patient_a_aggressive_data.csv")
+
+
+def test_load_chunks_keeps_baseline_from_first_chunk(db):
+    chunks = pd.read_csv(PATIENT_A, chunksize=5)
+
+    stats = bulk_ingest.load_chunks(chunks, db=db)
+
+    assert stats["patients_upserted"] == 1
+    assert stats["followups_loaded"] == 10
+    patient = db.get(Patient, "A001")
+    assert float(patient.initial_tumor_size_cm) == pytest.approx(4.8)
+    assert db.query(PatientFollowup).filter_by(patient_id="A001").count() == 10
+
+
+def test_later_upload_does_not_overwrite_baseline(db):
+    df = pd.read_csv(PATIENT_A)
+    bulk_ingest.load_dataframe(df.iloc[:5], db=db)
+
+    later = df.iloc[5:].copy()
+    later["Age"] = 70
+    stats = bulk_ingest.load_dataframe(later, db=db)
+
+    assert stats["patients_upserted"] == 0
+    db.expire_all()
+    patient = db.get(Patient, "A001")
+    assert float(patient.initial_tumor_size_cm) == pytest.approx(4.8)
+    assert patient.age == 65
+
+
+def test_reupload_of_baseline_month_updates_patient(db):
+    df = pd.read_csv(PATIENT_A)
+    bulk_ingest.load_dataframe(df, db=db)
+
+    corrected = df.copy()
+    corrected.loc[0, "tumor_size_cm"] = 4.5
+    stats = bulk_ingest.load_dataframe(corrected, db=db)
+
+    assert stats["patients_upserted"] == 1
+    db.expire_all()
+    assert float(db.get(Patient, "A001").initial_tumor_size_cm) == pytest.approx(4.5)
+
+
+def _summary_rows(db):
+    from models.database_models import AnalyticsSummary
+    return sorted(
+        (r.metric, r.treatment_type, r.response_to_treatment, r.row_count)
+        for r in db.query(AnalyticsSummary).filter(AnalyticsSummary.row_count != 0)
+    )
+
+
+def test_summary_deltas_match_a_rebuild(db):
+    from models.analytics_summary import rebuild_summary
+
+    df = pd.read_csv(PATIENT_A)
+    other = pd.read_csv(os.path.join(DATA_DIR, "patient_b_moderate_data.csv"))
+    bulk_ingest.load_chunks([df.iloc[:6], other], db=db)
+
+    # Re-upload overlapping months with a different treatment and response
+    changed = df.iloc[4:].copy()
+    changed["treatment_type"] = "Chemo+RT"
+    changed["response"] = "Fair"
+    bulk_ingest.load_dataframe(changed, db=db)
+
+    incremental = _summary_rows(db)
+    rebuild_summary(db)
+    assert incremental == _summary_rows(db)
+    assert ("followups", "", "", 20) in incremental
+    assert ("patients", "", "", 2) in incremental
+
+
+def test_load_does_not_scan_followups(db):
+    from sqlalchemy import event
+    from database import engine
+
+    bulk_ingest.load_dataframe(pd.read_csv(PATIENT_A).iloc[:5], db=db)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.lower())
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        bulk_ingest.load_dataframe(pd.read_csv(PATIENT_A).iloc[3:], db=db)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert not [s for s in statements if "count(" in s]
+    assert not [s for s in statements if "delete from analytics_summary" in s]
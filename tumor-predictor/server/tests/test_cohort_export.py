@@ -0,0 +1,103 @@
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import cohort_export
+from conftest import DATA_DIR
+from models.database_models import PatientFollowup, ResponseEnum, TreatmentTypeEnum
+
+ROWS = 250
+CHUNK = 100
+
+
+@pytest.fixture
+def cohort(db, make_patient):
+    for i in range(5):
+        make_patient(f"E{i}")
+    db.add_all(
+        PatientFollowup(
+            patient_id=f"E{n % 5}", follow_up_month=n // 5 + 1, tumor_size_cm=round(1.0 + n / 100, 2),
+            treatment_type=TreatmentTypeEnum.CHEMO_RT, response_to_treatment=ResponseEnum.FAIR,
+        )
+        for n in range(ROWS)
+    )
+    db.commit()
+    return [(f.id, f.patient_id, f.follow_up_month, float(f.tumor_size_cm))
+            for f in db.query(PatientFollowup).order_by(PatientFollowup.id)]
+
+
+def _export(client, fmt):
+    response = client.get("/export/cohort", params={"dataset": "followups", "format": fmt, "chunk_rows": CHUNK})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(cohort_export.FORMATS[fmt][0])
+    assert f"cohort_followups.{cohort_export.FORMATS[fmt][1]}" in response.headers["content-disposition"]
+    return response.content
+
+
+def _as_rows(df):
+    return list(zip(df["id"], df["patient_id"], df["follow_up_month"], df["tumor_size_cm"].astype(float)))
+
+
+def test_csv_export(client, cohort):
+    df = pd.read_csv(io.BytesIO(_export(client, "csv")))
+    assert list(df.columns) == list(PatientFollowup.__table__.columns.keys())
+    assert _as_rows(df) == cohort
+    assert set(df["response_to_treatment"]) == {"Fair"}
+
+
+def test_ndjson_export(client, cohort):
+    records = [json.loads(line) for line in _export(client, "ndjson").decode().splitlines()]
+    assert [(r["id"], r["patient_id"], r["follow_up_month"], r["tumor_size_cm"]) for r in records] == cohort
+    assert records[0]["treatment_type"] == "Chemo+RT"
+
+
+def test_parquet_export_writes_one_row_group_per_chunk(client, cohort):
+    pq = pytest.importorskip("pyarrow.parquet")
+    parquet = pq.ParquetFile(io.BytesIO(_export(client, "parquet")))
+    assert parquet.metadata.num_row_groups == -(-ROWS // CHUNK)
+    assert _as_rows(parquet.read().to_pandas()) == cohort
+
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson", "parquet"])
+def test_stream_yields_per_chunk(cohort, fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    pieces = list(cohort_export.export_stream("followups", fmt, chunk_rows=CHUNK))
+    assert len(pieces) >= -(-ROWS // CHUNK)
+
+
+def test_unknown_dataset_or_format_is_rejected(client):
+    assert client.get("/export/cohort", params={"dataset": "users"}).status_code == 400
+    assert client.get("/export/cohort", params={"format": "xlsx"}).status_code == 400
+
+
+def test_export_during_concurrent_ingest_sees_one_snapshot(client, cohort):
+    template = pd.read_csv(os.path.join(DATA_DIR, "patient_b_moderate_data.csv"))
+
+    def ingest(i):
+        df = template.assign(Patient_ID=f"X{i:03d}")
+        files = {"file": (f"export_concurrent_{i}.csv", io.BytesIO(df.to_csv(index=False).encode()), "text/csv")}
+        return client.post("/ingest", params={"load_to_db": True}, files=files)
+
+    try:
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            ingests = [pool.submit(ingest, i) for i in range(3)]
+            exports = [pool.submit(_export, client, "csv") for _ in range(3)]
+            ingests = [f.result() for f in ingests]
+            exports = [pd.read_csv(io.BytesIO(f.result())) for f in exports]
+    finally:
+        for i in range(3):
+            path = os.path.join(DATA_DIR, f"export_concurrent_{i}.csv")
+            if os.path.exists(path):
+                os.remove(path)
+
+    assert [r.status_code for r in ingests] == [200] * 3
+    possible = {ROWS + k * len(template) for k in range(4)}
+    for df in exports:
+        assert len(df) in possible
+        assert df["id"].is_unique and df["id"].is_monotonic_increasing
+    assert len(pd.read_csv(io.BytesIO(_export(client, "csv")))) == ROWS + 3 * len(template)
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+import frame_cache as frame_cache_module
+from frame_cache import FrameCache
+
+
+def _write(path, sizes):
+    rows = "\n".join(f"P1,{month},{size}" for month, size in sizes)
+    path.write_text("patient_id,month,tumor_size_cm\n" + rows + "\n")
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FrameCache(max_bytes=64 * 1024 * 1024)
+    monkeypatch.setattr("app.frame_cache", cache)
+    return cache
+
+
+def _sizes(response):
+    assert response.status_code == 200, response.text
+    return [p["tumorSize"] for p in response.json()["evolution"][:3]]
+
+
+def test_repeated_analyze_is_served_from_cache(client, cache, tmp_path):
+    path = tmp_path / "upload.csv"
+    _write(path, [(2, 3.0), (1, 4.0), (3, 2.5)])
+
+    first = _sizes(client.post("/analyze", json={"csv_path": str(path), "treatment": "chemo"}))
+    second = _sizes(client.post("/analyze", json={"csv_path": str(path), "treatment": "combined"}))
+
+    assert first == second == [4.0, 3.0, 2.5]
+    assert (cache.stats()["misses"], cache.stats()["hits"]) == (1, 1)
+
+
+def test_rewritten_file_is_reparsed(client, cache, tmp_path):
+    path = tmp_path / "upload.csv"
+    _write(path, [(1, 4.0), (2, 3.0)])
+    assert _sizes(client.post("/analyze", json={"csv_path": str(path)}))[:2] == [4.0, 3.0]
+
+    _write(path, [(1, 5.0), (2, 4.5), (3, 4.0)])
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert _sizes(client.post("/analyze", json={"csv_path": str(path)})) == [5.0, 4.5, 4.0]
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["misses"], stats["stale"], stats["hits"]) == (1, 2, 1, 0)
+
+
+def test_stats_endpoint_reports_the_shared_cache(client, tmp_path):
+    path = tmp_path / "upload.csv"
+    _write(path, [(1, 4.0)])
+    frame_cache_module.frame_cache.clear()
+    before = client.get("/debug/frame-cache").json()
+    client.post("/analyze", json={"csv_path": str(path)})
+    client.post("/analyze", json={"csv_path": str(path)})
+    after = client.get("/debug/frame-cache").json()
+    assert after["entries"] == 1 and after["bytes"] > 0
+    assert after["hits"] - before["hits"] == 1
+
+
+def test_entries_are_evicted_lru_by_bytes(tmp_path):
+    paths = []
+    for i in range(3):
+        paths.append(tmp_path / f"{i}.csv")
+        _write(paths[-1], [(m, 1.0 + m) for m in range(1, 50)])
+    size = frame_cache_module.prepare_frame(str(paths[0])).nbytes
+    cache = FrameCache(max_bytes=size * 2)
+
+    cache.load(str(paths[0]))
+    cache.load(str(paths[1]))
+    cache.load(str(paths[0]))  # now most recently used
+    cache.load(str(paths[2]))
+
+    assert cache.stats()["evictions"] == 1
+    cache.load(str(paths[0]))
+    assert cache.stats()["hits"] == 2
+    cache.load(str(paths[1]))
+    assert cache.stats()["misses"] == 4
+
+
+def test_frames_larger_than_the_budget_are_not_kept(tmp_path):
+    path = tmp_path / "big.csv"
+    _write(path, [(m, 1.0) for m in range(1, 20)])
+    cache = FrameCache(max_bytes=1)
+    assert len(cache.load(str(path)).frame) == 19
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,55 @@
+import sys
+
+import pandas as pd
+
+import generate_cohort
+from models.database_models import Patient, PatientAssignment, PatientFollowup, Prediction, User
+
+PATIENTS = 30
+MONTHS = 4
+
+
+def _run(monkeypatch, csv_dir):
+    monkeypatch.setattr(sys, "argv", [
+        "generate_cohort.py", "--patients", str(PATIENTS), "--months", str(MONTHS), "--shard-size", "10",
+        "--workers", "2", "--users", "3", "--csv-dir", str(csv_dir), "--load-db",
+    ])
+    generate_cohort.main()
+
+
+def _counts(db):
+    return {
+        "patients": db.query(Patient).count(),
+        "followups": db.query(PatientFollowup).count(),
+        "predictions": db.query(Prediction).count(),
+        "assignments": db.query(PatientAssignment).count(),
+        "users": db.query(User).count(),
+    }
+
+
+def test_rerun_replaces_instead_of_failing(db, monkeypatch, tmp_path):
+    _run(monkeypatch, tmp_path)
+    first = _counts(db)
+    first_sizes = dict(db.query(PatientFollowup.patient_id, PatientFollowup.tumor_size_cm)
+                       .filter(PatientFollowup.follow_up_month == MONTHS))
+
+    _run(monkeypatch, tmp_path)
+    db.expire_all()
+
+    assert first == _counts(db) == {
+        "patients": PATIENTS, "followups": PATIENTS * MONTHS, "predictions": PATIENTS,
+        "assignments": PATIENTS, "users": 3,
+    }
+    assert first_sizes == dict(db.query(PatientFollowup.patient_id, PatientFollowup.tumor_size_cm)
+                               .filter(PatientFollowup.follow_up_month == MONTHS))
+    csv = pd.concat(pd.read_csv(p) for p in sorted(tmp_path.glob("cohort_part_*.csv")))
+    assert len(csv) == PATIENTS * MONTHS
+
+
+def test_rerun_keeps_the_summary_in_step(client, monkeypatch, tmp_path):
+    _run(monkeypatch, tmp_path)
+    _run(monkeypatch, tmp_path)
+
+    summary = client.get("/analytics/summary").json()
+    assert (summary["total_patients"], summary["total_followups"], summary["total_predictions"]) == (
+        PATIENTS, PATIENTS * MONTHS, PATIENTS)
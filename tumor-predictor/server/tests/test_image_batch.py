@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from PIL import Image
+
+import app as app_module
+import image_store
+
+
+def _png(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def no_preprocessing(monkeypatch):
+    monkeypatch.setattr(app_module.image_tensors.preprocessor, "schedule", lambda sha, path: None)
+
+
+def _post(client, files):
+    return client.post("/image-ingest-batch", files=[("images", f) for f in files])
+
+
+def test_bad_extension_is_reported_next_to_stored_file(client):
+    good = _png("red")
+    response = _post(client, [("scan.png", io.BytesIO(good), "image/png"),
+                              ("notes.txt", io.BytesIO(b"not an image"), "text/plain")])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 1
+    assert body["message"] == "Uploaded 1 of 2 images"
+    assert [f["filename"] for f in body["files"]] == ["scan.png"]
+    assert body["files"][0]["sha256"] == hashlib.sha256(good).hexdigest()
+    assert body["files"][0]["elapsed_ms"] >= 0
+    assert body["failed"] == [{"filename": "notes.txt", "error": "Unsupported file type", "elapsed_ms": 0.0}]
+    assert body["elapsed_ms"] >= body["files"][0]["elapsed_ms"]
+
+
+def test_storage_error_fails_only_that_file(client, monkeypatch):
+    real_store = image_store.store_upload
+
+    async def flaky_store(upload):
+        if upload.filename == "broken.png":
+            raise OSError("disk full")
+        return await real_store(upload)
+
+    monkeypatch.setattr(image_store, "store_upload", flaky_store)
+    body = _post(client, [("ok.png", io.BytesIO(_png("blue")), "image/png"),
+                          ("broken.png", io.BytesIO(_png("green")), "image/png")]).json()
+
+    assert [f["filename"] for f in body["files"]] == ["ok.png"]
+    assert len(body["failed"]) == 1
+    failure = body["failed"][0]
+    assert failure["filename"] == "broken.png" and "disk full" in failure["error"] and failure["elapsed_ms"] >= 0
+
+
+def test_duplicate_in_batch_is_deduplicated(client):
+    data = _png("yellow")
+    body = _post(client, [("a.png", io.BytesIO(data), "image/png"), ("b.png", io.BytesIO(data), "image/png")]).json()
+    assert body["count"] == 2
+    assert len({f["path"] for f in body["files"]}) == 1
+    assert sorted(f["deduplicated"] for f in body["files"]) == [False, True]
+
+
+def test_all_bad_files_return_400(client):
+    response = _post(client, [("a.txt", io.BytesIO(b"x"), "text/plain"), ("b.pdf", io.BytesIO(b"y"), "application/pdf")])
+    assert response.status_code == 400
+    assert "a.txt: Unsupported file type" in response.json()["detail"]
+
+
+def test_stores_run_with_bounded_concurrency(client, monkeypatch):
+    real_store = image_store.store_upload
+    in_flight, peak = 0, 0
+
+    async def tracked_store(upload):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            await asyncio.sleep(0.02)
+            return await real_store(upload)
+        finally:
+            in_flight -= 1
+
+    monkeypatch.setattr(app_module, "IMAGE_BATCH_CONCURRENCY", 2)
+    monkeypatch.setattr(image_store, "store_upload", tracked_store)
+    files = [(f"img{i}.png", io.BytesIO(_png((i * 40, 0, 0))), "image/png") for i in range(6)]
+    assert _post(client, files).json()["count"] == 6
+    assert peak == 2
@@ -0,0 +1,40 @@
+import hashlib
+import io
+import os
+
+import image_store
+
+
+class CountingReader(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def test_upload_is_read_once_and_stored_by_hash(tmp_path):
+    data = os.urandom(3 * image_store.HASH_CHUNK_BYTES + 17)
+    upload = CountingReader(data)
+
+    stored = image_store.store_fileobj(upload, str(tmp_path))
+
+    assert upload.bytes_read == len(data)
+    assert stored.sha256 == hashlib.sha256(data).hexdigest()
+    assert stored.path == image_store.object_path(stored.sha256, str(tmp_path))
+    assert stored.size_bytes == len(data)
+    assert not stored.deduplicated
+    with open(stored.path, "rb") as f:
+        assert f.read() == data
+
+
+def test_duplicate_upload_leaves_no_temp_files(tmp_path):
+    first = image_store.store_fileobj(io.BytesIO(b"same image"), str(tmp_path))
+    second = image_store.store_fileobj(io.BytesIO(b"same image"), str(tmp_path))
+
+    assert second.deduplicated
+    assert second.path == first.path
+    assert not [n for n in os.listdir(tmp_path) if n.startswith(".incoming-")]
@@ -0,0 +1,44 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+import image_tensors
+
+pytestmark = pytest.mark.skipif(image_tensors.Image is None, reason="Pillow is not installed")
+
+
+def _png(path, color):
+    image_tensors.Image.new("RGB", (40, 30), color).save(path)
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def test_preprocessing_runs_in_threads(tmp_path):
+    preprocessor = image_tensors.Preprocessor(workers=2, root=str(tmp_path / "tensors"))
+    shas = [_png(tmp_path / f"{i}.png", (i * 60, 0, 0)) for i in range(3)]
+    for i, sha in enumerate(shas):
+        assert preprocessor.schedule(sha, str(tmp_path / f"{i}.png"))
+    assert all(t.name.startswith("image-preprocess") for t in preprocessor._pool._threads)
+    preprocessor.shutdown()
+
+    assert preprocessor.stats()["completed"] == 3
+    tensor = image_tensors.load_tensor(shas[1], str(tmp_path / "tensors"))
+    assert tensor.shape == (image_tensors.IMAGE_TENSOR_SIZE, image_tensors.IMAGE_TENSOR_SIZE, 3)
+    assert np.allclose(tensor[0, 0], [60 / 255, 0, 0])
+    assert not preprocessor.schedule(shas[1], str(tmp_path / "1.png"))
+
+
+def test_failed_preprocessing_is_logged_with_the_hash(tmp_path, caplog):
+    preprocessor = image_tensors.Preprocessor(workers=1, root=str(tmp_path / "tensors"))
+    bad = tmp_path / "bad.png"
+    bad.write_bytes(b"not a png")
+    sha = hashlib.sha256(b"not a png").hexdigest()
+
+    with caplog.at_level("ERROR", logger="image_tensors"):
+        assert preprocessor.schedule(sha, str(bad))
+        preprocessor.shutdown()
+
+    assert preprocessor.stats()["failed"] == 1
+    [record] = [r for r in caplog.records if r.name == "image_tensors"]
+    assert sha in record.getMessage()
+    assert record.exc_info is not None and record.exc_info[1] is not None
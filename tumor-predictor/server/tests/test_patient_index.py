@@ -0,0 +1,109 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import patient_index as patient_index_module
+from patient_index import PatientIndex
+from schema_normalizer import normalize_frame
+
+
+@pytest.fixture
+def counted_scans(monkeypatch):
+    scanned = []
+    real_scan = patient_index_module.scan_file
+
+    def scan_file(path):
+        scanned.append(os.path.basename(path))
+        return real_scan(path)
+
+    monkeypatch.setattr(patient_index_module, "scan_file", scan_file)
+    return scanned
+
+
+def _full_read(path, patient_id):
+    full = normalize_frame(pd.read_csv(path))
+    return full[full["patient_id"] == patient_id].reset_index(drop=True)
+
+
+def _assert_same_rows(indexed, full):
+    # Category sets depend on which rows were parsed, so compare values only
+    def values(df):
+        return df.apply(lambda c: c.astype(object) if isinstance(c.dtype, pd.CategoricalDtype) else c)
+
+    pd.testing.assert_frame_equal(values(indexed), values(full))
+
+
+def test_byte_range_reads_match_a_full_read(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    source = os.path.join("data", "patients_part_1.csv")
+    shutil.copy(source, data_dir / "part.csv")
+    # Interleaved rows give a patient several runs in one file
+    (data_dir / "mixed.csv").write_text(
+        "patient_id,month,tumor_size_cm\nA,1,3.0\nB,1,2.0\nA,2,2.5\nA,3,2.1\n\nB,2,1.8\n"
+    )
+    index = PatientIndex(str(data_dir), str(tmp_path / "index.json"))
+    index.refresh()
+
+    for patient_id in pd.read_csv(source)["patient_id"].unique()[:5]:
+        _assert_same_rows(index.read_patient(patient_id), _full_read(data_dir / "part.csv", patient_id))
+    for patient_id in ("A", "B"):
+        _assert_same_rows(index.read_patient(patient_id), _full_read(data_dir / "mixed.csv", patient_id))
+    [location] = index.locate("A")
+    assert [run[:2] for run in location["runs"]] == [[0, 1], [2, 2]]
+    assert (location["month_min"], location["month_max"]) == (1.0, 3.0)
+    assert index.read_patient("missing") is None
+
+
+def test_refresh_rescans_only_changed_files(tmp_path, counted_scans):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for name in ("a.csv", "b.csv"):
+        (data_dir / name).write_text(f"patient_id,month,tumor_size_cm\n{name[0]},1,2.0\n")
+    index = PatientIndex(str(data_dir), str(tmp_path / "index.json"))
+    assert index.refresh()["reindexed"] == 2
+
+    (data_dir / "b.csv").write_text("patient_id,month,tumor_size_cm\nb,1,2.0\nb,2,1.5\n")
+    os.remove(data_dir / "a.csv")
+    reopened = PatientIndex(str(data_dir), str(tmp_path / "index.json"))
+    assert reopened.refresh() == {"files": 1, "reindexed": 1, "removed": 1}
+    assert counted_scans == ["a.csv", "b.csv", "b.csv"]
+    assert len(reopened.read_patient("b")) == 2
+
+
+def _upload(client, name, rows):
+    body = "patient_id,month,tumor_size_cm\n" + "".join(f"{pid},{m},{s}\n" for pid, m, s in rows)
+    response = client.post("/ingest", files={"file": (name, body.encode(), "text/csv")})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_ingest_rewrite_updates_the_index(client, counted_scans):
+    name = "index_rewrite_test.csv"
+    try:
+        assert _upload(client, name, [("IDX1", 1, 3.0), ("IDX1", 2, 2.8)])["patients_indexed"] == 1
+        first = client.get("/data/patients/IDX1").json()
+        assert [loc["file"] for loc in first["locations"]] == [name]
+        assert [r["tumor_size_cm"] for r in first["followups"]] == [3.0, 2.8]
+
+        counted_scans.clear()
+        assert _upload(client, name, [("IDX2", 1, 4.0), ("IDX1", 1, 3.0), ("IDX1", 2, 2.6), ("IDX1", 3, 2.2)])[
+            "patients_indexed"] == 2
+        assert counted_scans == [name]
+
+        second = client.get("/data/patients/IDX1").json()
+        assert [r["tumor_size_cm"] for r in second["followups"]] == [3.0, 2.6, 2.2]
+        assert (second["locations"][0]["month_min"], second["locations"][0]["month_max"]) == (1.0, 3.0)
+        assert client.get("/data/patients/IDX2").status_code == 200
+        assert counted_scans == [name]
+        _assert_same_rows(
+            patient_index_module.patient_index.read_patient("IDX1"), _full_read(os.path.join("data", name), "IDX1")
+        )
+    finally:
+        path = os.path.join("data", name)
+        if os.path.exists(path):
+            os.remove(path)
+        patient_index_module.patient_index.refresh()
+    assert client.get("/data/patients/IDX1").status_code == 404
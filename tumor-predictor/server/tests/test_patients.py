@@ -0,0 +1,24 @@
+def test_cursor_pages_cover_every_patient(client, make_patient):
+    for i in range(7):
+        make_patient(f"P{i:03d}")
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/patients", params=params)
+        seen.extend(p["patient_id"] for p in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert seen == [f"P{i:03d}" for i in range(7)]
+
+
+def test_cursor_header_is_exposed_to_browsers(client, make_patient):
+    make_patient("P000")
+    make_patient("P001")
+    response = client.get("/patients", params={"limit": 1}, headers={"Origin": "http://localhost:5173"})
+    assert response.headers["X-Next-Cursor"] == "P000"
+    assert "X-Next-Cursor" in response.headers["Access-Control-Expose-Headers"]
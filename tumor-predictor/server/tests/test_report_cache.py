@@ -0,0 +1,92 @@
+from models.report_cache import ReportCache
+
+
+def test_generations_are_capped():
+    cache = ReportCache(max_bytes=1024, max_generations=3)
+    cache.invalidate(f"P{i}" for i in range(50))
+    assert cache.stats()["generations"] == 3
+
+
+def test_put_after_racing_invalidation_is_skipped():
+    cache = ReportCache(max_bytes=1024)
+    token = cache.generation("P1")
+    cache.invalidate(["P1"])
+    cache.put("P1", b"stale", token)
+    assert cache.get("P1") is None
+
+    cache.put("P1", b"fresh", cache.generation("P1"))
+    assert cache.get("P1") == b"fresh"
+
+
+def test_dropped_generation_never_lets_a_stale_put_through():
+    cache = ReportCache(max_bytes=1024, max_generations=1)
+    token = cache.generation("P1")
+    cache.invalidate(["P1"])
+    cache.invalidate(["P2"])  # pushes P1's stamp out
+    cache.put("P1", b"stale", token)
+    assert cache.get("P1") is None
+
+
+def test_clear_drops_generations_and_rejects_inflight_puts():
+    cache = ReportCache(max_bytes=1024)
+    cache.invalidate(["P1", "P2"])
+    token = cache.generation("P3")
+    cache.clear()
+    assert cache.stats()["generations"] == 0
+    cache.put("P3", b"stale", token)
+    assert cache.get("P3") is None
+
+
+def _assigned_doctor(db, make_patient):
+    from models.database_models import PatientAssignment, User, UserRoleEnum
+    make_patient("P1")
+    user = User(user_id="doc1", username="doc1", email="doc1@example.com", full_name="Doc One", role=UserRoleEnum.DOCTOR)
+    db.add(user)
+    db.commit()
+    db.add(PatientAssignment(user_id=user.id, patient_id="P1", assignment_type="primary"))
+    db.commit()
+
+
+def test_commit_between_auth_and_build_is_not_cached(client, db, make_patient):
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from database import SessionLocal
+    from models.database_models import PatientFollowup, ResponseEnum, TreatmentTypeEnum
+    from models.report_cache import report_cache
+
+    _assigned_doctor(db, make_patient)
+    fired = []
+
+    def commit_followup_after_auth(conn, cursor, statement, parameters, context, executemany):
+        if fired or "FROM patient_assignments" not in statement:
+            return
+        fired.append(True)
+        with SessionLocal() as writer:
+            writer.add(PatientFollowup(
+                patient_id="P1", follow_up_month=1, tumor_size_cm=2.5,
+                treatment_type=TreatmentTypeEnum.CHEMO_RT, response_to_treatment=ResponseEnum.GOOD,
+            ))
+            writer.commit()
+
+    event.listen(Engine, "after_cursor_execute", commit_followup_after_auth)
+    try:
+        assert client.get("/users/doc1/patients/P1/report").status_code == 200
+    finally:
+        event.remove(Engine, "after_cursor_execute", commit_followup_after_auth)
+
+    assert fired
+    # Built across the commit, so it must not be cached under the new stamp
+    assert report_cache.get("P1") is None
+    followups = client.get("/users/doc1/patients/P1/report").json()["followups"]
+    assert [f["month"] for f in followups] == [1]
+    assert report_cache.get("P1") is not None
+
+
+def test_report_is_served_from_cache_until_a_write(client, db, make_patient, make_followup):
+    _assigned_doctor(db, make_patient)
+    first = client.get("/users/doc1/patients/P1/report").json()
+    assert first["followups"] == []
+    assert client.get("/users/doc1/patients/P1/report").json() == first
+
+    make_followup("P1", 1, 2.5)
+    assert [f["month"] for f in client.get("/users/doc1/patients/P1/report").json()["followups"]] == [1]
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import retention
+from models.database_models import Prediction, User, PatientAssignment, UserRoleEnum
+from models.report_cache import report_cache
+
+
+def _prediction(patient_id, when):
+    return Prediction(
+        patient_id=patient_id, prediction_date=when, treatment_type="chemo",
+        predicted_evolution=[], risk_factors=[], treatment_impact=78, confidence=0.7,
+    )
+
+
+def test_archiving_predictions_updates_summary_and_reports(client, db, make_patient, tmp_path):
+    make_patient("R001")
+    doctor = User(user_id="doc", username="doc", email="doc@example.com", full_name="Doc", role=UserRoleEnum.DOCTOR)
+    db.add(doctor)
+    db.commit()
+    db.add(PatientAssignment(user_id=doctor.id, patient_id="R001", assignment_type="primary"))
+    db.add_all([_prediction("R001", datetime(2020, 1, 5)), _prediction("R001", datetime.now())])
+    db.commit()
+
+    assert client.get("/analytics/summary").json()["total_predictions"] == 2
+    report = client.get("/users/doc/patients/R001/report").json()
+    assert len(report["predictions"]) == 2
+    assert report_cache.get("R001") is not None
+
+    result = retention.archive_predictions(retention.month_cutoff(6), str(tmp_path), batch_size=1)
+
+    assert result["rows_moved"] == 1
+    assert result["rows_remaining"] == 1
+    assert client.get("/analytics/summary").json()["total_predictions"] == 1
+    assert report_cache.get("R001") is None
+    assert len(client.get("/users/doc/patients/R001/report").json()["predictions"]) == 1
+    assert (tmp_path / "predictions" / "2020-01.jsonl.gz").exists()
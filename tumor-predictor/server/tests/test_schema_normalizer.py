@@ -0,0 +1,118 @@
+import os
+
+import pandas as pd
+import pytest
+
+import bulk_ingest
+from conftest import DATA_DIR
+from models.database_models import Patient, PatientFollowup
+from schema_normalizer import concat_normalized, normalize_frame, read_normalized
+
+FOLLOWUP_FILES = ["patient_a_aggressive_data.csv", "patient_b_moderate_data.csv", "patient_c_high_risk_data.csv"]
+
+MESSY = pd.DataFrame({
+    "patient id": [" M001", "M001 ", "M002", None, "M002"],
+    "Follow Up Month": [1, 2, 1, None, 2],
+    "Tumor_Size": ["2.015", "2.5", "1.1", None, "1.25"],
+    "Treatment": ["surgery+rt", "Surgery+RT ", "Chemo+RT", None, "Chemo+RT"],
+    "Response_To_Treatment": ["Good", "good", "Poor", None, "Fair"],
+    "Recurrence": ["no", "Yes", "Y", None, "false"],
+    "Age": [60, 60, 48, None, 48],
+    "Sex": ["m", "M", "female", None, "F"],
+    "Stage_TNM": ["T2N0M0", "T2N0M0", "T3N1M0", None, "T3N1M0"],
+    "Smoking_Status": ["Never Smoked"] * 2 + ["Current Smoker"] + [None, "Current Smoker"],
+    "Alcohol_Use": ["None", "None", "Heavy Daily", None, "Heavy Daily"],
+    "Oral_Hygiene": ["Good", "Good", "Poor", None, "Poor"],
+    "HPV_Status": ["Negative", "Negative", "Positive", None, "Positive"],
+})
+
+
+def test_categorical_columns_support_consumer_idioms():
+    df = read_normalized(os.path.join(DATA_DIR, "patient_a_aggressive_data.csv"))
+    assert isinstance(df["patient_id"].dtype, pd.CategoricalDtype)
+    assert str(df["month_index"].dtype) == "Int16"
+
+    assert df["patient_id"].isin(["A001", "not-a-category"]).all()
+    assert not df["response"].isin(["Excellent"]).any()
+    assert (df["patient_id"] == "A001").all()
+    assert (df["patient_id"].str.len() == 4).all()
+    assert df["response"].astype(str).str.lower().eq("poor").all()
+
+    with_gaps = df.copy()
+    with_gaps.loc[[0, 3], "response"] = None
+    with_gaps.loc[[1], "month_index"] = pd.NA
+    assert with_gaps["response"].fillna("Poor").eq("Poor").all()
+    assert with_gaps["response"].astype(object).fillna("").tolist()[:4] == ["", "Poor", "Poor", ""]
+    assert with_gaps["month_index"].fillna(0).tolist()[:3] == [1, 0, 3]
+    assert df.groupby("patient_id", observed=True).size().to_dict() == {"A001": 10}
+
+
+def test_concat_unifies_categories_and_months():
+    frames = [read_normalized(os.path.join(DATA_DIR, name)) for name in FOLLOWUP_FILES]
+    combined = concat_normalized(frames)
+
+    assert isinstance(combined["patient_id"].dtype, pd.CategoricalDtype)
+    assert str(combined["month_index"].dtype) == "Int16"
+    assert combined["patient_id"].isin(["A001", "C001"]).sum() == 20
+    assert sorted(combined["patient_id"].unique()) == ["A001", "B001", "C001"]
+
+    # A frame with fractional months widens the shared month column instead of truncating
+    fractional = normalize_frame(pd.DataFrame({"patient_id": ["X1"], "month_index": [1.5], "tumor_size_cm": [1.0]}))
+    mixed = concat_normalized([frames[0], fractional])
+    assert str(mixed["month_index"].dtype) == "float32"
+    assert mixed["month_index"].tolist()[-1] == 1.5
+
+
+def _expected_followups(raw: pd.DataFrame) -> list:
+    """What the loader stored before the dtype policy: plain strings, exact values"""
+    raw = raw.dropna(how="all")
+    return sorted(
+        (str(r.Patient_ID).strip(), int(r.month_index), float(r.tumor_size_cm),
+         str(r.Recurrence).strip().lower() in ("yes", "y", "true", "1"),
+         str(r.treatment_type).strip(), str(r.response).strip())
+        for r in raw.itertuples()
+    )
+
+
+def _stored_followups(db) -> list:
+    return sorted(
+        (f.patient_id, f.follow_up_month, float(f.tumor_size_cm), f.recurrence,
+         f.treatment_type.value, f.response_to_treatment.value)
+        for f in db.query(PatientFollowup)
+    )
+
+
+@pytest.mark.parametrize("name", FOLLOWUP_FILES)
+def test_normalized_load_stores_the_same_values(db, name):
+    raw = pd.read_csv(os.path.join(DATA_DIR, name), dtype=str)
+
+    bulk_ingest.load_dataframe(pd.read_csv(os.path.join(DATA_DIR, name)), db=db)
+
+    assert _stored_followups(db) == _expected_followups(raw)
+    first = raw.iloc[0]
+    patient = db.get(Patient, first["Patient_ID"])
+    assert (patient.age, patient.gender.value, patient.stage_tnm, patient.smoking_status.value,
+            patient.alcohol_use.value, patient.oral_hygiene.value, patient.hpv_status.value) == (
+        int(first["Age"]), first["Gender"], first["stage"], first["Smoking_Status"],
+        first["Alcohol_Use"], first["Oral_Hygiene"], first["HPV_Status"])
+    assert float(patient.initial_tumor_size_cm) == pytest.approx(float(first["tumor_size_cm"]))
+
+
+def test_messy_headers_and_values_load_as_before(db):
+    normalized = bulk_ingest.normalize(MESSY)
+    assert normalized["patient_id"].tolist()[:3] == ["M001", "M001", "M002"]
+    # Sizes keep full precision, so half-way values round as they did with plain read_csv
+    assert normalized["tumor_size_cm"].round(2).tolist()[:3] == pd.Series([2.015, 2.5, 1.1]).round(2).tolist()
+
+    stats = bulk_ingest.load_dataframe(MESSY, db=db)
+
+    assert stats["patients_upserted"] == 2
+    assert stats["followups_loaded"] == 4
+    assert _stored_followups(db) == [
+        ("M001", 1, 2.015, False, "Surgery+RT", "Good"),
+        ("M001", 2, 2.5, True, "Surgery+RT", "Good"),
+        ("M002", 1, 1.1, True, "Chemo+RT", "Poor"),
+        ("M002", 2, 1.25, False, "Chemo+RT", "Fair"),
+    ]
+    assert db.get(Patient, "M001").gender.value == "Male"
+    assert db.get(Patient, "M002").gender.value == "Female"
@@ -0,0 +1,119 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATA_DIR
+from models import model_utils
+from series_store import SeriesStore, pa
+
+pytestmark = pytest.mark.skipif(pa is None, reason="pyarrow is not installed")
+
+
+def _followups(patient_id, months, sizes, response="Good"):
+    return pd.DataFrame({
+        "patient_id": patient_id,
+        "month_index": months,
+        "tumor_size_cm": sizes,
+        "treatment_type": "Surgery+RT",
+        "response": response,
+    })
+
+
+def _months_and_sizes(store, patient_id):
+    months, sizes = store.arrays(patient_id)
+    return months.tolist(), sizes.astype("float64").round(2).tolist()
+
+
+def test_append_and_read(tmp_path):
+    store = SeriesStore(str(tmp_path / "series"))
+    assert store.append(_followups("P1", [2, 1, 3], [2.2, 2.0, 2.4])) == 3
+    assert store.append(_followups("P2", [1], [1.0])) == 1
+
+    assert store.stats()["segments"] == 2
+    assert store.patients() == ["P1", "P2"]
+    assert _months_and_sizes(store, "P1") == ([1, 2, 3], [2.0, 2.2, 2.4])
+    assert store.series("P3") is None
+
+
+def test_later_segment_supersedes_same_month(tmp_path):
+    store = SeriesStore(str(tmp_path / "series"))
+    store.append(_followups("P1", [1, 2], [2.0, 2.2], response="Good"))
+    store.append(_followups("P1", [2, 3], [2.5, 2.6], response="Poor"))
+
+    assert _months_and_sizes(store, "P1") == ([1, 2, 3], [2.0, 2.5, 2.6])
+    assert store.frame("P1")["response"].astype(str).tolist() == ["Good", "Poor", "Poor"]
+
+
+def test_compact_merges_segments_and_removes_files(tmp_path):
+    root = tmp_path / "series"
+    store = SeriesStore(str(root), max_segments=100)
+    for month in range(1, 5):
+        store.append(_followups("P1", [month, 1], [float(month), 9.0]))
+
+    assert store.compact() == 4
+    assert store.stats()["segments"] == 1
+    assert _months_and_sizes(store, "P1") == ([1, 2, 3, 4], [9.0, 2.0, 3.0, 4.0])
+    assert len([n for n in os.listdir(root) if n.endswith(".arrow")]) == 2
+
+
+def test_append_compacts_at_max_segments(tmp_path):
+    store = SeriesStore(str(tmp_path / "series"), max_segments=3)
+    for i in range(3):
+        store.append(_followups(f"P{i}", [1], [1.0]))
+    assert store.stats()["segments"] == 1
+    assert store.patients() == ["P0", "P1", "P2"]
+
+
+def test_reader_picks_up_manifest_written_by_another_instance(tmp_path):
+    root = str(tmp_path / "series")
+    writer = SeriesStore(root)
+    writer.append(_followups("P1", [1], [1.0]))
+    reader = SeriesStore(root)
+    assert reader.patients() == ["P1"]
+
+    writer.append(_followups("P2", [1, 2], [1.0, 1.1]))
+    writer.compact()
+    assert reader.patients() == ["P1", "P2"]
+    assert _months_and_sizes(reader, "P2") == ([1, 2], [1.0, 1.1])
+
+
+def test_fingerprint_tracks_data_dir(tmp_path):
+    data_dir = tmp_path / "data"
+    shutil.copytree(DATA_DIR, data_dir, ignore=shutil.ignore_patterns("series", ".*"))
+    store = SeriesStore(str(data_dir / "series"))
+
+    assert not store.is_current(str(data_dir))
+    assert store.ensure_current(str(data_dir))
+    assert store.is_current(str(data_dir))
+    assert not store.ensure_current(str(data_dir))
+
+    # Saved through /ingest: appended and fingerprinted, no rebuild needed
+    ingested = data_dir / "ingested.csv"
+    _followups("N1", [1, 2], [1.0, 1.2]).to_csv(ingested, index=False)
+    store.append(pd.read_csv(ingested), source_path=str(ingested))
+    assert store.is_current(str(data_dir))
+
+    # Copied in directly: stale until rebuilt
+    _followups("N2", [1, 2, 3, 4], [1.0, 1.1, 1.2, 1.3]).to_csv(data_dir / "copied.csv", index=False)
+    assert not store.is_current(str(data_dir))
+    assert "N2" not in store.patients()
+    assert store.ensure_current(str(data_dir))
+    assert "N2" in store.patients()
+
+
+def test_training_sequences_include_files_added_outside_ingest(tmp_path):
+    data_dir = tmp_path / "data"
+    shutil.copytree(DATA_DIR, data_dir, ignore=shutil.ignore_patterns("series", ".*"))
+    store = SeriesStore(str(data_dir / "series"))
+    store.rebuild_from_csvs(str(data_dir))
+    before, _ = model_utils.training_sequences(str(data_dir), store=store)
+
+    _followups("N3", [1, 2, 3, 4, 5], [1.0, 1.1, 1.2, 1.3, 1.4]).to_csv(data_dir / "generated.csv", index=False)
+    after, _ = model_utils.training_sequences(str(data_dir), store=store)
+
+    assert after.shape[0] == before.shape[0] + 2
+    csv_only, _ = model_utils._build_sequences(model_utils._read_csvs(str(data_dir)))
+    assert after.shape == csv_only.shape
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import Depends
+from sqlalchemy import select
+
+import database
+import sql_stats
+from models.database_models import Patient
+
+
+def _header(response):
+    fields = dict(part.strip().split("=") for part in response.headers["X-SQL-Stats"].split(";"))
+    return int(fields["count"]), int(fields["n_plus_one"])
+
+
+@pytest.fixture(params=["async", "threaded"])
+def per_row_client(request, client, monkeypatch):
+    """Client with a test route issuing one query per requested row, on both session paths"""
+    import app as app_module
+
+    if request.param == "threaded":
+        monkeypatch.setattr(database, "AsyncSessionLocal", None)
+
+    async def per_row(n: int, db=Depends(database.get_async_db)):
+        for i in range(n):
+            await db.execute(select(Patient).where(Patient.patient_id == f"P{i}"))
+        return {"n": n}
+
+    app_module.app.add_api_route("/_test/per-row", per_row, methods=["GET"])
+    try:
+        yield client
+    finally:
+        app_module.app.router.routes[:] = [
+            r for r in app_module.app.router.routes if getattr(r, "path", None) != "/_test/per-row"
+        ]
+
+
+def test_endpoint_is_off_by_default(client):
+    assert client.get("/debug/sql-stats").status_code == 404
+    assert client.get("/debug/sql-stats", params={"reset": True}).status_code == 404
+
+
+def test_endpoint_served_when_enabled(client, monkeypatch):
+    monkeypatch.setattr(sql_stats, "SQL_STATS_ENDPOINT", True)
+    client.get("/patients")
+    body = client.get("/debug/sql-stats").json()
+    assert body["endpoints"]["GET /patients"]["requests"] >= 1
+
+
+def test_per_row_queries_are_flagged_as_n_plus_one(per_row_client, monkeypatch):
+    monkeypatch.setattr(sql_stats, "SQL_STATS_ENDPOINT", True)
+    sql_stats.registry.reset()
+    n = sql_stats.NPLUS1_THRESHOLD + 2
+
+    assert _header(per_row_client.get("/_test/per-row", params={"n": n})) == (n, 1)
+    assert _header(per_row_client.get("/_test/per-row", params={"n": 1})) == (1, 0)
+
+    stats = per_row_client.get("/debug/sql-stats").json()
+    totals = stats["endpoints"]["GET /_test/per-row"]
+    assert (totals["requests"], totals["queries"], totals["n_plus_one_requests"]) == (2, n + 1, 1)
+    flagged = stats["recent"][1]["suspected_n_plus_one"]
+    assert flagged[0]["count"] == n and "FROM patients" in flagged[0]["statement"]
+
+
+def test_counts_are_per_request_under_concurrency(per_row_client):
+    sizes = [1, 3, 7, 2, 6, 4] * 3
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        responses = list(pool.map(lambda n: per_row_client.get("/_test/per-row", params={"n": n}), sizes))
+    assert [_header(r)[0] for r in responses] == sizes
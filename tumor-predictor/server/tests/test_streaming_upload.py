@@ -0,0 +1,96 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+import streaming_upload
+from conftest import DATA_DIR
+from models.database_models import Patient, PatientFollowup
+
+PATIENT_A = os.path.join(DATA_DIR, "patient_a_aggressive_data.csv")
+
+
+def _upload(tmp_path, name, df, chunk_rows):
+    raw_path = tmp_path / f"{name}.part"
+    df.to_csv(raw_path, index=False)
+    upload_id = streaming_upload.progress.start(None, name)
+    return streaming_upload.process_upload(
+        str(raw_path), str(tmp_path / name), upload_id, load_to_db=True, chunk_rows=chunk_rows,
+    )
+
+
+def test_multi_chunk_upload_keeps_baseline(db, tmp_path):
+    df = pd.read_csv(PATIENT_A)
+
+    result = _upload(tmp_path, "a.csv", df, chunk_rows=3)
+
+    assert result["rows"] == 10
+    assert result["database"]["patients_upserted"] == 1
+    assert result["database"]["followups_loaded"] == 10
+    patient = db.get(Patient, "A001")
+    assert float(patient.initial_tumor_size_cm) == pytest.approx(4.8)
+    assert len(pd.read_csv(tmp_path / "a.csv")) == 10
+
+
+def test_later_upload_keeps_baseline_and_demographics(db, tmp_path):
+    df = pd.read_csv(PATIENT_A)
+    _upload(tmp_path, "first.csv", df.iloc[:4], chunk_rows=3)
+
+    later = df.iloc[4:].copy()
+    later["Smoking_Status"] = "Former Smoker"
+    result = _upload(tmp_path, "later.csv", later, chunk_rows=3)
+
+    assert result["database"]["patients_upserted"] == 0
+    db.expire_all()
+    patient = db.get(Patient, "A001")
+    assert float(patient.initial_tumor_size_cm) == pytest.approx(4.8)
+    assert patient.smoking_status.value == "Current Smoker"
+    assert db.query(PatientFollowup).filter_by(patient_id="A001").count() == 10
+
+
+def _leftovers():
+    return [n for n in os.listdir(DATA_DIR) if n.startswith((".upload-", ".ingest-"))]
+
+
+def test_header_only_upload_is_rejected(client, db, tmp_path):
+    header = pd.read_csv(PATIENT_A).iloc[:0].to_csv(index=False)
+    response = client.post("/ingest", params={"load_to_db": True},
+                           files={"file": ("empty_rows.csv", io.BytesIO(header.encode()), "text/csv")})
+
+    assert response.status_code == 400
+    assert "no data rows" in response.json()["detail"]
+    assert not os.path.exists(os.path.join(DATA_DIR, "empty_rows.csv"))
+    assert _leftovers() == []
+    assert db.query(Patient).count() == 0
+
+    raw_path = tmp_path / "header.part"
+    raw_path.write_text(header)
+    with pytest.raises(ValueError):
+        streaming_upload.process_upload(str(raw_path), str(tmp_path / "header.csv"), "header-only")
+    assert not (tmp_path / "header.csv").exists()
+
+
+def test_oversized_body_is_refused_before_parsing(client, monkeypatch):
+    monkeypatch.setattr(streaming_upload, "INGEST_MAX_BYTES", 1024)
+    body = pd.read_csv(PATIENT_A).to_csv(index=False).encode() * 4
+
+    response = client.post("/ingest", files={"file": ("too_big.csv", io.BytesIO(body), "text/csv")})
+    assert response.status_code == 413
+    assert _leftovers() == []
+    assert not os.path.exists(os.path.join(DATA_DIR, "too_big.csv"))
+
+
+def test_chunked_body_is_cut_off_at_the_limit(client, monkeypatch):
+    monkeypatch.setattr(streaming_upload, "INGEST_MAX_BYTES", 1024)
+    boundary = "limit-test"
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="chunked.csv"\r\n'
+        f"Content-Type: text/csv\r\n\r\n".encode(),
+        *[b"A001,65,Male,T4aN2bM0,4.8\n" * 20 for _ in range(10)],
+        f"\r\n--{boundary}--\r\n".encode(),
+    ]
+    response = client.post("/ingest", content=iter(parts),
+                           headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    assert response.status_code == 413
+    assert not os.path.exists(os.path.join(DATA_DIR, "chunked.csv"))
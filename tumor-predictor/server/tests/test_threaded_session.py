@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+from sqlalchemy import select
+
+import database
+from database import SessionLocal, ThreadedSession
+from models.database_models import Patient
+
+
+class RecordingSession:
+    """Wraps a real Session and records which threads touched it"""
+
+    def __init__(self):
+        self.session = SessionLocal(expire_on_commit=False)
+        self.threads = set()
+
+    def __getattr__(self, name):
+        self.threads.add(threading.get_ident())
+        return getattr(self.session, name)
+
+
+def test_all_calls_run_on_one_owning_thread(db, make_patient):
+    for i in range(5):
+        make_patient(f"T{i}")
+    recorder = {}
+
+    def factory():
+        recorder["session"] = RecordingSession()
+        return recorder["session"]
+
+    async def scenario():
+        session = ThreadedSession(factory)
+        try:
+            session.add(Patient(patient_id="T9", age=50, gender="Female", stage_tnm="T1N0M0", initial_tumor_size_cm=1.0,
+                                smoking_status="Never Smoked", alcohol_use="None", oral_hygiene="Good", hpv_status="Negative"))
+            await session.commit()
+            results = await asyncio.gather(*[
+                session.scalar(select(Patient.age).where(Patient.patient_id == f"T{i}")) for i in range(5)
+            ])
+            count = len((await session.execute(select(Patient.patient_id))).all())
+        finally:
+            await session.close()
+        return results, count
+
+    results, count = asyncio.run(scenario())
+
+    assert results == [55] * 5
+    assert count == 6
+    assert len(recorder["session"].threads) == 1
+    assert threading.get_ident() not in recorder["session"].threads
+
+
+def test_endpoints_work_without_async_driver(client, make_patient, monkeypatch):
+    monkeypatch.setattr(database, "AsyncSessionLocal", None)
+    make_patient("T1")
+    response = client.post("/users", json={
+        "user_id": "u1", "username": "u1", "email": "u1@example.com", "full_name": "U One", "role": "doctor",
+    })
+    assert response.status_code == 200
+    assert client.post("/users/u1/patients/T1/assign", json={}).status_code == 200
+    assert client.get("/users/u1/patients/T1/report").json()["patient"]["patient_id"] == "T1"
+    assert [p["patient_id"] for p in client.get("/patients").json()] == ["T1"]
@@ -0,0 +1,103 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from conftest import DATA_DIR
+from models.database_models import PatientAssignment, ResponseEnum, User, UserRoleEnum
+
+
+@pytest.fixture
+def doctor(db):
+    user = User(user_id="doc1", username="doc1", email="doc1@example.com", full_name="Doc One", role=UserRoleEnum.DOCTOR)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _assign(db, user, patient_id, active=True):
+    db.add(PatientAssignment(user_id=user.id, patient_id=patient_id, assignment_type="primary", is_active=active))
+    db.commit()
+
+
+def _query_count(response):
+    fields = dict(part.strip().split("=") for part in response.headers["X-SQL-Stats"].split(";"))
+    return int(fields["count"])
+
+
+def test_profile_lists_only_active_assignments(client, db, doctor, make_patient):
+    make_patient("P1", age=61)
+    make_patient("P2")
+    _assign(db, doctor, "P1")
+    _assign(db, doctor, "P2", active=False)
+
+    body = client.get("/users/doc1").json()
+    assert body["user"]["full_name"] == "Doc One"
+    assert [(p["patient_id"], p["age"], p["assignment_type"]) for p in body["assigned_patients"]] == [("P1", 61, "primary")]
+    assert client.get("/users/nobody").status_code == 404
+
+
+def test_dashboard_statistics(client, db, doctor, make_patient, make_followup):
+    for pid in ("P1", "P2", "P3"):
+        make_patient(pid)
+    _assign(db, doctor, "P1")
+    _assign(db, doctor, "P2")
+    make_followup("P1", 1, 2.0, response_to_treatment=ResponseEnum.EXCELLENT)
+    make_followup("P1", 2, 2.1, response_to_treatment=ResponseEnum.POOR)
+    make_followup("P2", 1, 1.0)
+    make_followup("P3", 1, 3.0, response_to_treatment=ResponseEnum.POOR)
+
+    stats = client.get("/users/doc1/dashboard").json()["statistics"]
+    assert stats["total_patients"] == 2
+    mix = stats["treatment_effectiveness"]["Chemo+RT"]
+    assert (mix["total"], mix["excellent"], mix["good"], mix["poor"]) == (3, 1, 1, 1)
+    assert mix["effectiveness"] == pytest.approx(66.7)
+
+
+def test_query_count_does_not_grow_with_assignments(client, db, doctor, make_patient, make_followup):
+    counts = []
+    for batch in range(2):
+        for i in range(5):
+            pid = f"Q{batch}{i}"
+            make_patient(pid)
+            make_followup(pid, 1, 1.5)
+            _assign(db, doctor, pid)
+        counts.append((_query_count(client.get("/users/doc1")), _query_count(client.get("/users/doc1/dashboard"))))
+    assert counts[0] == counts[1]
+
+
+def test_reads_stay_consistent_during_concurrent_ingests(client, db, doctor, make_patient, make_followup):
+    make_patient("P1")
+    make_followup("P1", 1, 2.0)
+    _assign(db, doctor, "P1")
+    template = pd.read_csv(os.path.join(DATA_DIR, "patient_b_moderate_data.csv"))
+
+    def ingest(i):
+        df = template.assign(Patient_ID=f"B{i:03d}")
+        files = {"file": (f"concurrent_{i}.csv", io.BytesIO(df.to_csv(index=False).encode()), "text/csv")}
+        return client.post("/ingest", params={"load_to_db": True}, files=files)
+
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            ingests = [pool.submit(ingest, i) for i in range(4)]
+            dashboards = [pool.submit(client.get, "/users/doc1/dashboard") for _ in range(8)]
+            ingests = [f.result() for f in ingests]
+            dashboards = [f.result() for f in dashboards]
+    finally:
+        for i in range(4):
+            path = os.path.join(DATA_DIR, f"concurrent_{i}.csv")
+            if os.path.exists(path):
+                os.remove(path)
+
+    assert [r.status_code for r in ingests] == [200] * 4
+    assert all(r.json()["database"]["followups_loaded"] == len(template) for r in ingests)
+    for response in dashboards:
+        assert response.status_code == 200
+        assert response.json()["statistics"]["total_patients"] == 1
+        assert response.json()["statistics"]["treatment_effectiveness"]["Chemo+RT"]["total"] == 1
+
+    summary = client.get("/analytics/summary").json()
+    assert summary["total_patients"] == 1 + 4
+    assert summary["total_followups"] == 1 + 4 * len(template)
@@ -0,0 +1,66 @@
+import logging
+
+from write_behind import WriteBehindQueue
+
+
+class FlakySession:
+    def __init__(self, log, fail):
+        self.log = log
+        self.fail = fail
+
+    def commit(self):
+        if self.fail:
+            raise RuntimeError("database is locked")
+        self.log.append("commit")
+
+    def rollback(self):
+        self.log.append("rollback")
+
+    def close(self):
+        pass
+
+
+class RecordingQueue(WriteBehindQueue):
+    name = "test-writer"
+
+    def _write_batch(self, db, batch):
+        return len(batch)
+
+
+def _queue(failures, max_retries):
+    log, attempts = [], []
+
+    def factory():
+        attempts.append(1)
+        return FlakySession(log, fail=len(attempts) <= failures)
+
+    return RecordingQueue(session_factory=factory, max_retries=max_retries, retry_backoff=0.0), log
+
+
+def test_transient_failure_is_retried():
+    writer, log = _queue(failures=2, max_retries=3)
+    writer._write([1, 2, 3])
+    assert log == ["rollback", "rollback", "commit"]
+    assert writer.counters["written"] == 3
+    assert writer.counters["retries"] == 2
+    assert writer.counters["failed"] == 0
+
+
+def test_batch_fails_after_exhausting_retries(caplog):
+    writer, log = _queue(failures=10, max_retries=2)
+    with caplog.at_level(logging.WARNING, logger="write_behind"):
+        writer._write([1, 2])
+    assert log == ["rollback"] * 3
+    assert writer.counters["failed"] == 2
+    assert writer.counters["written"] == 0
+    assert any(r.levelno == logging.ERROR and "giving up" in r.getMessage() for r in caplog.records)
+
+
+def test_queued_records_survive_a_transient_failure():
+    writer, log = _queue(failures=1, max_retries=3)
+    writer.start()
+    for i in range(5):
+        assert writer.enqueue(i)
+    writer.stop()
+    assert writer.counters["written"] == 5
+    assert writer.counters["failed"] == 0
@@ -0,0 +1,150 @@
+"""
+Bounded write-behind queue
+
+Request handlers enqueue records without touching the database; a daemon
+thread drains the queue and writes one transaction per batch once
+``batch_size`` records are waiting or ``flush_interval`` seconds have
+passed. When the queue is full new records are dropped and counted rather
+than blocking the caller. ``stop`` flushes whatever is still queued.
+
+A batch whose transaction fails is rolled back and retried with exponential
+backoff (``WRITE_BEHIND_MAX_RETRIES`` times, starting at
+``WRITE_BEHIND_RETRY_BACKOFF`` seconds), so a transient database error does
+not lose it; only a batch that fails every attempt is counted as failed.
+
+Subclasses implement ``_write_batch``.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from typing import List, Optional
+
+from database import SessionLocal
+
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5"))
+WRITE_BEHIND_RETRY_BACKOFF = float(os.getenv("WRITE_BEHIND_RETRY_BACKOFF", "0.5"))
+WRITE_BEHIND_RETRY_BACKOFF_MAX = 30.0
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Bounded queue of records flushed in batches by a daemon thread"""
+
+    name = "write-behind"
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 2.0, max_queue: int = 10000, session_factory=SessionLocal,
+                 max_retries: int = WRITE_BEHIND_MAX_RETRIES, retry_backoff: float = WRITE_BEHIND_RETRY_BACKOFF):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.session_factory = session_factory
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.counters = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "dropped_queue_full": 0,
+            "retries": 0,
+            "failed": 0,
+        }
+
+    def _bump(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def enqueue(self, record) -> bool:
+        """Queue a record for persistence; never blocks the caller"""
+        if self._thread is None:
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._bump("dropped_queue_full")
+            return False
+        self._bump("enqueued")
+        return True
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Flush everything still queued and stop the writer thread"""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "queued": self._queue.qsize(),
+                "running": self._thread is not None,
+                "batch_size": self.batch_size,
+                "flush_interval": self.flush_interval,
+            }
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            if stopping:
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+            for start in range(0, len(batch), self.batch_size):
+                self._write(batch[start:start + self.batch_size])
+
+    def _write(self, batch: List) -> None:
+        """Write one batch, retrying failed transactions with exponential backoff"""
+        delay = self.retry_backoff
+        for attempt in range(self.max_retries + 1):
+            db = self.session_factory()
+            try:
+                written = self._write_batch(db, batch)
+                db.commit()
+                if written:
+                    self._bump("written", written)
+                    self._bump("batches")
+                return
+            except Exception:
+                db.rollback()
+                if attempt == self.max_retries:
+                    self._bump("failed", len(batch))
+                    logger.exception("%s: giving up on %d records after %d attempts", self.name, len(batch), attempt + 1)
+                    return
+                self._bump("retries")
+                logger.warning("%s: writing %d records failed (attempt %d), retrying in %.1fs",
+                               self.name, len(batch), attempt + 1, delay, exc_info=True)
+            finally:
+                db.close()
+            time.sleep(delay)
+            delay = min(delay * 2, WRITE_BEHIND_RETRY_BACKOFF_MAX)
+
+    def _write_batch(self, db, batch: List) -> int:
+        """Add ``batch`` to ``db`` (committed by the caller); return rows written"""
+        raise NotImplementedError
@@ -21,8 +21,16 @@ const TumorPredictor = () => {
   // Fetch database patients
   const fetchDatabasePatients = async () => {
     try {
-      const response = await fetch('http://localhost:8000/patients')
-      const patients = await response.json()
+      // /patients is paged; follow X-Next-Cursor until the last page
+      const patients = []
+      let cursor = null
+      do {
+        const params = new URLSearchParams({ limit: '1000' })
+        if (cursor) params.set('cursor', cursor)
+        const response = await fetch(`http://localhost:8000/patients?${params}`)
+        patients.push(...(await response.json()))
+        cursor = response.headers.get('X-Next-Cursor')
+      } while (cursor)
       setDatabasePatients(patients)
       if (patients.length > 0 && !selectedPatientId) {
         setSelectedPatientId(patients[0].patient_id)